@@ -0,0 +1,540 @@
+"""
+Benchmark the synthetic data generation pipeline.
+
+Three modes:
+
+  stages     Time every pipeline stage (generate_plans ... load_to_duckdb) at
+             several scale factors, recording wall time, rows/sec and peak RSS.
+             Results are written as JSON and can be compared against a stored
+             baseline; regressions beyond --threshold exit with status 1.
+  layout     Load a warehouse with and without --cluster-by-date and count how
+             many row groups the int_customer_health_score 30/90-day windows
+             can skip via DuckDB zone maps.
+  customers  Compare the columnar customer generator against the original
+             row-by-row implementation, in speed and in the share of distinct
+             emails and company names.
+
+Usage:
+    python benchmark.py stages --scale-factors 0.1 1 --output bench.json
+    python benchmark.py stages --scale-factors 0.1 1 --baseline bench.json
+    python benchmark.py layout --scale-factor 10
+    python benchmark.py customers --sizes 1000 10000 100000
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import generate_saas_data as gen
+from stage_metrics import PeakRSSSampler
+
+logger = logging.getLogger(__name__)
+
+# The row-by-row reference gets slow quickly; skip it above this size
+DEFAULT_LEGACY_MAX_ROWS = 20000
+
+# Faker-backed customer columns compared against the row-by-row baseline
+DISTINCT_COLUMNS = ['email', 'company_name']
+DISTINCT_RATIO_TOLERANCE = 0.05
+
+DEFAULT_SCALE_FACTORS = [0.1, 1.0]
+# Relative slowdown (or RSS growth) over the baseline that counts as a regression
+DEFAULT_REGRESSION_THRESHOLD = 0.15
+# Stages shorter than this are dominated by noise and never flagged on time
+MIN_COMPARABLE_SECONDS = 0.05
+
+# (table, date column, trailing window days) filtered by int_customer_health_score
+HEALTH_SCORE_WINDOWS = [
+    ('usage_events', 'event_date', 30),
+    ('payments', 'payment_date', 90),
+    ('support_tickets', 'created_date', 90),
+]
+DEFAULT_LAYOUT_SCALE_FACTOR = 10.0
+LAYOUT_QUERY_REPEATS = 5
+
+STAGES = [
+    'generate_plans',
+    'generate_customers',
+    'generate_subscriptions',
+    'generate_payments',
+    'generate_usage_events',
+    'generate_support_tickets',
+    'load_to_duckdb',
+]
+
+
+def generate_customers_rowwise(num_customers: int) -> pd.DataFrame:
+    """
+    Reference row-by-row customer generator (the pre-vectorization implementation).
+
+    Kept only as a benchmark baseline and a statistical reference for
+    generate_saas_data.generate_customers.
+    """
+    customers = []
+    segments = np.random.choice(
+        ['SMB', 'Mid-Market', 'Enterprise'],
+        size=num_customers,
+        p=[0.6, 0.3, 0.1]
+    )
+    industries = [
+        'Technology', 'Healthcare', 'Finance', 'Retail', 'Education',
+        'Manufacturing', 'Consulting', 'Real Estate', 'Media', 'Other'
+    ]
+    date_range = (gen.END_DATE - gen.START_DATE).days
+    seasonal_variation = np.sin(np.linspace(0, 4 * np.pi, num_customers)) * 30
+
+    for i in range(num_customers):
+        days_offset = int(i * date_range / num_customers + seasonal_variation[i])
+        signup_date = gen.START_DATE + timedelta(days=max(0, min(days_offset, date_range)))
+
+        has_churned = np.random.random() < 0.05
+        end_date = None
+        if has_churned:
+            churn_days = np.random.randint(30, 365)
+            end_date = min(signup_date + timedelta(days=churn_days), gen.END_DATE)
+
+        customers.append({
+            'customer_id': i + 1,
+            'email': gen.fake.email(),
+            'company_name': gen.fake.company(),
+            'signup_date': signup_date,
+            'end_date': end_date,
+            'account_status': 'active' if not has_churned else 'churned',
+            'industry': np.random.choice(industries),
+            'company_size': np.random.choice(['Small', 'Medium', 'Large']) if segments[i] != 'Enterprise' else 'Large',
+            'country': gen.fake.country(),
+            'created_at': signup_date,
+            'updated_at': min(
+                gen.END_DATE,
+                end_date if end_date else signup_date + timedelta(days=int(np.random.randint(0, 90)))
+            )
+        })
+
+    return pd.DataFrame(customers)
+
+
+def time_generator(fn: Callable[[int], pd.DataFrame], num_rows: int) -> Dict:
+    """Run a generator once and return wall time, throughput and the distinct share of its Faker columns."""
+    np.random.seed(42)
+    started = time.perf_counter()
+    df = fn(num_rows)
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': len(df),
+        'seconds': round(elapsed, 4),
+        'rows_per_sec': round(len(df) / elapsed, 1) if elapsed > 0 else None,
+        **{f'distinct_{column}_ratio': round(df[column].nunique() / max(len(df), 1), 4) for column in DISTINCT_COLUMNS},
+    }
+
+
+def benchmark_customers(sizes: List[int], legacy_max_rows: int = DEFAULT_LEGACY_MAX_ROWS) -> pd.DataFrame:
+    """
+    Benchmark vectorized vs row-by-row customer generation.
+
+    Args:
+        sizes: Customer counts to benchmark
+        legacy_max_rows: Largest size at which the row-by-row baseline is run
+
+    Returns:
+        DataFrame with one row per (implementation, size)
+    """
+    results = []
+    for size in sizes:
+        results.append({'implementation': 'vectorized', **time_generator(gen.generate_customers, size)})
+        if size <= legacy_max_rows:
+            results.append({'implementation': 'rowwise', **time_generator(generate_customers_rowwise, size)})
+
+    df = pd.DataFrame(results)
+    for column in DISTINCT_COLUMNS:
+        ratios = df.pivot(index='rows', columns='implementation', values=f'distinct_{column}_ratio')
+        if 'rowwise' in ratios:
+            # Pooled strings must not repeat more often than fake.*() did row by row
+            low = ratios[ratios['vectorized'] < ratios['rowwise'] - DISTINCT_RATIO_TOLERANCE].dropna()
+            if not low.empty:
+                logger.warning("Vectorized %s values are less distinct than the row-by-row baseline:\n%s", column, low)
+    speedups = df.pivot(index='rows', columns='implementation', values='seconds')
+    if 'rowwise' in speedups:
+        logger.info("Speedup (rowwise / vectorized):\n%s", (speedups['rowwise'] / speedups['vectorized']).dropna())
+    return df
+
+
+def measure_stage(stage: str, scale_factor: float, fn: Callable[[], object], rows_of: Callable[[object], int]) -> Tuple[object, Dict]:
+    """
+    Run one pipeline stage and record wall time, throughput and peak RSS.
+    
+    Args:
+        stage: Stage name (one of STAGES)
+        scale_factor: Scale factor the stage runs at
+        fn: Zero-argument callable running the stage
+        rows_of: Maps the stage's return value to the number of rows it produced
+        
+    Returns:
+        (stage result, measurement record)
+    """
+    with PeakRSSSampler() as sampler:
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+    rows = rows_of(result)
+    record = {
+        'stage': stage,
+        'scale_factor': scale_factor,
+        'rows': rows,
+        'seconds': round(elapsed, 4),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': round(sampler.peak_bytes / 2**20, 1),
+    }
+    logger.info(
+        f"SF{scale_factor:g} {stage}: {rows:,} rows in {elapsed:.3f}s "
+        f"({record['rows_per_sec'] or 0:,.0f} rows/sec, peak RSS {record['peak_rss_mb']} MB)"
+    )
+    return result, record
+
+
+def benchmark_scale_factor(scale_factor: float, seed: int = 42) -> List[Dict]:
+    """
+    Benchmark every pipeline stage at one scale factor.
+    
+    Stages run in pipeline order because each one consumes its predecessors'
+    output. load_to_duckdb is timed on CSVs written (untimed) to a scratch
+    directory, so it measures only the database load.
+    
+    Args:
+        scale_factor: Scale factor (SF1 is the default row counts)
+        seed: NumPy seed set before the first stage
+        
+    Returns:
+        One measurement record per stage
+    """
+    scale = gen.ScaleConfig.from_scale_factor(scale_factor)
+    np.random.seed(seed)
+    records = []
+    
+    def run(stage, fn, rows_of=len):
+        result, record = measure_stage(stage, scale_factor, fn, rows_of)
+        records.append(record)
+        return result
+    
+    plans_df = run('generate_plans', gen.generate_plans)
+    customers_df = run('generate_customers', lambda: gen.generate_customers(scale.num_customers))
+    subscriptions_df = run(
+        'generate_subscriptions',
+        lambda: gen.generate_subscriptions(customers_df, plans_df, scale.num_subscriptions),
+    )
+    payments_df = run(
+        'generate_payments',
+        lambda: gen.generate_payments(subscriptions_df, scale.num_payments, batch_size=scale.chunk_size),
+    )
+    usage_events_df = run(
+        'generate_usage_events',
+        lambda: gen.generate_usage_events(customers_df, scale.num_usage_events),
+    )
+    support_tickets_df = run(
+        'generate_support_tickets',
+        lambda: gen.generate_support_tickets(customers_df, scale.num_support_tickets),
+    )
+    
+    tables = {
+        'plans': plans_df,
+        'customers': customers_df,
+        'subscriptions': subscriptions_df,
+        'payments': payments_df,
+        'usage_events': usage_events_df,
+        'support_tickets': support_tickets_df,
+    }
+    scratch_dir = tempfile.mkdtemp(prefix='saas_benchmark_')
+    try:
+        raw_dir = os.path.join(scratch_dir, 'raw')
+        os.makedirs(raw_dir)
+        for table, df in tables.items():
+            df.to_csv(os.path.join(raw_dir, f"{table}.csv"), index=False)
+        total_rows = sum(len(df) for df in tables.values())
+        del tables, payments_df, usage_events_df
+        run(
+            'load_to_duckdb',
+            lambda: gen.load_to_duckdb(raw_dir, os.path.join(scratch_dir, 'warehouse', 'bench.duckdb')),
+            rows_of=lambda _: total_rows,
+        )
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    return records
+
+
+def run_stage_benchmarks(scale_factors: List[float], seed: int = 42, isolate: bool = True) -> List[Dict]:
+    """
+    Benchmark all stages at each scale factor.
+    
+    Args:
+        scale_factors: Scale factors to run, smallest first for quick feedback
+        seed: NumPy seed used at every scale point
+        isolate: Run each scale factor in a fresh worker process so peak RSS
+            is not inflated by allocations left over from earlier scale points
+            
+    Returns:
+        Measurement records for every (scale factor, stage)
+    """
+    records = []
+    for scale_factor in scale_factors:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                records.extend(executor.submit(benchmark_scale_factor, scale_factor, seed).result())
+        else:
+            records.extend(benchmark_scale_factor(scale_factor, seed))
+    return records
+
+
+def build_report(records: List[Dict], seed: int) -> Dict:
+    """Wrap measurement records with the environment they were taken in."""
+    import pyarrow
+    
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'pyarrow': pyarrow.__version__,
+        },
+        'results': records,
+    }
+
+
+def compare_to_baseline(records: List[Dict], baseline: Dict, threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> List[Dict]:
+    """
+    Flag stages that got slower or hungrier than a stored baseline.
+    
+    Args:
+        records: Current measurement records
+        baseline: Report previously written by this script
+        threshold: Relative increase in seconds or peak RSS treated as a regression
+        
+    Returns:
+        One comparison row per (scale factor, stage) present in both runs
+        
+    Business Logic:
+        - Time is only flagged when the baseline stage took at least
+          MIN_COMPARABLE_SECONDS; shorter stages are timer noise
+        - Stages missing from the baseline are reported but never flagged
+    """
+    baseline_by_key = {(r['scale_factor'], r['stage']): r for r in baseline.get('results', [])}
+    comparisons = []
+    for record in records:
+        base = baseline_by_key.get((record['scale_factor'], record['stage']))
+        if base is None:
+            comparisons.append({**record, 'status': 'new'})
+            continue
+        time_ratio = record['seconds'] / base['seconds'] if base['seconds'] > 0 else None
+        rss_ratio = record['peak_rss_mb'] / base['peak_rss_mb'] if base['peak_rss_mb'] > 0 else None
+        reasons = []
+        if time_ratio is not None and base['seconds'] >= MIN_COMPARABLE_SECONDS and time_ratio > 1 + threshold:
+            reasons.append(f"time x{time_ratio:.2f}")
+        if rss_ratio is not None and rss_ratio > 1 + threshold:
+            reasons.append(f"rss x{rss_ratio:.2f}")
+        if record['rows'] != base['rows']:
+            reasons.append(f"rows {base['rows']} -> {record['rows']}")
+        comparisons.append({
+            'stage': record['stage'],
+            'scale_factor': record['scale_factor'],
+            'seconds': record['seconds'],
+            'baseline_seconds': base['seconds'],
+            'time_ratio': round(time_ratio, 3) if time_ratio is not None else None,
+            'peak_rss_mb': record['peak_rss_mb'],
+            'baseline_peak_rss_mb': base['peak_rss_mb'],
+            'rss_ratio': round(rss_ratio, 3) if rss_ratio is not None else None,
+            'status': 'REGRESSION: ' + ', '.join(reasons) if reasons else 'ok',
+        })
+    return comparisons
+
+
+def zone_map_pruning(conn, table: str, date_column: str, window_start, window_end) -> Dict:
+    """
+    Count the row groups whose zone map for date_column overlaps a date window.
+    
+    Row groups whose [min, max] lies entirely outside the window are skipped by
+    DuckDB's min/max filter pushdown without being read.
+    
+    Args:
+        conn: DuckDB connection
+        table: Table to inspect
+        date_column: Date column the window filters on
+        window_start: Exclusive lower bound of the window
+        window_end: Inclusive upper bound of the window
+        
+    Returns:
+        Dict with total and scanned row group counts
+    """
+    total, scanned = conn.execute(f"""
+        WITH segments AS (
+            SELECT
+                row_group_id,
+                CAST(regexp_extract(stats, 'Min: ([0-9-]+)', 1) AS DATE) AS min_date,
+                CAST(regexp_extract(stats, 'Max: ([0-9-]+)', 1) AS DATE) AS max_date
+            FROM pragma_storage_info('{table}')
+            WHERE column_name = '{date_column}' AND segment_type = 'DATE'
+        ),
+        row_groups AS (
+            SELECT row_group_id, min(min_date) AS min_date, max(max_date) AS max_date
+            FROM segments
+            GROUP BY row_group_id
+        )
+        SELECT
+            count(*),
+            count(*) FILTER (WHERE max_date > ?::DATE AND min_date <= ?::DATE)
+        FROM row_groups
+    """, [window_start, window_end]).fetchone()
+    return {'row_groups': total, 'row_groups_scanned': scanned, 'row_groups_skipped': total - scanned}
+
+
+def benchmark_layout(scale_factor: float = DEFAULT_LAYOUT_SCALE_FACTOR, seed: int = 42) -> List[Dict]:
+    """
+    Compare health-score window scans on the default and the date-clustered layout.
+    
+    Both warehouses are loaded directly from the same seed, so they hold identical
+    rows in different physical order.
+    
+    Args:
+        scale_factor: Scale factor to generate (row groups hold 122,880 rows, so pruning
+            only shows up once tables span many row groups)
+        seed: Root generation seed
+        
+    Returns:
+        One record per (layout, window) with row group counts and the best-of-N
+        wall time of the window aggregate
+        
+    Business Logic:
+        - as_of_date is the latest event/payment/ticket date, as in int_customer_health_score
+        - Windows are evaluated with literal bounds; DuckDB prunes row groups on
+          constant filters, not on the model's cross-joined as_of CTE
+    """
+    import duckdb
+    
+    scale = gen.ScaleConfig.from_scale_factor(scale_factor)
+    scratch_dir = tempfile.mkdtemp(prefix='saas_layout_')
+    records = []
+    try:
+        for layout, clustered in [('default', False), ('clustered', True)]:
+            db_path = os.path.join(scratch_dir, f"{layout}.duckdb")
+            gen.generate_sharded(
+                seed=seed, output_format='none', direct_load_db=db_path, scale=scale, cluster_by_date=clustered
+            )
+            conn = duckdb.connect(db_path, read_only=True)
+            try:
+                as_of = conn.execute(
+                    "SELECT greatest((SELECT max(event_date) FROM usage_events), "
+                    "(SELECT max(payment_date) FROM payments), (SELECT max(created_date) FROM support_tickets))"
+                ).fetchone()[0]
+                for table, date_column, days in HEALTH_SCORE_WINDOWS:
+                    window_start = as_of - timedelta(days=days)
+                    pruning = zone_map_pruning(conn, table, date_column, window_start, as_of)
+                    timings = []
+                    for _ in range(LAYOUT_QUERY_REPEATS):
+                        started = time.perf_counter()
+                        rows = conn.execute(
+                            f"SELECT count(*) FROM {table} WHERE {date_column} > ? AND {date_column} <= ?",
+                            [window_start, as_of],
+                        ).fetchone()[0]
+                        timings.append(time.perf_counter() - started)
+                    record = {
+                        'layout': layout,
+                        'scale_factor': scale_factor,
+                        'table': table,
+                        'window_days': days,
+                        'rows_in_window': rows,
+                        **pruning,
+                        'seconds': round(min(timings), 5),
+                    }
+                    logger.info(
+                        f"{layout} {table} {days}d: skipped {pruning['row_groups_skipped']}/{pruning['row_groups']} "
+                        f"row groups, {record['seconds'] * 1000:.2f} ms"
+                    )
+                    records.append(record)
+            finally:
+                conn.close()
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    return records
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+    
+    stages = subparsers.add_parser('stages', help='Benchmark every pipeline stage at several scale factors')
+    stages.add_argument('--scale-factors', type=float, nargs='+', default=DEFAULT_SCALE_FACTORS)
+    stages.add_argument('--seed', type=int, default=42)
+    stages.add_argument('--output', help='Write the JSON report to this path')
+    stages.add_argument('--baseline', help='Compare against a JSON report from a previous run')
+    stages.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='Relative slowdown or RSS growth flagged as a regression (default: 0.15)')
+    stages.add_argument('--no-isolate', action='store_true',
+                        help='Run every scale factor in this process instead of a fresh worker each')
+    
+    layout = subparsers.add_parser('layout', help='Row groups skipped by health-score windows, clustered vs default')
+    layout.add_argument('--scale-factor', type=float, default=DEFAULT_LAYOUT_SCALE_FACTOR)
+    layout.add_argument('--seed', type=int, default=42)
+    layout.add_argument('--output', help='Write the JSON results to this path')
+    
+    customers = subparsers.add_parser('customers', help='Vectorized vs row-by-row customer generation')
+    customers.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    customers.add_argument('--legacy-max-rows', type=int, default=DEFAULT_LEGACY_MAX_ROWS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    
+    if args.mode == 'customers':
+        df = benchmark_customers(args.sizes, legacy_max_rows=args.legacy_max_rows)
+        print(df.to_string(index=False))
+        return 0
+    
+    if args.mode == 'layout':
+        records = benchmark_layout(args.scale_factor, seed=args.seed)
+        print(pd.DataFrame(records).to_string(index=False))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(build_report(records, args.seed), f, indent=2, default=str)
+            logger.info(f"Wrote layout benchmark to {args.output}")
+        return 0
+    
+    records = run_stage_benchmarks(args.scale_factors, seed=args.seed, isolate=not args.no_isolate)
+    report = build_report(records, args.seed)
+    print(pd.DataFrame(records).to_string(index=False))
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Wrote benchmark report to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparisons = pd.DataFrame(compare_to_baseline(records, baseline, args.threshold))
+        print()
+        print(comparisons.to_string(index=False))
+        regressions = comparisons[comparisons['status'].str.startswith('REGRESSION')]
+        if not regressions.empty:
+            logger.error(f"{len(regressions)} stage(s) regressed beyond {args.threshold:.0%} of {args.baseline}")
+            return 1
+        logger.info(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,17 +7,24 @@ This script creates realistic subscription lifecycle data including:
 - Usage events correlated with retention
 - Payment transactions with realistic failure rates
 
-Output: CSV files in /data/raw/ ready to load into DuckDB
+Output: CSV files (or typed Parquet datasets) in /data/raw/ ready to load into DuckDB
 """
 
 import pandas as pd
 import numpy as np
 from faker import Faker
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
 import logging
 import os
+import shutil
 import sys
+import time
+
+import stage_metrics
 
 # Configure logging
 logging.basicConfig(
@@ -34,6 +41,164 @@ NUM_USAGE_EVENTS = 200000
 NUM_PAYMENTS = 60000
 NUM_SUPPORT_TICKETS = 15000
 
+# Rows computed per vectorized payment batch
+PAYMENT_BATCH_SIZE = 1_000_000
+PAYMENT_COLUMNS = ['payment_id', 'subscription_id', 'payment_date', 'amount', 'status', 'payment_method', 'created_at']
+
+# Rows per streamed usage event chunk
+USAGE_EVENT_CHUNK_SIZE = 1_000_000
+USAGE_EVENT_COLUMNS = ['event_id', 'customer_id', 'event_date', 'event_type', 'usage_quantity', 'created_at']
+
+# Customer-dependent tables generated per shard (plans are shared by all shards)
+SHARDED_TABLES = ['customers', 'subscriptions', 'payments', 'usage_events', 'support_tickets']
+MERGE_BUFFER_BYTES = 16 * 1024 * 1024
+
+# Declared column types per raw table (DuckDB type names)
+TABLE_SCHEMAS: Dict[str, Dict[str, str]] = {
+    'plans': {
+        'plan_id': 'BIGINT', 'plan_name': 'VARCHAR', 'plan_tier': 'VARCHAR',
+        'base_price_monthly': 'DOUBLE', 'base_price_annual': 'DOUBLE', 'features': 'VARCHAR',
+        'max_users': 'BIGINT', 'created_date': 'DATE',
+    },
+    'customers': {
+        'customer_id': 'BIGINT', 'email': 'VARCHAR', 'company_name': 'VARCHAR',
+        'signup_date': 'DATE', 'end_date': 'DATE', 'account_status': 'VARCHAR',
+        'industry': 'VARCHAR', 'company_size': 'VARCHAR', 'country': 'VARCHAR',
+        'created_at': 'DATE', 'updated_at': 'DATE',
+    },
+    'subscriptions': {
+        'subscription_id': 'BIGINT', 'customer_id': 'BIGINT', 'plan_id': 'BIGINT',
+        'start_date': 'DATE', 'end_date': 'DATE', 'status': 'VARCHAR', 'mrr_amount': 'DOUBLE',
+        'billing_cycle': 'VARCHAR', 'amount': 'DOUBLE', 'created_at': 'DATE', 'updated_at': 'DATE',
+    },
+    'payments': {
+        'payment_id': 'BIGINT', 'subscription_id': 'BIGINT', 'payment_date': 'DATE',
+        'amount': 'DOUBLE', 'status': 'VARCHAR', 'payment_method': 'VARCHAR', 'created_at': 'DATE',
+    },
+    'usage_events': {
+        'event_id': 'BIGINT', 'customer_id': 'BIGINT', 'event_date': 'DATE',
+        'event_type': 'VARCHAR', 'usage_quantity': 'BIGINT', 'created_at': 'DATE',
+    },
+    'support_tickets': {
+        'ticket_id': 'BIGINT', 'customer_id': 'BIGINT', 'created_date': 'DATE',
+        'resolved_date': 'DATE', 'category': 'VARCHAR', 'priority': 'VARCHAR',
+        'satisfaction_score': 'INTEGER', 'created_at': 'DATE',
+    },
+}
+RAW_TABLES = ['customers', 'subscriptions', 'plans', 'payments', 'usage_events', 'support_tickets']
+# load_to_duckdb fills <table><suffix> first and renames it over the live table
+LOAD_STAGING_SUFFIX = '__staging'
+# Rows read per Arrow record batch while validating a raw file during load
+LOAD_BATCH_ROWS = 1_000_000
+
+# --cluster-by-date: event-like tables are sorted by (date, secondary key) when written and
+# loaded, so DuckDB zone maps and Parquet row-group statistics can skip rows outside a date
+# window. Payments carry no customer_id, so subscription_id is their secondary key.
+CLUSTER_KEYS = {
+    'payments': ['payment_date', 'subscription_id'],
+    'usage_events': ['event_date', 'customer_id'],
+    'support_tickets': ['created_date', 'customer_id'],
+}
+
+# Ingest validation, applied in the same pass that loads each raw table. Failing rows go
+# to <table>_rejects with reason codes '<check>:<column>':
+#   invalid_type  value does not parse as the declared type (CSV input only)
+#   null_key      key/foreign-key column is null
+#   bad_enum      value outside the accepted domain (compared lower/trimmed, as in staging)
+#   date_order    start column is after the end column
+#   bad_sign      negative amount, except refunds which must be <= 0
+REJECTS_SUFFIX = '_rejects'
+VALIDATION_RULES: Dict[str, Dict] = {
+    'plans': {
+        'keys': ['plan_id'],
+        'enums': {'plan_tier': ['starter', 'professional', 'enterprise']},
+        'non_negative': ['base_price_monthly', 'base_price_annual'],
+    },
+    'customers': {
+        'keys': ['customer_id'],
+        'enums': {'account_status': ['active', 'churned']},
+        'date_order': [('signup_date', 'end_date')],
+    },
+    'subscriptions': {
+        'keys': ['subscription_id', 'customer_id', 'plan_id'],
+        'enums': {
+            'status': ['active', 'paused', 'churned', 'upgraded', 'downgraded'],
+            'billing_cycle': ['monthly', 'annual'],
+        },
+        'date_order': [('start_date', 'end_date')],
+        'non_negative': ['mrr_amount', 'amount'],
+    },
+    'payments': {
+        'keys': ['payment_id', 'subscription_id'],
+        'enums': {
+            'status': ['success', 'failed', 'refunded'],
+            'payment_method': ['credit_card', 'bank_transfer', 'paypal'],
+        },
+        # Refunds are recorded as negative amounts; any other negative amount is rejected
+        'signed_by_status': {'amount': 'refunded'},
+    },
+    'usage_events': {
+        'keys': ['event_id', 'customer_id'],
+        'enums': {'event_type': ['login', 'feature_usage', 'export', 'api_call']},
+    },
+    'support_tickets': {
+        'keys': ['ticket_id', 'customer_id'],
+        'enums': {
+            'category': ['billing', 'technical', 'feature_request', 'other'],
+            'priority': ['low', 'medium', 'high', 'urgent'],
+        },
+        'date_order': [('created_date', 'resolved_date')],
+    },
+}
+
+# Parquet output: large tables are hive-partitioned by the month of this date column
+PARQUET_PARTITION_COLUMNS = {'payments': 'payment_date', 'usage_events': 'event_date'}
+PARQUET_PARTITION_KEY = 'month'
+DEFAULT_PARQUET_COMPRESSION = 'zstd'
+# 'none' skips file export (only valid together with --direct-load)
+OUTPUT_FORMATS = ['csv', 'parquet', 'none']
+
+# Approximate peak working-set bytes per generated row (DataFrame + temporaries),
+# used to size chunks and shards against --memory-budget
+BYTES_PER_ROW = {
+    'customers': 600,
+    'subscriptions': 400,
+    'payments': 300,
+    'usage_events': 250,
+    'support_tickets': 300,
+}
+MIN_CHUNK_SIZE = 10_000
+MAX_CHUNK_SIZE = 5_000_000
+# Share of a worker's memory budget that may be held by fully materialized tables
+RESIDENT_BUDGET_FRACTION = 0.6
+
+# Daily delta mode: subscription state changes per new subscription, the number of
+# contiguous ID ranges sampled per table, and state transition probabilities
+DELTA_STATE_CHANGES_PER_NEW_SUBSCRIPTION = 0.3
+DELTA_SAMPLE_BLOCKS = 8
+DELTA_TRANSITIONS = {
+    'active': {'churned': 0.5, 'paused': 0.2, 'upgraded': 0.15, 'downgraded': 0.15},
+    'paused': {'active': 0.6, 'churned': 0.4},
+}
+# Primary key and watermark column tracked per raw table in generator_state
+DELTA_STATE_COLUMNS = {
+    'customers': ('customer_id', 'updated_at'),
+    'subscriptions': ('subscription_id', 'updated_at'),
+    'payments': ('payment_id', 'created_at'),
+    'usage_events': ('event_id', 'created_at'),
+    'support_tickets': ('ticket_id', 'created_at'),
+}
+
+# Change log mode: share of subscriptions that passed through an intermediate status
+# on the way to their final status; everything else goes straight from active to final
+CHANGE_LOG_INTERMEDIATE_STATUSES = {
+    'active': {'paused': 0.2},
+    'churned': {'paused': 0.25, 'upgraded': 0.15},
+}
+
+# Faker calls per pooled string part (user names, domains, last names, ...)
+FAKER_POOL_SIZE = 5000
+
 START_DATE = datetime(2022, 1, 1)
 END_DATE = datetime(2024, 12, 31)
 
@@ -43,10 +208,13 @@ fake = Faker()
 Faker.seed(42)
 
 
-def generate_plans() -> pd.DataFrame:
+def generate_plans(start_date: datetime = START_DATE) -> pd.DataFrame:
     """
     Generate subscription plan catalog.
     
+    Args:
+        start_date: Start of the simulated history; plans are created a year earlier
+        
     Returns:
         DataFrame with plan data
         
@@ -82,19 +250,109 @@ def generate_plans() -> pd.DataFrame:
                     'professional': np.random.choice([25, 50]),
                     'enterprise': 999
                 }[tier],
-                'created_date': START_DATE - timedelta(days=365)
+                'created_date': start_date - timedelta(days=365)
             })
             plan_id += 1
     
     return pd.DataFrame(plans)
 
 
-def generate_customers(num_customers: int) -> pd.DataFrame:
+def build_faker_pool(size: int, seed: int = 42) -> Dict[str, np.ndarray]:
+    """
+    Pre-build seeded pools of Faker strings for array-indexed lookups.
+
+    Args:
+        size: Number of values to generate per field
+        seed: Seed for the dedicated Faker instance backing the pool
+
+    Returns:
+        Dict mapping pool name to an object array of strings: the parts emails and
+        company names are composed from ('email_user', 'email_domain', 'last_name',
+        'company_suffix') and whole 'country' values
+
+    Business Logic:
+    - Faker calls are the most expensive part of row generation, so they are paid
+      once per pool entry instead of once per row
+    - Pools hold parts rather than whole values, so composed values are not limited
+      to `size` distinct strings
+    - A dedicated, seeded Faker instance keeps pools reproducible and independent of
+      the module-level generator state
+    """
+    pool_fake = Faker()
+    pool_fake.seed_instance(seed)
+    emails = [pool_fake.email().split('@', 1) for _ in range(size)]
+    return {
+        'email_user': np.array([user for user, _ in emails], dtype=object),
+        'email_domain': np.array([domain for _, domain in emails], dtype=object),
+        'last_name': np.array([pool_fake.last_name() for _ in range(size)], dtype=object),
+        'company_suffix': np.array([pool_fake.company_suffix() for _ in range(size)], dtype=object),
+        'country': np.array([pool_fake.country() for _ in range(size)], dtype=object),
+    }
+
+
+def compose_emails(pool: Dict[str, np.ndarray], customer_ids: np.ndarray) -> np.ndarray:
+    """
+    Build one email per customer from pooled user names and domains.
+
+    The customer_id is appended to the user name, so emails stay unique at any
+    scale (and across shards) instead of repeating once per pool entry.
+    """
+    size = len(pool['email_user'])
+    users = pool['email_user'][np.random.randint(0, size, size=len(customer_ids))]
+    domains = pool['email_domain'][np.random.randint(0, size, size=len(customer_ids))]
+    return users + customer_ids.astype(str).astype(object) + '@' + domains
+
+
+def compose_company_names(pool: Dict[str, np.ndarray], num_rows: int) -> np.ndarray:
+    """
+    Build company names from pooled last names using Faker's en_US company formats.
+
+    Faker picks one of three formats uniformly: "{last} {suffix}", "{last}-{last}"
+    and "{last}, {last} and {last}". Composing them from pooled parts keeps the
+    distribution (and the number of distinct names) of fake.company().
+    """
+    size = len(pool['last_name'])
+
+    def last_names():
+        return pool['last_name'][np.random.randint(0, size, size=num_rows)]
+
+    first, second, third = last_names(), last_names(), last_names()
+    suffix = pool['company_suffix'][np.random.randint(0, size, size=num_rows)]
+    formats = np.random.randint(0, 3, size=num_rows)
+    return np.where(
+        formats == 0,
+        first + ' ' + suffix,
+        np.where(formats == 1, first + '-' + second, first + ', ' + second + ' and ' + third),
+    )
+
+
+def _offsets_to_dates(offsets: np.ndarray, base_date: datetime = START_DATE) -> pd.DatetimeIndex:
+    """Convert day offsets from base_date into dates (NaN offsets become NaT)."""
+    return pd.Timestamp(base_date) + pd.to_timedelta(offsets, unit='D')
+
+
+def generate_customers(
+    num_customers: int,
+    faker_pool_size: int = FAKER_POOL_SIZE,
+    first_customer_id: int = 1,
+    total_customers: Optional[int] = None,
+    faker_seed: int = 42,
+    start_date: datetime = START_DATE,
+    end_date: datetime = END_DATE,
+) -> pd.DataFrame:
     """
     Generate customer records with realistic attributes.
     
     Args:
         num_customers: Number of customer records to generate
+        faker_pool_size: Number of Faker calls per pooled part (emails and company
+            names are composed from parts, so they are not capped at this many values)
+        first_customer_id: customer_id of the first generated row (for sharded runs)
+        total_customers: Size of the full customer population this slice belongs to;
+            signup dates are spread across the whole population (defaults to num_customers)
+        faker_seed: Seed for the Faker string pool
+        start_date: First possible signup date
+        end_date: Last date of the simulated history
         
     Returns:
         DataFrame with customer data
@@ -103,11 +361,11 @@ def generate_customers(num_customers: int) -> pd.DataFrame:
     - 60% SMB, 30% Mid-Market, 10% Enterprise
     - Signup dates distributed evenly with seasonal variation
     - 5% churn rate (customers with end_date set)
+    - All columns are drawn as whole NumPy arrays; dates are tracked as day offsets
+      from start_date and converted once at the end
     """
     logger.info(f"Generating {num_customers} customer records...")
     
-    customers = []
-    
     # Segment distribution
     segments = np.random.choice(
         ['SMB', 'Mid-Market', 'Enterprise'],
@@ -116,49 +374,91 @@ def generate_customers(num_customers: int) -> pd.DataFrame:
     )
     
     # Industry distribution
-    industries = [
+    industries = np.array([
         'Technology', 'Healthcare', 'Finance', 'Retail', 'Education',
         'Manufacturing', 'Consulting', 'Real Estate', 'Media', 'Other'
-    ]
+    ], dtype=object)
     
-    # Generate date range with seasonal variation
-    date_range = (END_DATE - START_DATE).days
-    seasonal_variation = np.sin(np.linspace(0, 4 * np.pi, num_customers)) * 30
-    
-    for i in range(num_customers):
-        # Signup date with seasonal variation
-        days_offset = int(i * date_range / num_customers + seasonal_variation[i])
-        signup_date = START_DATE + timedelta(days=max(0, min(days_offset, date_range)))
-        
-        # 5% of customers have churned (end_date set)
-        has_churned = np.random.random() < 0.05
-        end_date = None
-        if has_churned:
-            churn_days = np.random.randint(30, 365)
-            end_date = signup_date + timedelta(days=churn_days)
-            end_date = min(end_date, END_DATE)
-        
-        customers.append({
-            'customer_id': i + 1,
-            'email': fake.email(),
-            'company_name': fake.company(),
-            'signup_date': signup_date,
-            'end_date': end_date,
-            'account_status': 'active' if not has_churned else 'churned',
-            'industry': np.random.choice(industries),
-            'company_size': np.random.choice(['Small', 'Medium', 'Large']) if segments[i] != 'Enterprise' else 'Large',
-            'country': fake.country(),
-            'created_at': signup_date,
-            'updated_at': min(
-                END_DATE,
-                end_date if end_date else signup_date + timedelta(days=int(np.random.randint(0, 90)))
-            )
-        })
+    # Signup date with seasonal variation (truncate toward zero like int())
+    date_range = (end_date - start_date).days
+    total_customers = total_customers or num_customers
+    positions = np.arange(first_customer_id - 1, first_customer_id - 1 + num_customers)
+    seasonal_variation = np.sin(positions * 4 * np.pi / max(total_customers - 1, 1)) * 30
+    signup_offsets = np.trunc(positions * date_range / max(total_customers, 1) + seasonal_variation)
+    signup_offsets = np.clip(signup_offsets, 0, date_range).astype(np.int64)
     
-    return pd.DataFrame(customers)
+    # 5% of customers have churned (end_date set)
+    has_churned = np.random.random(num_customers) < 0.05
+    churn_days = np.random.randint(30, 365, size=num_customers)
+    end_offsets = np.where(
+        has_churned,
+        np.minimum(signup_offsets + churn_days, date_range),
+        np.nan
+    )
+    
+    industry = industries[np.random.randint(0, len(industries), size=num_customers)]
+    company_size = np.where(
+        segments == 'Enterprise',
+        'Large',
+        np.random.choice(['Small', 'Medium', 'Large'], size=num_customers)
+    ).astype(object)
+    
+    updated_offsets = np.minimum(
+        date_range,
+        np.where(has_churned, end_offsets, signup_offsets + np.random.randint(0, 90, size=num_customers))
+    )
+    
+    # Faker strings come from a seeded pool of parts indexed by array
+    customer_ids = positions + 1
+    pool_size = max(1, min(num_customers, faker_pool_size))
+    pool = build_faker_pool(pool_size, seed=faker_seed)
+    country_idx = np.random.randint(0, pool_size, size=num_customers)
+    
+    signup_dates = _offsets_to_dates(signup_offsets, start_date)
+    
+    return pd.DataFrame({
+        'customer_id': customer_ids,
+        'email': compose_emails(pool, customer_ids),
+        'company_name': compose_company_names(pool, num_customers),
+        'signup_date': signup_dates,
+        'end_date': _offsets_to_dates(end_offsets, start_date),
+        'account_status': np.where(has_churned, 'churned', 'active').astype(object),
+        'industry': industry,
+        'company_size': company_size,
+        'country': pool['country'][country_idx],
+        'created_at': signup_dates,
+        'updated_at': _offsets_to_dates(updated_offsets, start_date),
+    })
+
+
+def _random_days(low: np.ndarray, high: np.ndarray) -> np.ndarray:
+    """Vectorized np.random.randint(low, high) with per-element bounds (requires high > low)."""
+    return low + np.floor(np.random.random(len(low)) * (high - low)).astype(np.int64)
+
+
+def _customer_arrays(customers_df: pd.DataFrame, start_date: datetime = START_DATE) -> Dict[str, np.ndarray]:
+    """
+    Build a positional, customer_id-indexed array view of the customers table.
+
+    Dates are returned as integer day offsets from start_date; missing end dates are NaN.
+    """
+    base = pd.Timestamp(start_date)
+    return {
+        'customer_id': customers_df['customer_id'].to_numpy(),
+        'signup_offset': (customers_df['signup_date'] - base).dt.days.to_numpy(dtype=np.int64),
+        'end_offset': (customers_df['end_date'] - base).dt.days.to_numpy(dtype=np.float64, na_value=np.nan),
+        'is_active': (customers_df['account_status'] == 'active').to_numpy(),
+    }
 
 
-def generate_subscriptions(customers_df: pd.DataFrame, plans_df: pd.DataFrame, num_subscriptions: int) -> pd.DataFrame:
+def generate_subscriptions(
+    customers_df: pd.DataFrame,
+    plans_df: pd.DataFrame,
+    num_subscriptions: int,
+    first_subscription_id: int = 1,
+    start_date: datetime = START_DATE,
+    end_date: datetime = END_DATE,
+) -> pd.DataFrame:
     """
     Generate subscription records with lifecycle events.
     
@@ -166,6 +466,9 @@ def generate_subscriptions(customers_df: pd.DataFrame, plans_df: pd.DataFrame, n
         customers_df: Customer DataFrame
         plans_df: Plans DataFrame
         num_subscriptions: Number of subscription records
+        first_subscription_id: subscription_id of the first generated row
+        start_date: Start of the simulated history
+        end_date: End of the simulated history
         
     Returns:
         DataFrame with subscription data
@@ -174,314 +477,451 @@ def generate_subscriptions(customers_df: pd.DataFrame, plans_df: pd.DataFrame, n
     - Each customer has 1-8 subscriptions on average
     - Subscriptions can upgrade, downgrade, pause, or churn
     - MRR calculated based on billing cycle
+    - Customers are looked up by position in array form, and each attribute is drawn
+      in one vectorized pass; status-dependent end dates are applied with masks
     """
     logger.info(f"Generating {num_subscriptions} subscription records...")
     
-    subscriptions = []
-    subscription_id = 1
+    customers = _customer_arrays(customers_df, start_date)
+    date_range = (end_date - start_date).days
     
     # Assign subscriptions to customers (weighted towards active customers)
-    active_customers = customers_df[customers_df['account_status'] == 'active']
-    churned_customers = customers_df[customers_df['account_status'] == 'churned']
-    
     # Active customers get more subscriptions
-    customer_ids = list(active_customers['customer_id']) * 5 + list(churned_customers['customer_id'])
-    np.random.shuffle(customer_ids)
-    
-    for i in range(num_subscriptions):
-        customer_id = customer_ids[i % len(customer_ids)]
-        customer = customers_df[customers_df['customer_id'] == customer_id].iloc[0]
-        
-        # Subscription start date (after customer signup)
-        signup_date = customer['signup_date']
-        max_start_offset_days = (END_DATE - signup_date).days
-        if max_start_offset_days <= 0:
-            start_date = signup_date
-        else:
-            days_after_signup = int(np.random.randint(0, max_start_offset_days))
-            start_date = signup_date + timedelta(days=days_after_signup)
-        
-        # Select plan
-        plan = plans_df.sample(1).iloc[0]
-        plan_id = plan['plan_id']
-        
-        # Billing cycle (70% monthly, 30% annual)
-        billing_cycle = np.random.choice(['monthly', 'annual'], p=[0.7, 0.3])
-        base_price = plan['base_price_monthly'] if billing_cycle == 'monthly' else plan['base_price_annual']
-        
-        # Calculate MRR
-        if billing_cycle == 'annual':
-            mrr_amount = base_price / 12.0
-        else:
-            mrr_amount = base_price
-        
-        # Subscription status
-        # Determine if subscription is still active
-        if customer['end_date'] and start_date < customer['end_date']:
-            # Customer churned, subscription should end
-            end_date = customer['end_date']
-            status = 'churned'
-        else:
-            # Subscription might still be active or have other status
-            status_weights = {
-                'active': 0.7,
-                'paused': 0.05,
-                'churned': 0.15,
-                'upgraded': 0.05,
-                'downgraded': 0.05
-            }
-            status = np.random.choice(list(status_weights.keys()), p=list(status_weights.values()))
-            
-            if status == 'churned':
-                # Churned subscription ends before customer end_date or END_DATE
-                max_end = customer['end_date'] if customer['end_date'] else END_DATE
-                max_active_days = min(730, max(0, (max_end - start_date).days))
-                if max_active_days <= 30:
-                    end_date = max_end
-                else:
-                    days_active = int(np.random.randint(30, max_active_days))
-                    end_date = min(start_date + timedelta(days=days_active), max_end)
-            elif status in ['upgraded', 'downgraded']:
-                # These subscriptions transition to new subscription
-                max_active_days = min(365, max(0, (END_DATE - start_date).days))
-                if max_active_days <= 60:
-                    end_date = END_DATE
-                else:
-                    days_active = int(np.random.randint(60, max_active_days))
-                    end_date = min(start_date + timedelta(days=days_active), END_DATE)
-            elif status == 'paused':
-                # Paused subscriptions might resume
-                max_active_days = min(180, max(0, (END_DATE - start_date).days))
-                if max_active_days <= 30:
-                    end_date = END_DATE
-                else:
-                    days_active = int(np.random.randint(30, max_active_days))
-                    end_date = min(start_date + timedelta(days=days_active), END_DATE)
-            else:  # active
-                end_date = None
-        
-        subscriptions.append({
-            'subscription_id': subscription_id,
-            'customer_id': customer_id,
-            'plan_id': plan_id,
-            'start_date': start_date,
-            'end_date': end_date,
-            'status': status,
-            'mrr_amount': round(mrr_amount, 2),
-            'billing_cycle': billing_cycle,
-            'amount': base_price,
-            'created_at': start_date,
-            'updated_at': min(
-                END_DATE,
-                end_date if end_date else start_date + timedelta(days=int(np.random.randint(0, 30)))
-            )
-        })
-        
-        subscription_id += 1
+    positions = np.arange(len(customers_df))
+    customer_pool = np.concatenate([np.tile(positions[customers['is_active']], 5), positions[~customers['is_active']]])
+    np.random.shuffle(customer_pool)
+    customer_pos = customer_pool[np.arange(num_subscriptions) % len(customer_pool)]
+    
+    signup_offset = customers['signup_offset'][customer_pos]
+    customer_end = customers['end_offset'][customer_pos]
+    customer_churned = ~np.isnan(customer_end)
+    
+    # Subscription start date (after customer signup)
+    can_start_later = signup_offset < date_range
+    start_offset = signup_offset.copy()
+    start_offset[can_start_later] = _random_days(signup_offset[can_start_later], np.full(can_start_later.sum(), date_range))
+    
+    # Select plan
+    plan_pos = np.random.randint(0, len(plans_df), size=num_subscriptions)
+    plan_id = plans_df['plan_id'].to_numpy()[plan_pos]
+    
+    # Billing cycle (70% monthly, 30% annual)
+    billing_cycle = np.random.choice(['monthly', 'annual'], size=num_subscriptions, p=[0.7, 0.3]).astype(object)
+    is_annual = billing_cycle == 'annual'
+    base_price = np.where(
+        is_annual,
+        plans_df['base_price_annual'].to_numpy()[plan_pos],
+        plans_df['base_price_monthly'].to_numpy()[plan_pos]
+    )
     
-    return pd.DataFrame(subscriptions)
+    # Calculate MRR
+    mrr_amount = np.where(is_annual, base_price / 12.0, base_price)
+    
+    # Subscription status
+    # Customer churned after the subscription started, so the subscription ends with the customer
+    forced_churn = customer_churned & (start_offset < np.nan_to_num(customer_end, nan=-1))
+    status_weights = {
+        'active': 0.7,
+        'paused': 0.05,
+        'churned': 0.15,
+        'upgraded': 0.05,
+        'downgraded': 0.05
+    }
+    status = np.random.choice(list(status_weights.keys()), size=num_subscriptions, p=list(status_weights.values())).astype(object)
+    status[forced_churn] = 'churned'
+    
+    end_offset = np.full(num_subscriptions, np.nan)
+    end_offset[forced_churn] = customer_end[forced_churn]
+    
+    # Each lifecycle rule: (status values, max active days, min active days, fallback end)
+    max_end = np.where(customer_churned, customer_end, date_range)
+    lifecycle_rules = [
+        (['churned'], 730, 30, max_end),
+        (['upgraded', 'downgraded'], 365, 60, np.full(num_subscriptions, date_range)),
+        (['paused'], 180, 30, np.full(num_subscriptions, date_range)),
+    ]
+    for statuses, cap_days, min_days, rule_end in lifecycle_rules:
+        mask = np.isin(status, statuses) & ~forced_churn
+        max_active_days = np.minimum(cap_days, np.maximum(0, rule_end - start_offset))
+        short = mask & (max_active_days <= min_days)
+        end_offset[short] = rule_end[short]
+        long_ = mask & ~short
+        days_active = _random_days(np.full(long_.sum(), min_days), max_active_days[long_].astype(np.int64))
+        end_offset[long_] = np.minimum(start_offset[long_] + days_active, rule_end[long_])
+    # A subscription drawn to start after its customer churned would otherwise end before it
+    # starts (and be rejected at load); it ends the day it starts instead. NaN stays open-ended.
+    end_offset = np.maximum(end_offset, start_offset)
+    
+    has_end = ~np.isnan(end_offset)
+    updated_offset = np.minimum(
+        date_range,
+        np.where(has_end, end_offset, start_offset + np.random.randint(0, 30, size=num_subscriptions))
+    )
+    
+    start_dates = _offsets_to_dates(start_offset, start_date)
+    
+    return pd.DataFrame({
+        'subscription_id': np.arange(first_subscription_id, first_subscription_id + num_subscriptions),
+        'customer_id': customers['customer_id'][customer_pos],
+        'plan_id': plan_id,
+        'start_date': start_dates,
+        'end_date': _offsets_to_dates(end_offset, start_date),
+        'status': status,
+        'mrr_amount': np.round(mrr_amount, 2),
+        'billing_cycle': billing_cycle,
+        'amount': base_price,
+        'created_at': start_dates,
+        'updated_at': _offsets_to_dates(updated_offset, start_date),
+    })
 
 
-def generate_payments(subscriptions_df: pd.DataFrame, num_payments: int) -> pd.DataFrame:
+def _add_months(dates: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """
+    Shift datetime64[D] dates by whole months, clamping the day of month.
+
+    A subscription started on Jan 31 bills on Feb 28/29, Mar 31, Apr 30, ...
     """
-    Generate payment transaction records.
+    start_month = dates.astype('datetime64[M]')
+    day_of_month = (dates - start_month.astype('datetime64[D]')).astype(np.int64)
+    target_month = start_month + months.astype('timedelta64[M]')
+    month_days = ((target_month + 1).astype('datetime64[D]') - target_month.astype('datetime64[D]')).astype(np.int64)
+    return target_month.astype('datetime64[D]') + np.minimum(day_of_month, month_days - 1).astype('timedelta64[D]')
+
+
+def _billing_periods(start: np.ndarray, end: np.ndarray, cycle_months: np.ndarray) -> np.ndarray:
+    """Count billing anniversaries falling in [start, end) for each subscription."""
+    months_span = (end.astype('datetime64[M]') - start.astype('datetime64[M]')).astype(np.int64)
+    last_in_range = months_span - (_add_months(start, months_span) >= end)
+    return np.maximum(last_in_range, -1) // cycle_months + 1
+
+
+def iter_payment_chunks(
+    subscriptions_df: pd.DataFrame,
+    num_payments: int,
+    chunk_size: int = PAYMENT_BATCH_SIZE,
+    first_payment_id: int = 1,
+    end_date: datetime = END_DATE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Generate payment transaction records as fixed-size batches.
     
     Args:
         subscriptions_df: Subscriptions DataFrame
-        num_payments: Number of payment records
+        num_payments: Total number of payment records
+        chunk_size: Number of payments computed per vectorized batch
+        first_payment_id: payment_id of the first generated row
+        end_date: End of the simulated history (billing horizon for open subscriptions)
         
-    Returns:
-        DataFrame with payment data
+    Yields:
+        DataFrames of at most chunk_size payments; exactly num_payments rows in total
         
     Business Logic:
     - Payments linked to active subscriptions
     - 5% failure rate
-    - Payment dates align with billing cycles
+    - Payment dates land on the subscription's monthly or annual billing
+      anniversary between start_date and end_date (end of history if still open)
+    - Subscriptions are sampled in proportion to their number of billing periods,
+      so long-lived subscriptions accumulate more payments
     """
     logger.info(f"Generating {num_payments} payment records...")
     
-    payments = []
-    payment_id = 1
-    
     # Filter to subscriptions that should have payments
-    active_subscriptions = subscriptions_df[
+    billable = subscriptions_df[
         (subscriptions_df['status'].isin(['active', 'paused'])) |
         ((subscriptions_df['status'] == 'churned') & subscriptions_df['end_date'].notna())
     ]
+    start = billable['start_date'].to_numpy().astype('datetime64[D]')
+    end = billable['end_date'].fillna(pd.Timestamp(end_date)).to_numpy().astype('datetime64[D]')
     
-    for i in range(num_payments):
-        subscription = active_subscriptions.sample(1).iloc[0]
-        
-        # Payment date (within subscription period)
-        start_date = subscription['start_date']
-        end_date = subscription['end_date'] if pd.notna(subscription['end_date']) else END_DATE
+    # Subscriptions shorter than a day have no billing anniversary to pay on
+    has_period = end > start
+    start, end = start[has_period], end[has_period]
+    subscription_ids = billable['subscription_id'].to_numpy()[has_period]
+    amounts = billable['amount'].to_numpy()[has_period]
+    cycle_months = np.where(billable['billing_cycle'].to_numpy()[has_period] == 'annual', 12, 1)
+    
+    if num_payments > 0 and len(start) == 0:
+        raise ValueError("No billable subscriptions to generate payments for")
+    
+    periods = _billing_periods(start, end, cycle_months)
+    cumulative_weights = np.cumsum(periods, dtype=np.float64)
+    cumulative_weights /= cumulative_weights[-1] if len(cumulative_weights) else 1.0
+    
+    for batch_start in range(0, num_payments, chunk_size):
+        n = min(chunk_size, num_payments - batch_start)
         
-        if (end_date - start_date).days < 1:
-            continue
-        
-        payment_date = start_date + timedelta(
-            days=np.random.randint(0, (end_date - start_date).days)
-        )
+        # Pick subscriptions weighted by billing periods, then one of their anniversaries
+        idx = np.minimum(np.searchsorted(cumulative_weights, np.random.random(n), side='right'), len(start) - 1)
+        period = np.floor(np.random.random(n) * periods[idx]).astype(np.int64)
+        payment_date = _add_months(start[idx], period * cycle_months[idx])
         
         # Payment status (5% failure rate)
-        status = np.random.choice(
-            ['success', 'failed', 'refunded'],
-            p=[0.92, 0.05, 0.03]
-        )
+        status = np.random.choice(['success', 'failed', 'refunded'], size=n, p=[0.92, 0.05, 0.03]).astype(object)
         
         # Payment amount matches subscription amount
-        amount = subscription['amount']
-        if status == 'refunded':
-            amount = -amount  # Negative for refunds
-        
-        payments.append({
-            'payment_id': payment_id,
-            'subscription_id': subscription['subscription_id'],
-            'payment_date': payment_date,
+        amount = np.where(status == 'refunded', -amounts[idx], amounts[idx])  # Negative for refunds
+        
+        payment_dates = pd.to_datetime(payment_date)
+        yield pd.DataFrame({
+            'payment_id': np.arange(first_payment_id + batch_start, first_payment_id + batch_start + n),
+            'subscription_id': subscription_ids[idx],
+            'payment_date': payment_dates,
             'amount': amount,
             'status': status,
-            'payment_method': np.random.choice(['credit_card', 'bank_transfer', 'paypal']),
-            'created_at': payment_date
+            'payment_method': np.random.choice(['credit_card', 'bank_transfer', 'paypal'], size=n).astype(object),
+            'created_at': payment_dates,
         })
-        
-        payment_id += 1
+
+
+def generate_payments(
+    subscriptions_df: pd.DataFrame,
+    num_payments: int,
+    batch_size: int = PAYMENT_BATCH_SIZE,
+    first_payment_id: int = 1,
+    end_date: datetime = END_DATE,
+) -> pd.DataFrame:
+    """
+    Generate payment transaction records in memory.
     
-    return pd.DataFrame(payments)
+    Args:
+        subscriptions_df: Subscriptions DataFrame
+        num_payments: Number of payment records
+        batch_size: Number of payments computed per vectorized batch
+        first_payment_id: payment_id of the first generated row
+        end_date: End of the simulated history
+        
+    Returns:
+        DataFrame with exactly num_payments payment rows (use iter_payment_chunks for large volumes)
+    """
+    batches = list(iter_payment_chunks(subscriptions_df, num_payments, batch_size, first_payment_id, end_date))
+    if not batches:
+        return pd.DataFrame(columns=PAYMENT_COLUMNS)
+    return pd.concat(batches, ignore_index=True)
 
 
-def generate_usage_events(customers_df: pd.DataFrame, num_events: int) -> pd.DataFrame:
+def iter_usage_event_chunks(
+    customers_df: pd.DataFrame,
+    num_events: int,
+    chunk_size: int = USAGE_EVENT_CHUNK_SIZE,
+    first_event_id: int = 1,
+    start_date: datetime = START_DATE,
+    end_date: datetime = END_DATE,
+) -> Iterator[pd.DataFrame]:
     """
-    Generate product usage event logs.
+    Generate product usage event logs as fixed-size columnar chunks.
     
     Args:
         customers_df: Customers DataFrame
-        num_events: Number of usage events
+        num_events: Total number of usage events
+        chunk_size: Maximum number of events per yielded chunk
+        first_event_id: event_id of the first generated row
+        start_date: Start of the simulated history
+        end_date: End of the simulated history
         
-    Returns:
-        DataFrame with usage event data
+    Yields:
+        DataFrames of at most chunk_size usage events, with contiguous event_ids
         
     Business Logic:
     - Events correlated with customer retention
     - Active customers have more events
     - Event types: login, feature_usage, export, api_call
+    - Only one chunk is materialized at a time, so peak memory is bounded by
+      chunk_size rather than num_events
     """
-    logger.info(f"Generating {num_events} usage event records...")
+    logger.info(f"Generating {num_events} usage event records in chunks of {chunk_size}...")
     
-    events = []
-    event_id = 1
+    customers = _customer_arrays(customers_df, start_date)
+    date_range = (end_date - start_date).days
+    signup_offset = customers['signup_offset']
+    end_offset = np.nan_to_num(customers['end_offset'], nan=date_range).astype(np.int64)
+    
+    # Event date (after signup, before end_date if churned); skip customers with no window
+    positions = np.flatnonzero(end_offset - signup_offset >= 1)
+    if num_events > 0 and len(positions) == 0:
+        raise ValueError("No customers with a usage window to generate events for")
     
     # Weight events towards active customers
-    active_customers = customers_df[customers_df['account_status'] == 'active']
-    customer_ids = list(active_customers['customer_id']) * 3 + list(customers_df['customer_id'])
-    np.random.shuffle(customer_ids)
+    is_active = customers['is_active'][positions]
+    customer_pool = np.concatenate([np.tile(positions[is_active], 3), positions])
+    np.random.shuffle(customer_pool)
     
-    event_types = ['login', 'feature_usage', 'export', 'api_call']
+    event_types = np.array(['login', 'feature_usage', 'export', 'api_call'], dtype=object)
     event_weights = [0.4, 0.3, 0.15, 0.15]
     
-    for i in range(num_events):
-        customer_id = customer_ids[i % len(customer_ids)]
-        customer = customers_df[customers_df['customer_id'] == customer_id].iloc[0]
-        
-        # Event date (after signup, before end_date if churned)
-        signup_date = customer['signup_date']
-        end_date = customer['end_date'] if pd.notna(customer['end_date']) else END_DATE
+    for chunk_start in range(0, num_events, chunk_size):
+        n = min(chunk_size, num_events - chunk_start)
+        pos = customer_pool[np.arange(chunk_start, chunk_start + n) % len(customer_pool)]
         
-        if (end_date - signup_date).days < 1:
-            continue
-        
-        event_date = signup_date + timedelta(
-            days=np.random.randint(0, (end_date - signup_date).days)
-        )
-        
-        # Event type
-        event_type = np.random.choice(event_types, p=event_weights)
+        event_dates = _offsets_to_dates(_random_days(signup_offset[pos], end_offset[pos]), start_date)
+        event_type = event_types[np.random.choice(len(event_types), size=n, p=event_weights)]
         
         # Usage quantity (higher for active customers)
-        base_quantity = 1 if event_type == 'login' else np.random.randint(1, 100)
-        if customer['account_status'] == 'active':
-            usage_quantity = base_quantity * np.random.randint(1, 5)
-        else:
-            usage_quantity = base_quantity
+        base_quantity = np.where(event_type == 'login', 1, np.random.randint(1, 100, size=n))
+        multiplier = np.where(customers['is_active'][pos], np.random.randint(1, 5, size=n), 1)
         
-        events.append({
-            'event_id': event_id,
-            'customer_id': customer_id,
-            'event_date': event_date,
+        yield pd.DataFrame({
+            'event_id': np.arange(first_event_id + chunk_start, first_event_id + chunk_start + n),
+            'customer_id': customers['customer_id'][pos],
+            'event_date': event_dates,
             'event_type': event_type,
-            'usage_quantity': usage_quantity,
-            'created_at': event_date
+            'usage_quantity': base_quantity * multiplier,
+            'created_at': event_dates,
         })
-        
-        event_id += 1
+
+
+def generate_usage_events(customers_df: pd.DataFrame, num_events: int) -> pd.DataFrame:
+    """
+    Generate product usage event logs in memory.
     
-    return pd.DataFrame(events)
+    Args:
+        customers_df: Customers DataFrame
+        num_events: Number of usage events
+        
+    Returns:
+        DataFrame with usage event data (use iter_usage_event_chunks for large volumes)
+    """
+    chunks = list(iter_usage_event_chunks(customers_df, num_events))
+    if not chunks:
+        return pd.DataFrame(columns=USAGE_EVENT_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
 
 
-def generate_support_tickets(customers_df: pd.DataFrame, num_tickets: int) -> pd.DataFrame:
+def generate_support_tickets(
+    customers_df: pd.DataFrame,
+    num_tickets: int,
+    first_ticket_id: int = 1,
+    start_date: datetime = START_DATE,
+    end_date: datetime = END_DATE,
+) -> pd.DataFrame:
     """
     Generate customer support ticket records.
     
     Args:
         customers_df: Customers DataFrame
         num_tickets: Number of support tickets
+        first_ticket_id: ticket_id of the first generated row
+        start_date: Start of the simulated history
+        end_date: End of the simulated history
         
     Returns:
-        DataFrame with support ticket data
+        DataFrame with exactly num_tickets support ticket rows
         
     Business Logic:
     - Tickets correlated with churn risk
     - Categories: billing, technical, feature_request, other
     - Satisfaction scores (1-5)
+    - Drawn in one vectorized pass, like the other generators, so sharded runs
+      produce predictable, contiguous ticket_ids
     """
     logger.info(f"Generating {num_tickets} support ticket records...")
     
-    tickets = []
-    ticket_id = 1
+    customers = _customer_arrays(customers_df, start_date)
+    date_range = (end_date - start_date).days
+    signup_offset = customers['signup_offset']
+    end_offset = np.nan_to_num(customers['end_offset'], nan=date_range).astype(np.int64)
     
-    categories = ['billing', 'technical', 'feature_request', 'other']
-    priorities = ['low', 'medium', 'high', 'urgent']
+    # Ticket created date (customers with no active window cannot open tickets)
+    positions = np.flatnonzero(end_offset - signup_offset >= 1)
+    if num_tickets > 0 and len(positions) == 0:
+        raise ValueError("No customers with an active window to generate tickets for")
+    pos = positions[np.random.randint(0, max(len(positions), 1), size=num_tickets)]
+    created_offset = _random_days(signup_offset[pos], end_offset[pos])
     
-    for i in range(num_tickets):
-        customer = customers_df.sample(1).iloc[0]
-        customer_id = customer['customer_id']
-        
-        # Ticket created date
-        signup_date = customer['signup_date']
-        end_date = customer['end_date'] if pd.notna(customer['end_date']) else END_DATE
-        
-        if (end_date - signup_date).days < 1:
-            continue
+    # Resolved date (80% resolved, average 3 days)
+    is_resolved = np.random.random(num_tickets) < 0.8
+    resolution_days = np.minimum(np.random.exponential(3, size=num_tickets), 30).astype(np.int64)
+    resolved_offset = np.where(is_resolved, np.minimum(created_offset + resolution_days, end_offset[pos]), np.nan)
+    
+    # Satisfaction score (1-5, weighted towards 3-4); unresolved tickets have no score
+    satisfaction_score = np.random.choice([1, 2, 3, 4, 5], size=num_tickets, p=[0.1, 0.15, 0.3, 0.35, 0.1])
+    
+    created_dates = _offsets_to_dates(created_offset, start_date)
+    
+    return pd.DataFrame({
+        'ticket_id': np.arange(first_ticket_id, first_ticket_id + num_tickets),
+        'customer_id': customers['customer_id'][pos],
+        'created_date': created_dates,
+        'resolved_date': _offsets_to_dates(resolved_offset, start_date),
+        'category': np.random.choice(['billing', 'technical', 'feature_request', 'other'], size=num_tickets).astype(object),
+        'priority': np.random.choice(['low', 'medium', 'high', 'urgent'], size=num_tickets).astype(object),
+        'satisfaction_score': np.where(is_resolved, satisfaction_score, np.nan),
+        'created_at': created_dates,
+    })
+
+
+def build_subscription_change_log(subscriptions_df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Expand final subscription states into a CDC-style change log.
+    
+    Args:
+        subscriptions_df: Final subscription states from generate_subscriptions
+        rng: Generator for transition draws (kept apart from the global stream so
+            the final states are identical with or without the change log)
+            
+    Returns:
+        Every version of every subscription, ordered by (subscription_id, updated_at);
+        the last version of each subscription is its row in subscriptions_df
         
-        created_date = signup_date + timedelta(
-            days=np.random.randint(0, (end_date - signup_date).days)
-        )
+    Business Logic:
+    - Any subscription not still on its original active state gets a creation
+      version: status 'active', no end_date, updated_at = start_date
+    - CHANGE_LOG_INTERMEDIATE_STATUSES adds a middle version (e.g. active ->
+      paused -> churned) on a random day strictly between start and the final update
+    - Versions need distinct updated_at days, so short-lived subscriptions keep
+      fewer versions
+    """
+    n = len(subscriptions_df)
+    status = subscriptions_df['status'].to_numpy()
+    start = subscriptions_df['start_date'].to_numpy().astype('datetime64[D]')
+    span = (subscriptions_df['updated_at'].to_numpy().astype('datetime64[D]') - start).astype(np.int64)
+    
+    intermediate = np.full(n, None, dtype=object)
+    draw = rng.random(n)
+    for final_status, options in CHANGE_LOG_INTERMEDIATE_STATUSES.items():
+        threshold = 0.0
+        for intermediate_status, probability in options.items():
+            intermediate[(status == final_status) & (draw >= threshold) & (draw < threshold + probability)] = intermediate_status
+            threshold += probability
+    
+    has_intermediate = pd.notna(intermediate) & (span >= 2)
+    has_created = ((status != 'active') | has_intermediate) & (span >= 1)
+    
+    created = subscriptions_df[has_created].copy()
+    created['status'] = 'active'
+    created['end_date'] = pd.NaT
+    created['updated_at'] = created['start_date']
+    
+    middle = subscriptions_df[has_intermediate].copy()
+    middle['status'] = intermediate[has_intermediate]
+    middle['end_date'] = pd.NaT
+    middle['updated_at'] = pd.to_datetime(start[has_intermediate] + rng.integers(1, span[has_intermediate]))
+    
+    log = pd.concat([created, middle, subscriptions_df], ignore_index=True)
+    return log.sort_values(['subscription_id', 'updated_at'], kind='mergesort').reset_index(drop=True)
+
+
+def build_customer_change_log(customers_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expand final customer states into a CDC-style change log.
+    
+    Args:
+        customers_df: Final customer states from generate_customers
         
-        # Resolved date (80% resolved, average 3 days)
-        resolved_date = None
-        if np.random.random() < 0.8:
-            resolution_days = np.random.exponential(3)
-            resolved_date = created_date + timedelta(days=int(min(resolution_days, 30)))
-            resolved_date = min(resolved_date, end_date)
-        
-        # Satisfaction score (1-5, weighted towards 3-4)
-        satisfaction_score = np.random.choice([1, 2, 3, 4, 5], p=[0.1, 0.15, 0.3, 0.35, 0.1])
-        if resolved_date is None:
-            satisfaction_score = None  # Unresolved tickets have no score
-        
-        tickets.append({
-            'ticket_id': ticket_id,
-            'customer_id': customer_id,
-            'created_date': created_date,
-            'resolved_date': resolved_date,
-            'category': np.random.choice(categories),
-            'priority': np.random.choice(priorities),
-            'satisfaction_score': satisfaction_score,
-            'created_at': created_date
-        })
+    Returns:
+        Every version of every customer, ordered by (customer_id, updated_at)
         
-        ticket_id += 1
+    Business Logic:
+    - Churned customers get an earlier 'active' version with no end_date,
+      updated at signup (when churn happened after the signup day)
+    """
+    churned = (customers_df['account_status'] == 'churned') & (customers_df['updated_at'] > customers_df['signup_date'])
+    created = customers_df[churned].copy()
+    created['account_status'] = 'active'
+    created['end_date'] = pd.NaT
+    created['updated_at'] = created['signup_date']
     
-    return pd.DataFrame(tickets)
+    log = pd.concat([created, customers_df], ignore_index=True)
+    return log.sort_values(['customer_id', 'updated_at'], kind='mergesort').reset_index(drop=True)
 
 
 def save_to_csv(df: pd.DataFrame, filename: str, output_dir: str = '../data/raw'):
@@ -492,13 +932,433 @@ def save_to_csv(df: pd.DataFrame, filename: str, output_dir: str = '../data/raw'
     logger.info(f"Saved {len(df)} rows to {filepath}")
 
 
-def load_to_duckdb(csv_dir: str = '../data/raw', db_path: str = '../data/warehouse/saas_analytics.duckdb'):
+def write_chunks_to_csv(
+    chunks: Iterable[pd.DataFrame],
+    filename: str,
+    output_dir: str = '../data/raw',
+    total_rows: Optional[int] = None,
+) -> int:
     """
-    Load CSV files into DuckDB database.
+    Stream DataFrame chunks into a single CSV file.
+    
+    Each chunk is appended and flushed before the next one is generated, so peak
+    memory is bounded by the chunk size. Progress and throughput are logged per chunk.
+    
+    Args:
+        chunks: Iterable of DataFrames sharing the same columns
+        filename: Output CSV file name
+        output_dir: Directory to write into
+        total_rows: Expected total row count, used for progress percentages
+        
+    Returns:
+        Number of rows written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = os.path.join(output_dir, filename)
+    rows_written = 0
+    started = chunk_started = time.perf_counter()
+    
+    with open(filepath, 'w', newline='') as f:
+        # Chunk timings include producing the chunk, since generation happens lazily
+        for chunk_number, chunk in enumerate(chunks, start=1):
+            chunk.to_csv(f, header=(chunk_number == 1), index=False)
+            f.flush()
+            rows_written += len(chunk)
+            chunk_started = _log_chunk_progress(
+                filename, chunk_number, len(chunk), rows_written, total_rows, started, chunk_started
+            )
+    
+    logger.info(f"Saved {rows_written} rows to {filepath}")
+    return rows_written
+
+
+def _log_chunk_progress(
+    name: str,
+    chunk_number: int,
+    chunk_rows: int,
+    rows_written: int,
+    total_rows: Optional[int],
+    started: float,
+    chunk_started: float,
+) -> float:
+    """Log per-chunk progress and throughput; returns the timestamp the next chunk starts at."""
+    now = time.perf_counter()
+    progress = f" ({rows_written / total_rows:.1%})" if total_rows else ""
+    logger.info(
+        f"  {name} chunk {chunk_number}: {rows_written:,} rows{progress}, "
+        f"{chunk_rows / max(now - chunk_started, 1e-9):,.0f} rows/sec (chunk), "
+        f"{rows_written / max(now - started, 1e-9):,.0f} rows/sec (overall)"
+    )
+    return now
+
+
+def to_arrow_table(df: pd.DataFrame, table: str):
+    """
+    Convert a generated DataFrame into an Arrow table with the declared column types.
+    
+    Args:
+        df: DataFrame produced by one of the generators
+        table: Raw table name (key of TABLE_SCHEMAS)
+        
+    Returns:
+        pyarrow.Table with dates as date32 and amounts as float64
+    """
+    import pyarrow as pa
+    
+    arrow_types = {
+        'BIGINT': pa.int64(),
+        'INTEGER': pa.int32(),
+        'DOUBLE': pa.float64(),
+        'VARCHAR': pa.string(),
+        'DATE': pa.date32(),
+    }
+    columns = TABLE_SCHEMAS[table]
+    schema = pa.schema([(name, arrow_types[sql_type]) for name, sql_type in columns.items()])
+    return pa.Table.from_pandas(df[list(columns)], schema=schema, preserve_index=False)
+
+
+def write_chunks_to_parquet(
+    chunks: Iterable[pd.DataFrame],
+    table: str,
+    output_dir: str = '../data/raw',
+    part_name: str = 'part-00000',
+    compression: str = DEFAULT_PARQUET_COMPRESSION,
+    total_rows: Optional[int] = None,
+) -> int:
+    """
+    Stream DataFrame chunks into typed Parquet files under <output_dir>/<table>/.
+    
+    Tables listed in PARQUET_PARTITION_COLUMNS are hive-partitioned by month
+    (<table>/month=YYYY-MM/...), with one file per chunk and month. Other tables
+    are written as a single file with one row group per chunk.
+    
+    Args:
+        chunks: Iterable of DataFrames for one raw table
+        table: Raw table name (key of TABLE_SCHEMAS)
+        output_dir: Root directory for Parquet datasets
+        part_name: File name prefix, unique per writer (e.g. per shard)
+        compression: Parquet compression codec (zstd, snappy, gzip, lz4, brotli, none)
+        total_rows: Expected total row count, used for progress percentages
+        
+    Returns:
+        Number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    table_dir = os.path.join(output_dir, table)
+    os.makedirs(table_dir, exist_ok=True)
+    partition_column = PARQUET_PARTITION_COLUMNS.get(table)
+    writer = None
+    rows_written = 0
+    started = chunk_started = time.perf_counter()
+    
+    try:
+        for chunk_number, chunk in enumerate(chunks, start=1):
+            arrow_table = to_arrow_table(chunk, table)
+            if partition_column:
+                months = chunk[partition_column].to_numpy().astype('datetime64[M]').astype(str)
+                pq.write_to_dataset(
+                    arrow_table.append_column(PARQUET_PARTITION_KEY, pa.array(months)),
+                    table_dir,
+                    partition_cols=[PARQUET_PARTITION_KEY],
+                    basename_template=f"{part_name}-{chunk_number:05d}-{{i}}.parquet",
+                    compression=compression,
+                )
+            else:
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        os.path.join(table_dir, f"{part_name}.parquet"), arrow_table.schema, compression=compression
+                    )
+                writer.write_table(arrow_table)
+            rows_written += len(chunk)
+            chunk_started = _log_chunk_progress(
+                table, chunk_number, len(chunk), rows_written, total_rows, started, chunk_started
+            )
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    logger.info(f"Saved {rows_written} rows to {table_dir}")
+    return rows_written
+
+
+def write_table(
+    chunks: Iterable[pd.DataFrame],
+    table: str,
+    output_dir: str = '../data/raw',
+    output_format: str = 'csv',
+    part_name: Optional[str] = None,
+    compression: str = DEFAULT_PARQUET_COMPRESSION,
+    total_rows: Optional[int] = None,
+) -> int:
+    """
+    Write one raw table in the requested output format.
     
     Args:
-        csv_dir: Directory containing CSV files
+        chunks: Iterable of DataFrames for the table
+        table: Raw table name
+        output_dir: Output directory
+        output_format: 'csv' (<table>.csv), 'parquet' (<table>/ dataset), or 'none' to
+            only drain the chunks (e.g. when they are loaded straight into DuckDB)
+        part_name: Shard part name; CSV parts are written as <table>.<part_name>.csv
+        compression: Parquet compression codec
+        total_rows: Expected total row count, used for progress percentages
+        
+    Returns:
+        Number of rows written
+    """
+    if output_format == 'none':
+        return sum(len(chunk) for chunk in chunks)
+    if output_format == 'parquet':
+        return write_chunks_to_parquet(
+            chunks, table, output_dir,
+            part_name=part_name or 'part-00000',
+            compression=compression,
+            total_rows=total_rows,
+        )
+    filename = f"{table}.{part_name}.csv" if part_name else f"{table}.csv"
+    return write_chunks_to_csv(chunks, filename, output_dir, total_rows=total_rows)
+
+
+def create_table_sql(table: str, name: Optional[str] = None, replace: bool = True) -> str:
+    """DDL for a raw table with its declared TABLE_SCHEMAS column types."""
+    columns = ', '.join(f"{column} {dtype}" for column, dtype in TABLE_SCHEMAS[table].items())
+    create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+    return f"{create} {name or table} ({columns})"
+
+
+def create_rejects_table_sql(table: str, name: Optional[str] = None, replace: bool = True) -> str:
+    """
+    DDL for <table>_rejects: the declared columns (null where a value did not parse),
+    the reason codes, the raw row as JSON and the load timestamp.
+    """
+    columns = ', '.join(f"{column} {dtype}" for column, dtype in TABLE_SCHEMAS[table].items())
+    create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+    return (
+        f"{create} {name or table + REJECTS_SUFFIX} ({columns}, reject_reasons VARCHAR[], "
+        f"raw_record VARCHAR, rejected_at TIMESTAMP DEFAULT current_timestamp)"
+    )
+
+
+def validation_sql(table: str, source_sql: str, typed_source: bool = False) -> str:
+    """
+    Wrap a raw source query with the table's ingest checks.
+    
+    Args:
+        table: Raw table name (key of TABLE_SCHEMAS / VALIDATION_RULES)
+        source_sql: SELECT producing the table's declared columns, in order
+        typed_source: True when the source already carries the declared types
+            (Parquet, Arrow); False for all-VARCHAR CSV input, which adds type checks
+            
+    Returns:
+        SELECT yielding the typed declared columns plus reject_reasons (VARCHAR[],
+        empty for valid rows) and raw_record (JSON of the raw values, rejects only).
+        Every check is an expression over the same row, so the source is scanned once.
+    """
+    schema = TABLE_SCHEMAS[table]
+    rules = VALIDATION_RULES.get(table, {})
+    
+    def typed(column: str) -> str:
+        return f"src.{column}" if typed_source else f"TRY_CAST(src.{column} AS {schema[column]})"
+    
+    checks = []
+    if not typed_source:
+        checks += [
+            f"CASE WHEN src.{column} IS NOT NULL AND {typed(column)} IS NULL THEN 'invalid_type:{column}' END"
+            for column in schema
+        ]
+    checks += [f"CASE WHEN src.{column} IS NULL THEN 'null_key:{column}' END" for column in rules.get('keys', [])]
+    for column, values in rules.get('enums', {}).items():
+        domain = ', '.join(f"'{value}'" for value in values)
+        checks.append(f"CASE WHEN lower(trim(src.{column})) NOT IN ({domain}) THEN 'bad_enum:{column}' END")
+    for start, end in rules.get('date_order', []):
+        checks.append(f"CASE WHEN {typed(start)} > {typed(end)} THEN 'date_order:{start}>{end}' END")
+    for column in rules.get('non_negative', []):
+        checks.append(f"CASE WHEN {typed(column)} < 0 THEN 'bad_sign:{column}' END")
+    for column, negative_status in rules.get('signed_by_status', {}).items():
+        checks.append(
+            f"CASE WHEN (lower(trim(src.status)) = '{negative_status}') <> ({typed(column)} <= 0) "
+            f"THEN 'bad_sign:{column}' END"
+        )
+    
+    reasons = f"list_filter([{', '.join(checks)}]::VARCHAR[], r -> r IS NOT NULL)" if checks else "[]::VARCHAR[]"
+    raw_struct = ', '.join(f"{column} := checked.{column}" for column in schema)
+    outer_columns = ', '.join(
+        f"checked.{column} AS {column}" if typed_source else f"TRY_CAST(checked.{column} AS {dtype}) AS {column}"
+        for column, dtype in schema.items()
+    )
+    return f"""
+        SELECT
+            {outer_columns},
+            checked.reject_reasons,
+            CASE WHEN len(checked.reject_reasons) > 0 THEN CAST(to_json(struct_pack({raw_struct})) AS VARCHAR) END AS raw_record
+        FROM (
+            SELECT src.*, {reasons} AS reject_reasons
+            FROM ({source_sql}) src
+        ) checked
+    """
+
+
+def split_rejects(batch, table: str):
+    """
+    Split one validated Arrow batch into (valid rows, rejected rows).
+    
+    Valid rows keep only the declared columns; rejected rows keep everything
+    validation_sql produced. Batches without rejects are passed through unfiltered.
+    """
+    import pyarrow.compute as pc
+    
+    columns = list(TABLE_SCHEMAS[table])
+    rejected = pc.greater(pc.list_value_length(batch.column('reject_reasons')), 0)
+    if not pc.any(rejected).as_py():
+        return batch.select(columns), batch.slice(0, 0)
+    return batch.filter(pc.invert(rejected)).select(columns), batch.filter(rejected)
+
+
+def insert_validated(conn, table: str, batch, target: Optional[str] = None, rejects_target: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Insert a validated Arrow batch, routing rejected rows to the rejects table.
+    
+    Args:
+        conn: DuckDB connection or cursor
+        table: Raw table name
+        batch: Arrow table/record batch produced by validation_sql
+        target: Table receiving valid rows (defaults to table)
+        rejects_target: Table receiving rejected rows (defaults to <table>_rejects)
+        
+    Returns:
+        (rows loaded, rows rejected)
+    """
+    import pyarrow as pa
+    
+    if isinstance(batch, pa.RecordBatch):
+        # DuckDB 0.9 can register Arrow tables but not bare record batches; wrapping is zero-copy
+        batch = pa.Table.from_batches([batch])
+    valid, rejects = split_rejects(batch, table)
+    target = target or table
+    rejects_target = rejects_target or f"{table}{REJECTS_SUFFIX}"
+    if valid.num_rows:
+        conn.register('valid_chunk', valid)
+        try:
+            conn.execute(f"INSERT INTO {target} SELECT * FROM valid_chunk")
+        finally:
+            conn.unregister('valid_chunk')
+    if rejects.num_rows:
+        columns = ', '.join(TABLE_SCHEMAS[table])
+        conn.register('rejected_chunk', rejects)
+        try:
+            conn.execute(
+                f"INSERT INTO {rejects_target} ({columns}, reject_reasons, raw_record) SELECT * FROM rejected_chunk"
+            )
+        finally:
+            conn.unregister('rejected_chunk')
+    return valid.num_rows, rejects.num_rows
+
+
+def _raw_reader_sql(table: str, source_path: str, input_format: str) -> str:
+    """
+    SELECT over a raw input file that yields the table's declared columns, in order.
+    
+    CSVs are read with auto-detection off and every column as VARCHAR, so no
+    type sniffing happens; validation_sql then casts each value to its
+    declared type and rejects the row if it does not parse.
+    """
+    schema = TABLE_SCHEMAS[table]
+    if input_format == 'parquet':
+        # Partition directories only exist for routing; the month key is not a column
+        return f"SELECT {', '.join(schema)} FROM read_parquet('{source_path}/**/*.parquet', hive_partitioning = false)"
+    
+    with open(source_path) as f:
+        header = f.readline().rstrip('\r\n').split(',')
+    if header != list(schema):
+        raise ValueError(f"{source_path} header {header} does not match declared schema {list(schema)}")
+    # Everything is read as text; validation_sql casts and rejects unparseable values
+    columns = ', '.join(f"'{column}': 'VARCHAR'" for column in schema)
+    return f"SELECT * FROM read_csv('{source_path}', header = true, auto_detect = false, columns = {{{columns}}})"
+
+
+def _load_staging_table(
+    conn,
+    table: str,
+    source_path: str,
+    input_format: str,
+    cluster_by_date: bool = False,
+    stage_records: Optional[List] = None,
+) -> Tuple[int, int]:
+    """
+    Validate and load one raw input into <table>__staging and <table>_rejects__staging.
+    
+    The validated source is streamed once as Arrow record batches on a reader
+    cursor; each batch is split and inserted on a writer cursor. Returns
+    (rows loaded, rows rejected), counted from the batches themselves.
+    With cluster_by_date, CLUSTER_KEYS tables are inserted in key order. With
+    stage_records, the load is recorded as a load_<table> stage.
+    """
+    staging = f"{table}{LOAD_STAGING_SUFFIX}"
+    rejects_staging = f"{table}{REJECTS_SUFFIX}{LOAD_STAGING_SUFFIX}"
+    with stage_metrics.measure_stage(f'load_{table}', stage_records) as stats:
+        reader, writer = stage_metrics.profiled(conn.cursor()), stage_metrics.profiled(conn.cursor())
+        try:
+            logger.info(f"Loading {table}...")
+            writer.execute(create_table_sql(table, staging))
+            writer.execute(create_rejects_table_sql(table, rejects_staging))
+            
+            query = validation_sql(
+                table, _raw_reader_sql(table, source_path, input_format), typed_source=input_format == 'parquet'
+            )
+            if cluster_by_date and table in CLUSTER_KEYS:
+                query += f" ORDER BY {', '.join(CLUSTER_KEYS[table])}"
+            loaded = rejected = 0
+            writer.begin()
+            for batch in reader.execute(query).fetch_record_batch(LOAD_BATCH_ROWS):
+                batch_loaded, batch_rejected = insert_validated(writer, table, batch, staging, rejects_staging)
+                loaded += batch_loaded
+                rejected += batch_rejected
+            writer.commit()
+            logger.info(f"  Staged {loaded} rows for {table} ({rejected} rejected)")
+        finally:
+            reader.close()
+            writer.close()
+        stats.rows_scanned = loaded + rejected
+        stats.rows_returned = loaded
+    return loaded, rejected
+
+
+def load_to_duckdb(
+    csv_dir: str = '../data/raw',
+    db_path: str = '../data/warehouse/saas_analytics.duckdb',
+    input_format: str = 'csv',
+    max_workers: Optional[int] = None,
+    cluster_by_date: bool = False,
+    stage_records: Optional[List] = None,
+) -> Dict[str, int]:
+    """
+    Load CSV files or Parquet datasets into DuckDB database.
+    
+    Args:
+        csv_dir: Directory containing CSV files (or <table>/ Parquet datasets)
         db_path: Path to DuckDB database file
+        input_format: 'csv' to parse <table>.csv, 'parquet' to scan <table>/**/*.parquet
+        max_workers: Tables loaded concurrently (defaults to one per table, capped at the CPU count)
+        cluster_by_date: Sort CLUSTER_KEYS tables by date then customer/subscription on load
+        stage_records: If given, a load_<table> stage record per table is appended to it
+        
+    Returns:
+        Rows loaded per table and per <table>_rejects table (empty if DuckDB is
+        not installed or no input was found)
+        
+    Raises:
+        RuntimeError: If any table failed to load; nothing was replaced
+        
+    Business Logic:
+        - Every table is created from TABLE_SCHEMAS and filled in its own
+          <table>__staging table, all tables in parallel
+        - Rows failing VALIDATION_RULES are diverted to <table>_rejects with
+          reason codes in the same pass that reads the file
+        - Only when every staging load succeeds are the live tables dropped and
+          the staging tables renamed over them, in a single transaction; a
+          failed load leaves the previous warehouse untouched
     """
     try:
         import duckdb
@@ -508,59 +1368,952 @@ def load_to_duckdb(csv_dir: str = '../data/raw', db_path: str = '../data/warehou
         # Create database directory if it doesn't exist
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
-        conn = duckdb.connect(db_path)
-        
-        # List of tables to load
-        tables = ['customers', 'subscriptions', 'plans', 'payments', 'usage_events', 'support_tickets']
-        
-        for table in tables:
-            csv_file = os.path.join(csv_dir, f"{table}.csv")
-            if os.path.exists(csv_file):
-                logger.info(f"Loading {table}...")
-                conn.execute(f"""
-                    CREATE OR REPLACE TABLE {table} AS
-                    SELECT * FROM read_csv_auto('{csv_file}')
-                """)
-                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-                logger.info(f"  Loaded {count} rows into {table}")
+        sources = {}
+        for table in RAW_TABLES:
+            source_path = os.path.join(csv_dir, table if input_format == 'parquet' else f"{table}.csv")
+            if os.path.exists(source_path):
+                sources[table] = source_path
             else:
-                logger.warning(f"CSV file not found: {csv_file}")
+                logger.warning(f"{input_format.upper()} input not found: {source_path}")
+        if not sources:
+            return {}
+        
+        conn = duckdb.connect(db_path)
+        try:
+            workers = max_workers or min(len(sources), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    table: executor.submit(
+                        _load_staging_table, conn, table, source_path, input_format, cluster_by_date, stage_records
+                    )
+                    for table, source_path in sources.items()
+                }
+            row_counts, failures = {}, {}
+            for table, future in futures.items():
+                try:
+                    row_counts[table], row_counts[f"{table}{REJECTS_SUFFIX}"] = future.result()
+                except Exception as e:
+                    failures[table] = e
+            
+            if failures:
+                for table in sources:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}{LOAD_STAGING_SUFFIX}")
+                    conn.execute(f"DROP TABLE IF EXISTS {table}{REJECTS_SUFFIX}{LOAD_STAGING_SUFFIX}")
+                details = '; '.join(f"{table}: {e}" for table, e in failures.items())
+                raise RuntimeError(f"{len(failures)} table(s) failed to load, warehouse left unchanged ({details})")
+            
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                for table in row_counts:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                    conn.execute(f"ALTER TABLE {table}{LOAD_STAGING_SUFFIX} RENAME TO {table}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
         
-        conn.close()
+        for table in sources:
+            logger.info(f"  Loaded {row_counts[table]} rows into {table}")
+            rejected = row_counts[f"{table}{REJECTS_SUFFIX}"]
+            if rejected:
+                logger.warning(f"  Rejected {rejected} rows into {table}{REJECTS_SUFFIX}")
         logger.info("Data loading complete!")
+        return row_counts
         
     except ImportError:
         logger.warning("DuckDB not installed. Skipping database load. Install with: pip install duckdb")
+        return {}
     except Exception as e:
         logger.error(f"Error loading data into DuckDB: {e}")
+        raise
+
+
+class DuckDBArrowLoader:
+    """
+    Load generated chunks straight into DuckDB tables through Arrow, with no intermediate files.
+    
+    Each chunk is converted to a typed Arrow table and registered with DuckDB, which scans
+    it in place (zero-copy) through validation_sql; rows failing VALIDATION_RULES go to
+    <table>_rejects. The first chunk of a table replaces it (unless replace_tables
+    is False); later chunks are appended. Everything runs in one transaction that is committed on close, so a failed
+    run leaves the previous tables untouched. With cluster_by_date, replaced CLUSTER_KEYS
+    tables are rewritten in key order before the commit (appends from daily deltas already
+    arrive in date order).
+    
+    Usage:
+        with DuckDBArrowLoader(db_path) as loader:
+            loader.load('customers', [customers_df])
+    """
+    
+    def __init__(
+        self,
+        db_path: str = '../data/warehouse/saas_analytics.duckdb',
+        replace_tables: bool = True,
+        cluster_by_date: bool = False,
+    ):
+        import duckdb
+        
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db_path = db_path
+        self.replace_tables = replace_tables
+        self.cluster_by_date = cluster_by_date
+        self.conn = stage_metrics.profiled(duckdb.connect(db_path))
+        self.conn.begin()
+        self.row_counts: Dict[str, int] = {}
+        self.reject_counts: Dict[str, int] = {}
+        logger.info(f"Loading data directly into DuckDB at {db_path} (Arrow)")
+    
+    def append(self, table: str, chunk: pd.DataFrame):
+        """Validate and append one DataFrame chunk to a raw table, creating it on first use."""
+        if table not in self.row_counts:
+            # Appending (daily delta) keeps existing rows; rejects tables are created on demand
+            self.conn.execute(create_table_sql(table, replace=self.replace_tables))
+            self.conn.execute(create_rejects_table_sql(table, replace=self.replace_tables))
+            self.row_counts[table] = 0
+            self.reject_counts[table] = 0
+        
+        self.conn.register('arrow_chunk', to_arrow_table(chunk, table))
+        try:
+            validated = self.conn.execute(
+                validation_sql(table, f"SELECT {', '.join(TABLE_SCHEMAS[table])} FROM arrow_chunk", typed_source=True)
+            ).fetch_arrow_table()
+        finally:
+            self.conn.unregister('arrow_chunk')
+        loaded, rejected = insert_validated(self.conn, table, validated)
+        self.row_counts[table] += loaded
+        self.reject_counts[table] += rejected
+    
+    def tee(self, table: str, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Load each chunk as it passes through, so it can also be written to files."""
+        for chunk in chunks:
+            self.append(table, chunk)
+            yield chunk
+    
+    def load(self, table: str, chunks: Iterable[pd.DataFrame]) -> int:
+        """Load all chunks of a table; returns the number of rows loaded (excluding rejects)."""
+        loaded_before = self.row_counts.get(table, 0)
+        for _ in self.tee(table, chunks):
+            pass
+        return self.row_counts.get(table, 0) - loaded_before
+    
+    def close(self, commit: bool = True):
+        """Commit (or roll back) the load and close the connection."""
+        if commit:
+            try:
+                if self.cluster_by_date and self.replace_tables:
+                    for table in CLUSTER_KEYS:
+                        if table in self.row_counts:
+                            logger.info(f"Clustering {table} by {', '.join(CLUSTER_KEYS[table])}...")
+                            self.conn.execute(
+                                f"CREATE OR REPLACE TABLE {table} AS "
+                                f"SELECT * FROM {table} ORDER BY {', '.join(CLUSTER_KEYS[table])}"
+                            )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                self.conn.close()
+                raise
+            for table, count in self.row_counts.items():
+                logger.info(f"  Loaded {count} rows into {table}")
+                if self.reject_counts[table]:
+                    logger.warning(f"  Rejected {self.reject_counts[table]} rows into {table}{REJECTS_SUFFIX}")
+            logger.info("Data loading complete!")
+        else:
+            self.conn.rollback()
+            logger.error("Direct load failed; rolled back")
+        self.conn.close()
+    
+    def __enter__(self) -> 'DuckDBArrowLoader':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
+def parse_bytes(value: str) -> int:
+    """Parse a human-readable size such as '512MB', '8GB' or '1073741824' into bytes."""
+    units = {'TB': 1024 ** 4, 'GB': 1024 ** 3, 'MB': 1024 ** 2, 'KB': 1024, 'B': 1}
+    text = value.strip().upper().replace('IB', 'B')
+    for suffix, multiplier in units.items():
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * multiplier)
+    return int(float(text))
+
+
+@dataclass(frozen=True)
+class ScaleConfig:
+    """Row counts, simulated date range and chunk size for one generation run."""
+    num_customers: int = NUM_CUSTOMERS
+    num_subscriptions: int = NUM_SUBSCRIPTIONS
+    num_payments: int = NUM_PAYMENTS
+    num_usage_events: int = NUM_USAGE_EVENTS
+    num_support_tickets: int = NUM_SUPPORT_TICKETS
+    start_date: datetime = START_DATE
+    end_date: datetime = END_DATE
+    chunk_size: int = USAGE_EVENT_CHUNK_SIZE
+    
+    @classmethod
+    def from_scale_factor(
+        cls,
+        scale_factor: float = 1.0,
+        start_date: datetime = START_DATE,
+        end_date: datetime = END_DATE,
+        memory_budget_bytes: Optional[int] = None,
+        num_shards: int = 1,
+        workers: int = 1,
+    ) -> 'ScaleConfig':
+        """
+        Build a configuration scaled like TPC-H: SF1 is the default row counts.
+        
+        Args:
+            scale_factor: Multiplier applied to every table (plans are a fixed catalog)
+            start_date: Start of the simulated history
+            end_date: End of the simulated history
+            memory_budget_bytes: Total memory the run may use across all workers;
+                None keeps the default chunk size
+            num_shards: Number of shards the rows are split into
+            workers: Number of shards generated concurrently
+            
+        Returns:
+            ScaleConfig with proportional row counts and a budget-derived chunk size
+            
+        Raises:
+            ValueError: If the date range is empty, or a shard's fully materialized tables
+                (customers, subscriptions, tickets) cannot fit the per-worker budget
+        
+        Business Logic:
+        - Ratios between tables are preserved (5 subscriptions, 6 payments, 20 events and
+          1.5 tickets per customer at the defaults)
+        - Payments and usage events are streamed in chunks; the chunk size is whatever is
+          left of the per-worker budget after the resident tables, within
+          [MIN_CHUNK_SIZE, MAX_CHUNK_SIZE]
+        """
+        if end_date <= start_date:
+            raise ValueError(f"end_date ({end_date:%Y-%m-%d}) must be after start_date ({start_date:%Y-%m-%d})")
+        
+        def scaled(base: int) -> int:
+            return max(1, int(round(base * scale_factor)))
+        
+        config = cls(
+            num_customers=scaled(NUM_CUSTOMERS),
+            num_subscriptions=scaled(NUM_SUBSCRIPTIONS),
+            num_payments=scaled(NUM_PAYMENTS),
+            num_usage_events=scaled(NUM_USAGE_EVENTS),
+            num_support_tickets=scaled(NUM_SUPPORT_TICKETS),
+            start_date=start_date,
+            end_date=end_date,
+        )
+        if memory_budget_bytes is None:
+            return config
+        
+        per_worker_budget = memory_budget_bytes / max(1, min(workers, num_shards))
+        resident_bytes = (
+            config.num_customers * BYTES_PER_ROW['customers']
+            + config.num_subscriptions * BYTES_PER_ROW['subscriptions']
+            + config.num_support_tickets * BYTES_PER_ROW['support_tickets']
+        ) / num_shards
+        if resident_bytes > per_worker_budget * RESIDENT_BUDGET_FRACTION:
+            min_shards = int(np.ceil(resident_bytes * num_shards / (per_worker_budget * RESIDENT_BUDGET_FRACTION)))
+            raise ValueError(
+                f"Scale factor {scale_factor} needs ~{resident_bytes / 1024 ** 2:,.0f} MB per shard, which does not "
+                f"fit a {per_worker_budget / 1024 ** 2:,.0f} MB per-worker budget; use at least "
+                f"--shards {min_shards} with {min(workers, num_shards)} workers, fewer workers, or a larger --memory-budget"
+            )
+        
+        streamed_bytes_per_row = max(BYTES_PER_ROW['payments'], BYTES_PER_ROW['usage_events'])
+        chunk_size = int((per_worker_budget - resident_bytes) / streamed_bytes_per_row)
+        chunk_size = int(np.clip(chunk_size, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE))
+        logger.info(
+            f"Memory budget {memory_budget_bytes / 1024 ** 2:,.0f} MB: ~{resident_bytes / 1024 ** 2:,.0f} MB resident "
+            f"per shard, streaming payments/usage events in chunks of {chunk_size:,} rows"
+        )
+        return replace(config, chunk_size=chunk_size)
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """Row counts, ID offsets and seed for one independently generated shard."""
+    shard_index: int
+    seed: int
+    num_customers: int
+    num_subscriptions: int
+    num_payments: int
+    num_usage_events: int
+    num_support_tickets: int
+    first_customer_id: int
+    first_subscription_id: int
+    first_payment_id: int
+    first_event_id: int
+    first_ticket_id: int
+    total_customers: int
+    output_dir: str
+    start_date: datetime = START_DATE
+    end_date: datetime = END_DATE
+    chunk_size: int = USAGE_EVENT_CHUNK_SIZE
+    part_name: Optional[str] = None
+    output_format: str = 'csv'
+    compression: str = DEFAULT_PARQUET_COMPRESSION
+    change_log: bool = False
+    cluster_by_date: bool = False
+
+
+def _split_evenly(total: int, parts: int) -> List[int]:
+    """Split total into parts integer counts that differ by at most one."""
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def plan_shards(
+    num_shards: int,
+    seed: int = 42,
+    output_dir: str = '../data/raw',
+    scale: ScaleConfig = ScaleConfig(),
+    output_format: str = 'csv',
+    compression: str = DEFAULT_PARQUET_COMPRESSION,
+    change_log: bool = False,
+    cluster_by_date: bool = False,
+) -> List[ShardSpec]:
+    """
+    Split the generation workload into shards with deterministic seeds and ID ranges.
+    
+    Args:
+        num_shards: Number of shards to split customers (and their dependents) into
+        seed: Root seed; per-shard seeds are spawned from it with np.random.SeedSequence
+        output_dir: Directory shard files are written to
+        scale: Total row counts, date range and chunk size across all shards
+        output_format: 'csv' or 'parquet'
+        compression: Parquet compression codec
+        change_log: Write every version of customers and subscriptions, not just the final state
+        cluster_by_date: Sort each written chunk of CLUSTER_KEYS tables by date
+        
+    Returns:
+        One ShardSpec per shard, in shard order
+        
+    Business Logic:
+    - Each shard owns a contiguous block of customers plus a proportional share of
+      subscriptions, payments, events and tickets that only reference its own customers
+    - ID offsets are cumulative shard sizes, so IDs stay globally unique and contiguous
+    - Seeds depend only on (seed, num_shards), never on worker count or scheduling
+    """
+    counts = {
+        'customers': _split_evenly(scale.num_customers, num_shards),
+        'subscriptions': _split_evenly(scale.num_subscriptions, num_shards),
+        'payments': _split_evenly(scale.num_payments, num_shards),
+        'usage_events': _split_evenly(scale.num_usage_events, num_shards),
+        'support_tickets': _split_evenly(scale.num_support_tickets, num_shards),
+    }
+    first_ids = {table: np.concatenate([[1], np.cumsum(c)[:-1] + 1]) for table, c in counts.items()}
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(num_shards)]
+    
+    return [
+        ShardSpec(
+            shard_index=i,
+            seed=seeds[i],
+            num_customers=counts['customers'][i],
+            num_subscriptions=counts['subscriptions'][i],
+            num_payments=counts['payments'][i],
+            num_usage_events=counts['usage_events'][i],
+            num_support_tickets=counts['support_tickets'][i],
+            first_customer_id=int(first_ids['customers'][i]),
+            first_subscription_id=int(first_ids['subscriptions'][i]),
+            first_payment_id=int(first_ids['payments'][i]),
+            first_event_id=int(first_ids['usage_events'][i]),
+            first_ticket_id=int(first_ids['support_tickets'][i]),
+            total_customers=scale.num_customers,
+            output_dir=output_dir,
+            start_date=scale.start_date,
+            end_date=scale.end_date,
+            chunk_size=scale.chunk_size,
+            part_name=None if num_shards == 1 else f'part-{i:05d}',
+            output_format=output_format,
+            compression=compression,
+            change_log=change_log,
+            cluster_by_date=cluster_by_date,
+        )
+        for i in range(num_shards)
+    ]
 
 
-def main():
+def generate_shard(
+    spec: ShardSpec,
+    plans_df: pd.DataFrame,
+    loader: Optional[DuckDBArrowLoader] = None,
+    stage_records: Optional[List] = None,
+) -> Dict[str, int]:
+    """
+    Generate and write every customer-dependent table for one shard.
+    
+    Args:
+        spec: Shard row counts, ID offsets, seed and output location
+        plans_df: Shared plan catalog
+        loader: Optional direct DuckDB loader that receives every chunk in-process
+        stage_records: If given, a generate_<table> and a write_<table> stage
+            record per table are appended to it
+        
+    Returns:
+        Dict of table name to rows written
+    """
+    np.random.seed(spec.seed)
+    logger.info(f"Shard {spec.shard_index}: seed={spec.seed}, customers from id {spec.first_customer_id}")
+    
+    def write(table: str, chunks: Iterable[pd.DataFrame], total_rows: Optional[int] = None, streamed: bool = False) -> int:
+        # Streamed tables are generated as they are written; time the generator separately
+        timer = stage_metrics.ChunkTimer(chunks) if streamed and stage_records is not None else None
+        with stage_metrics.measure_stage(f'write_{table}', stage_records) as stats:
+            chunks = timer if timer is not None else chunks
+            if spec.cluster_by_date and table in CLUSTER_KEYS:
+                # Sorted chunks give every Parquet row group a narrow date range
+                chunks = (chunk.sort_values(CLUSTER_KEYS[table], kind='mergesort') for chunk in chunks)
+            if loader is not None:
+                chunks = loader.tee(table, chunks)
+            try:
+                stats.rows_returned = write_table(
+                    chunks, table, spec.output_dir,
+                    output_format=spec.output_format,
+                    part_name=spec.part_name,
+                    compression=spec.compression,
+                    total_rows=total_rows,
+                )
+            finally:
+                if timer is not None:
+                    stats.excluded_seconds = timer.seconds
+        if timer is not None:
+            stage_records.append(stage_metrics.generator_record(stage_records[-1], f'generate_{table}', timer))
+        return stats.rows_returned
+    
+    dates = {'start_date': spec.start_date, 'end_date': spec.end_date}
+    with stage_metrics.measure_stage('generate_customers', stage_records) as stats:
+        customers_df = generate_customers(
+            spec.num_customers,
+            first_customer_id=spec.first_customer_id,
+            total_customers=spec.total_customers,
+            faker_seed=spec.seed,
+            **dates,
+        )
+        stats.rows_returned = len(customers_df)
+    with stage_metrics.measure_stage('generate_subscriptions', stage_records) as stats:
+        subscriptions_df = generate_subscriptions(
+            customers_df, plans_df, spec.num_subscriptions, first_subscription_id=spec.first_subscription_id, **dates
+        )
+        stats.rows_returned = len(subscriptions_df)
+    with stage_metrics.measure_stage('generate_support_tickets', stage_records) as stats:
+        support_tickets_df = generate_support_tickets(
+            customers_df, spec.num_support_tickets, first_ticket_id=spec.first_ticket_id, **dates
+        )
+        stats.rows_returned = len(support_tickets_df)
+    
+    # Payments and events are generated from the final states either way
+    customers_out, subscriptions_out = customers_df, subscriptions_df
+    if spec.change_log:
+        with stage_metrics.measure_stage('build_change_log', stage_records) as stats:
+            customers_out = build_customer_change_log(customers_df)
+            subscriptions_out = build_subscription_change_log(subscriptions_df, np.random.default_rng(spec.seed))
+            stats.rows_returned = len(customers_out) + len(subscriptions_out)
+    
+    write('customers', [customers_out])
+    write('subscriptions', [subscriptions_out])
+    num_payments = write(
+        'payments',
+        iter_payment_chunks(
+            subscriptions_df, spec.num_payments, spec.chunk_size, spec.first_payment_id, end_date=spec.end_date
+        ),
+        total_rows=spec.num_payments,
+        streamed=True,
+    )
+    num_usage_events = write(
+        'usage_events',
+        iter_usage_event_chunks(
+            customers_df, spec.num_usage_events, spec.chunk_size, first_event_id=spec.first_event_id, **dates
+        ),
+        total_rows=spec.num_usage_events,
+        streamed=True,
+    )
+    write('support_tickets', [support_tickets_df])
+    
+    return {
+        'customers': len(customers_out),
+        'subscriptions': len(subscriptions_out),
+        'payments': num_payments,
+        'usage_events': num_usage_events,
+        'support_tickets': len(support_tickets_df),
+    }
+
+
+def _generate_shard_with_stages(
+    spec: ShardSpec,
+    plans_df: pd.DataFrame,
+    loader: Optional[DuckDBArrowLoader] = None,
+) -> Tuple[Dict[str, int], List]:
+    """Run generate_shard and return its row counts with its stage records (for worker processes)."""
+    stage_records = []
+    return generate_shard(spec, plans_df, loader, stage_records), stage_records
+
+
+def merge_csv_parts(part_paths: List[str], dest_path: str):
+    """
+    Concatenate shard CSV files into one file, keeping only the first header.
+    
+    Parts are copied byte-for-byte in the given order and removed afterwards.
+    """
+    header_written = False
+    with open(dest_path, 'wb') as out:
+        for part_path in part_paths:
+            with open(part_path, 'rb') as part:
+                header = part.readline()
+                if header and not header_written:
+                    out.write(header)
+                    header_written = True
+                shutil.copyfileobj(part, out, MERGE_BUFFER_BYTES)
+            os.remove(part_path)
+
+
+def generate_sharded(
+    num_shards: int = 1,
+    seed: int = 42,
+    workers: Optional[int] = None,
+    output_dir: str = '../data/raw',
+    output_format: str = 'csv',
+    compression: str = DEFAULT_PARQUET_COMPRESSION,
+    direct_load_db: Optional[str] = None,
+    scale: ScaleConfig = ScaleConfig(),
+    change_log: bool = False,
+    cluster_by_date: bool = False,
+    stage_records: Optional[List] = None,
+) -> Dict[str, int]:
+    """
+    Generate all tables, optionally split into shards run in a process pool.
+    
+    Args:
+        num_shards: Number of shards (1 runs in-process and writes final files directly)
+        seed: Root seed; output is byte-identical for a given (seed, num_shards)
+        workers: Process pool size (defaults to min(num_shards, CPU count))
+        output_dir: Directory for the final output files
+        output_format: 'csv', 'parquet', or 'none' (no file export)
+        compression: Parquet compression codec
+        direct_load_db: If set, hand every chunk to DuckDB at this path through Arrow.
+            Shards then run in-process one after another (a DuckDB file has a single
+            writer); the generated data is identical to the multi-process run.
+        scale: Row counts, date range and chunk size (see ScaleConfig.from_scale_factor)
+        change_log: Emit every version of customers and subscriptions (a CDC change
+            log) instead of one final state per key
+        cluster_by_date: Write and load payments, usage events and tickets sorted by
+            date (see CLUSTER_KEYS) so date-window queries can skip row groups
+        stage_records: If given, the generate_<table> and write_<table> stage records
+            of every shard (including worker processes) are appended to it
+        
+    Returns:
+        Dict of table name to total rows written
+    """
+    options = {'change_log': change_log, 'cluster_by_date': cluster_by_date, 'stage_records': stage_records}
+    if direct_load_db:
+        with DuckDBArrowLoader(direct_load_db, cluster_by_date=cluster_by_date) as loader:
+            return _generate_all(
+                num_shards, seed, workers, output_dir, output_format, compression, scale, loader=loader, **options
+            )
+    return _generate_all(num_shards, seed, workers, output_dir, output_format, compression, scale, **options)
+
+
+def _generate_all(
+    num_shards: int,
+    seed: int,
+    workers: Optional[int],
+    output_dir: str,
+    output_format: str,
+    compression: str,
+    scale: ScaleConfig,
+    change_log: bool = False,
+    cluster_by_date: bool = False,
+    stage_records: Optional[List] = None,
+    loader: Optional[DuckDBArrowLoader] = None,
+) -> Dict[str, int]:
+    """Generate plans and every shard, writing files and/or loading DuckDB (see generate_sharded)."""
+    if output_format == 'parquet':
+        # Shards add files to shared dataset directories, so clear stale files first
+        for table in RAW_TABLES:
+            shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+    
+    np.random.seed(seed)
+    plans_df = generate_plans(start_date=scale.start_date)
+    with stage_metrics.measure_stage('write_plans', stage_records) as stats:
+        plan_chunks = loader.tee('plans', [plans_df]) if loader is not None else [plans_df]
+        stats.rows_returned = write_table(
+            plan_chunks, 'plans', output_dir, output_format=output_format, compression=compression
+        )
+    
+    specs = plan_shards(
+        num_shards,
+        seed=seed,
+        output_dir=output_dir,
+        scale=scale,
+        output_format=output_format,
+        compression=compression,
+        change_log=change_log,
+        cluster_by_date=cluster_by_date,
+    )
+    run_shard = generate_shard if stage_records is None else _generate_shard_with_stages
+    if num_shards == 1 or loader is not None:
+        shard_results = [run_shard(spec, plans_df, loader) for spec in specs]
+    else:
+        workers = workers or min(num_shards, os.cpu_count() or 1)
+        logger.info(f"Generating {num_shards} shards with {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() returns results in shard order regardless of completion order
+            shard_results = list(executor.map(run_shard, specs, [plans_df] * num_shards))
+    if stage_records is None:
+        shard_counts = shard_results
+    else:
+        shard_counts = [counts for counts, _ in shard_results]
+        stage_records.extend(record for _, records in shard_results for record in records)
+        
+    # Parquet shards are already separate files in each table's dataset directory
+    if num_shards > 1 and output_format == 'csv':
+        for table in SHARDED_TABLES:
+            merge_csv_parts(
+                [os.path.join(output_dir, f"{table}.{spec.part_name}.csv") for spec in specs],
+                os.path.join(output_dir, f"{table}.csv"),
+            )
+            logger.info(f"Merged {num_shards} shards into {table}.csv")
+    
+    totals = {'plans': len(plans_df)}
+    for table in SHARDED_TABLES:
+        totals[table] = sum(counts[table] for counts in shard_counts)
+    return totals
+
+
+def _load_generator_state(conn) -> Dict[str, Dict]:
+    """
+    Read the next-ID and watermark state used by daily delta generation.
+    
+    The generator_state table is bootstrapped from max(id)/max(watermark) on first use;
+    afterwards each delta reads and updates only this small table.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generator_state (
+            table_name VARCHAR PRIMARY KEY,
+            max_id BIGINT,
+            last_date DATE
+        )
+    """)
+    rows = conn.execute("SELECT table_name, max_id, last_date FROM generator_state").fetchall()
+    state = {table: {'max_id': max_id, 'last_date': last_date} for table, max_id, last_date in rows}
+    
+    for table, (key, watermark_column) in DELTA_STATE_COLUMNS.items():
+        if table not in state:
+            logger.info(f"Bootstrapping generator state for {table}...")
+            max_id, last_date = conn.execute(
+                f"SELECT coalesce(max({key}), 0), max(cast({watermark_column} AS DATE)) FROM {table}"
+            ).fetchone()
+            state[table] = {'max_id': max_id, 'last_date': last_date}
+    return state
+
+
+def _sample_latest_by_id_blocks(conn, table: str, key: str, max_id: int, sample_size: int) -> pd.DataFrame:
+    """
+    Sample the latest version of roughly sample_size rows from a few random ID ranges.
+    
+    IDs are generated in ascending order, so each BETWEEN range is pruned by DuckDB's
+    min/max zone maps and the cost is proportional to the sample, not the table.
+    The latest version per key is picked in SQL over every stored version of it,
+    including versions earlier deltas appended out of ID order.
+    """
+    if max_id <= 0 or sample_size <= 0:
+        return pd.DataFrame()
+    block_len = max(1, int(np.ceil(sample_size / DELTA_SAMPLE_BLOCKS)))
+    block_starts = np.random.randint(1, max(2, max_id - block_len + 2), size=DELTA_SAMPLE_BLOCKS)
+    frames = [
+        conn.execute(f"""
+            SELECT * FROM {table}
+            WHERE {key} BETWEEN ? AND ?
+            QUALIFY row_number() OVER (PARTITION BY {key} ORDER BY updated_at DESC) = 1
+        """, [int(lo), int(lo + block_len - 1)]).df()
+        for lo in np.unique(block_starts)
+    ]
+    # Overlapping ranges can return the same key twice
+    return pd.concat(frames, ignore_index=True).drop_duplicates(key).reset_index(drop=True)
+
+
+def generate_daily_delta(
+    db_path: str = '../data/warehouse/saas_analytics.duckdb',
+    day: Optional[datetime] = None,
+    seed: int = 42,
+    scale: ScaleConfig = ScaleConfig(),
+) -> Dict[str, int]:
+    """
+    Generate one day of new activity and append it to the raw DuckDB tables.
+    
+    Args:
+        db_path: Existing warehouse produced by a full generation run
+        day: Day to generate (defaults to the day after the current watermark)
+        seed: Root seed; each day's seed is derived from (seed, day)
+        scale: Daily volumes are the scale's row counts spread over its date range
+        
+    Returns:
+        Dict of table name to rows appended
+        
+    Raises:
+        ValueError: If day is not after the current watermark
+        
+    Business Logic:
+    - New customers sign up on the day; new subscriptions, usage events and tickets come
+      from new customers and a sample of existing active customers
+    - A sample of active/paused subscriptions changes state (churn, pause, resume,
+      upgrade, downgrade); each change is appended as a new version of the row with
+      updated_at = day, and staging keeps the latest version per subscription_id
+    - Payments are billed on the day against a sample of billable subscriptions
+    - Existing rows are only read through ID-range samples and the generator_state
+      table, so one day costs time proportional to that day's volume
+    """
+    with DuckDBArrowLoader(db_path, replace_tables=False) as loader:
+        conn = loader.conn
+        state = _load_generator_state(conn)
+        watermark = max(pd.Timestamp(s['last_date']) for s in state.values() if s['last_date'] is not None)
+        day = pd.Timestamp(day) if day is not None else watermark + pd.Timedelta(days=1)
+        if day <= watermark:
+            raise ValueError(f"Raw tables already contain data through {watermark:%Y-%m-%d}; pick a later day")
+        
+        np.random.seed(int(np.random.SeedSequence([seed, day.toordinal()]).generate_state(1)[0]))
+        history_days = max(1, (scale.end_date - scale.start_date).days)
+        
+        def daily_volume(total: int) -> int:
+            return int(np.random.poisson(total / history_days))
+        
+        logger.info(f"Generating daily delta for {day:%Y-%m-%d} (watermark {watermark:%Y-%m-%d})...")
+        day_dates = {'start_date': day.to_pydatetime(), 'end_date': day.to_pydatetime()}
+        next_day_dates = {'start_date': day.to_pydatetime(), 'end_date': (day + pd.Timedelta(days=1)).to_pydatetime()}
+        
+        # New customers sign up today and are active
+        new_customers_df = generate_customers(
+            daily_volume(scale.num_customers),
+            first_customer_id=state['customers']['max_id'] + 1,
+            faker_seed=int(np.random.randint(0, 2 ** 31 - 1)),
+            **day_dates,
+        ).assign(account_status='active', end_date=pd.NaT, updated_at=day)
+        
+        # Customers active today: new signups plus a sample of existing active customers
+        num_new_subscriptions = daily_volume(scale.num_subscriptions)
+        existing = _sample_latest_by_id_blocks(
+            conn, 'customers', 'customer_id', state['customers']['max_id'], max(num_new_subscriptions, 1) * 4
+        )
+        if len(existing):
+            existing = existing[existing['account_status'] == 'active']
+        day_customers_df = pd.concat(
+            [new_customers_df[['customer_id']], existing[['customer_id']] if len(existing) else None],
+            ignore_index=True,
+        ).assign(signup_date=day, end_date=pd.NaT, account_status='active')
+        
+        # New subscriptions start today and are active
+        plans_df = conn.execute("SELECT * FROM plans ORDER BY plan_id").df()
+        new_subscriptions_df = generate_subscriptions(
+            day_customers_df, plans_df, num_new_subscriptions,
+            first_subscription_id=state['subscriptions']['max_id'] + 1,
+            **day_dates,
+        ).assign(status='active', end_date=pd.NaT, updated_at=day)
+        
+        # State changes for a sample of existing active/paused subscriptions
+        num_changes = int(np.random.poisson(num_new_subscriptions * DELTA_STATE_CHANGES_PER_NEW_SUBSCRIPTION))
+        candidates = _sample_latest_by_id_blocks(
+            conn, 'subscriptions', 'subscription_id', state['subscriptions']['max_id'], max(num_changes, 1) * 4
+        )
+        if len(candidates):
+            candidates = candidates[candidates['status'].isin(list(DELTA_TRANSITIONS))]
+        changed_df = candidates.iloc[np.random.permutation(len(candidates))[:num_changes]].copy()
+        for from_status, transitions in DELTA_TRANSITIONS.items():
+            mask = (changed_df['status'] == from_status).to_numpy()
+            changed_df.loc[mask, 'status'] = np.random.choice(
+                list(transitions), size=mask.sum(), p=list(transitions.values())
+            )
+        changed_df['end_date'] = pd.Series(day, index=changed_df.index).mask(changed_df['status'] == 'active')
+        changed_df['updated_at'] = day
+        
+        # Payments billed today against billable subscriptions
+        num_payments = daily_volume(scale.num_payments)
+        billable = pd.concat([
+            new_subscriptions_df,
+            candidates[candidates['status'].isin(['active', 'paused'])] if len(candidates) else None,
+        ], ignore_index=True)
+        pay_idx = np.random.randint(0, max(len(billable), 1), size=num_payments if len(billable) else 0)
+        status = np.random.choice(['success', 'failed', 'refunded'], size=len(pay_idx), p=[0.92, 0.05, 0.03])
+        amounts = billable['amount'].to_numpy(dtype=np.float64)[pay_idx]
+        first_payment_id = state['payments']['max_id'] + 1
+        payments_df = pd.DataFrame({
+            'payment_id': np.arange(first_payment_id, first_payment_id + len(pay_idx)),
+            'subscription_id': billable['subscription_id'].to_numpy()[pay_idx],
+            'payment_date': day,
+            'amount': np.where(status == 'refunded', -amounts, amounts),
+            'status': status.astype(object),
+            'payment_method': np.random.choice(['credit_card', 'bank_transfer', 'paypal'], size=len(pay_idx)).astype(object),
+            'created_at': day,
+        })
+        
+        # Usage events and tickets from today's active customers
+        has_customers = len(day_customers_df) > 0
+        usage_event_chunks = list(iter_usage_event_chunks(
+            day_customers_df, daily_volume(scale.num_usage_events) if has_customers else 0,
+            first_event_id=state['usage_events']['max_id'] + 1,
+            **next_day_dates,
+        ))
+        usage_events_df = (
+            pd.concat(usage_event_chunks, ignore_index=True) if usage_event_chunks
+            else pd.DataFrame(columns=USAGE_EVENT_COLUMNS)
+        )
+        support_tickets_df = generate_support_tickets(
+            day_customers_df, daily_volume(scale.num_support_tickets) if has_customers else 0,
+            first_ticket_id=state['support_tickets']['max_id'] + 1,
+            **next_day_dates,
+        )
+        # Tickets resolving after today are still open as of this delta
+        still_open = support_tickets_df['resolved_date'] > day
+        support_tickets_df.loc[still_open, ['resolved_date', 'satisfaction_score']] = [pd.NaT, np.nan]
+        
+        delta = {
+            'customers': [new_customers_df],
+            'subscriptions': [new_subscriptions_df, changed_df[list(TABLE_SCHEMAS['subscriptions'])]],
+            'payments': [payments_df],
+            'usage_events': [usage_events_df],
+            'support_tickets': [support_tickets_df],
+        }
+        counts = {}
+        for table, frames in delta.items():
+            counts[table] = loader.load(table, [f for f in frames if len(f)])
+            key = DELTA_STATE_COLUMNS[table][0]
+            new_max_id = max([state[table]['max_id']] + [int(f[key].max()) for f in frames if len(f)])
+            conn.execute(
+                "INSERT OR REPLACE INTO generator_state VALUES (?, ?, ?)",
+                [table, new_max_id, day.date()],
+            )
+        
+        logger.info(
+            f"Daily delta {day:%Y-%m-%d}: {len(new_customers_df)} new customers, "
+            f"{len(new_subscriptions_df)} new subscriptions, {len(changed_df)} subscription state changes, "
+            f"{len(payments_df)} payments, {len(usage_events_df)} usage events, {len(support_tickets_df)} tickets"
+        )
+        return counts
+
+
+def _parse_date(value: str) -> datetime:
+    """Parse a YYYY-MM-DD command line date."""
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Generate synthetic SaaS subscription data.")
+    parser.add_argument('--scale-factor', type=float, default=1.0,
+                        help="Scale every table proportionally; SF1 = 10k customers, 200k usage events (default: 1)")
+    parser.add_argument('--memory-budget', type=parse_bytes, default=None,
+                        help="Total memory the run may use across workers, e.g. 8GB; sizes streamed chunks")
+    parser.add_argument('--start-date', type=_parse_date, default=START_DATE,
+                        help=f"Start of the simulated history (default: {START_DATE:%Y-%m-%d})")
+    parser.add_argument('--end-date', type=_parse_date, default=END_DATE,
+                        help=f"End of the simulated history (default: {END_DATE:%Y-%m-%d})")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Split customers and their dependent rows into this many shards (default: 1)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for sharded runs (default: min(shards, CPU count))")
+    parser.add_argument('--seed', type=int, default=42,
+                        help="Root random seed; output is identical for a given (seed, shards)")
+    parser.add_argument('--output-dir', default='../data/raw', help="Directory for generated files")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=None,
+                        help="csv, typed parquet with payments/usage_events partitioned by month, or none "
+                             "(default: csv, or none with --direct-load)")
+    parser.add_argument('--compression', default=DEFAULT_PARQUET_COMPRESSION,
+                        choices=['zstd', 'snappy', 'gzip', 'lz4', 'brotli', 'none'],
+                        help="Parquet compression codec (default: zstd)")
+    parser.add_argument('--db-path', default='../data/warehouse/saas_analytics.duckdb', help="DuckDB database path")
+    parser.add_argument('--daily-delta', action='store_true',
+                        help="Append one day of new activity to the existing warehouse at --db-path")
+    parser.add_argument('--delta-date', type=_parse_date, default=None,
+                        help="Day to generate with --daily-delta (default: day after the current watermark)")
+    parser.add_argument('--direct-load', action='store_true',
+                        help="Hand Arrow batches straight to DuckDB instead of loading from exported files")
+    parser.add_argument('--cluster-by-date', action='store_true',
+                        help="Write and load payments, usage events and tickets sorted by date, then "
+                             "customer/subscription, so date-window queries can skip row groups")
+    parser.add_argument('--change-log', action='store_true',
+                        help="Write every version of customers and subscriptions (CDC change log), "
+                             "not just the final state")
+    parser.add_argument('--metrics-sink', default=os.environ.get('MONITORING_METRICS_SINK'),
+                        help="Emit per-stage wall time, rows and peak RSS to these sinks, e.g. "
+                             "prom:/var/lib/node_exporter/pipeline.prom,jsonl:stages.jsonl (see stage_metrics.py)")
+    parser.add_argument('--profile', action='store_true',
+                        default=os.environ.get('MONITORING_PROFILE', '').lower() in ('1', 'true', 'on'),
+                        help="Attach the DuckDB query profiles of the load and delta stages to their metrics")
+    args = parser.parse_args(argv)
+    
+    if args.output_format is None:
+        args.output_format = 'none' if args.direct_load else 'csv'
+    if args.output_format == 'none' and not args.direct_load:
+        parser.error("--output-format none requires --direct-load")
+    if args.end_date <= args.start_date:
+        parser.error("--end-date must be after --start-date")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
     """Main function to generate all data."""
+    args = parse_args(argv)
+    sinks = stage_metrics.sinks_from_spec(args.metrics_sink)
+    stage_metrics.configure(capture_profiles=args.profile)
+    
+    if args.daily_delta:
+        scale = ScaleConfig.from_scale_factor(args.scale_factor, start_date=args.start_date, end_date=args.end_date)
+        with stage_metrics.record_stage('generate_daily_delta', sinks) as stats:
+            counts = generate_daily_delta(args.db_path, day=args.delta_date, seed=args.seed, scale=scale)
+            stats.rows_returned = sum(counts.values())
+        return
+    
     logger.info("=" * 60)
     logger.info("Starting SaaS Data Generation")
     logger.info("=" * 60)
     
-    # Generate all tables
-    plans_df = generate_plans()
-    customers_df = generate_customers(NUM_CUSTOMERS)
-    subscriptions_df = generate_subscriptions(customers_df, plans_df, NUM_SUBSCRIPTIONS)
-    payments_df = generate_payments(subscriptions_df, NUM_PAYMENTS)
-    usage_events_df = generate_usage_events(customers_df, NUM_USAGE_EVENTS)
-    support_tickets_df = generate_support_tickets(customers_df, NUM_SUPPORT_TICKETS)
-    
-    # Save to CSV
-    logger.info("\nSaving data to CSV files...")
-    save_to_csv(plans_df, 'plans.csv')
-    save_to_csv(customers_df, 'customers.csv')
-    save_to_csv(subscriptions_df, 'subscriptions.csv')
-    save_to_csv(payments_df, 'payments.csv')
-    save_to_csv(usage_events_df, 'usage_events.csv')
-    save_to_csv(support_tickets_df, 'support_tickets.csv')
-    
-    # Load into DuckDB
-    logger.info("\nLoading data into DuckDB...")
-    load_to_duckdb()
+    # Direct loads generate shards one at a time in-process
+    workers = 1 if args.direct_load else (args.workers or min(args.shards, os.cpu_count() or 1))
+    scale = ScaleConfig.from_scale_factor(
+        args.scale_factor,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        memory_budget_bytes=args.memory_budget,
+        num_shards=args.shards,
+        workers=workers,
+    )
+    logger.info(
+        f"Scale factor {args.scale_factor:g}: {scale.num_customers:,} customers, "
+        f"{scale.num_usage_events:,} usage events, {scale.start_date:%Y-%m-%d} to {scale.end_date:%Y-%m-%d}"
+    )
+    
+    # Generate and save all tables
+    with stage_metrics.record_stage('generate_sharded', sinks) as stats:
+        totals = generate_sharded(
+            num_shards=args.shards,
+            seed=args.seed,
+            workers=workers,
+            output_dir=args.output_dir,
+            output_format=args.output_format,
+            compression=args.compression,
+            direct_load_db=args.db_path if args.direct_load else None,
+            scale=scale,
+            change_log=args.change_log,
+            cluster_by_date=args.cluster_by_date,
+            stage_records=stats.records,
+        )
+        stats.rows_returned = sum(totals.values())
+    
+    # Load into DuckDB (already done chunk by chunk with --direct-load)
+    if not args.direct_load:
+        logger.info("\nLoading data into DuckDB...")
+        with stage_metrics.record_stage('load_to_duckdb', sinks) as stats:
+            row_counts = load_to_duckdb(
+                csv_dir=args.output_dir,
+                db_path=args.db_path,
+                input_format=args.output_format,
+                cluster_by_date=args.cluster_by_date,
+                stage_records=stats.records,
+            )
+            # Every source row is read once, then either loaded or diverted to <table>_rejects
+            stats.rows_scanned = sum(row_counts.values())
+            stats.rows_returned = sum(n for table, n in row_counts.items() if not table.endswith(REJECTS_SUFFIX))
     
     logger.info("\n" + "=" * 60)
     logger.info("Data generation complete!")
@@ -568,12 +2321,12 @@ def main():
     
     # Print summary
     logger.info("\nData Summary:")
-    logger.info(f"  Customers: {len(customers_df):,}")
-    logger.info(f"  Subscriptions: {len(subscriptions_df):,}")
-    logger.info(f"  Plans: {len(plans_df)}")
-    logger.info(f"  Payments: {len(payments_df):,}")
-    logger.info(f"  Usage Events: {len(usage_events_df):,}")
-    logger.info(f"  Support Tickets: {len(support_tickets_df):,}")
+    logger.info(f"  Customers: {totals['customers']:,}")
+    logger.info(f"  Subscriptions: {totals['subscriptions']:,}")
+    logger.info(f"  Plans: {totals['plans']}")
+    logger.info(f"  Payments: {totals['payments']:,}")
+    logger.info(f"  Usage Events: {totals['usage_events']:,}")
+    logger.info(f"  Support Tickets: {totals['support_tickets']:,}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,309 @@
+"""
+Stage metrics for the data generation pipeline.
+
+Every stage of generate_saas_data.main (generate_sharded, load_to_duckdb,
+generate_daily_delta) records its wall time, rows scanned and returned, and
+peak RSS, and hands the record to the sinks given by --metrics-sink /
+MONITORING_METRICS_SINK (comma-separated):
+
+  prom:<path>     Prometheus textfile for node_exporter's textfile collector
+  jsonl:<path>    one JSON object per stage run, appended
+  duckdb:<path>   one row per stage run in a monitoring_runs table
+
+Inside those, every table gets its own stages, so a regression can be pinned
+on one table's generator, writer or load: generate_<table> and write_<table>
+(summed across shards, measured in the worker process that ran the shard) and
+load_<table>. Workers only collect their records (measure_stage); the main
+process merges them per stage and emits them after the enclosing stage.
+
+The record layout, the sinks and the query profiler live in
+quality_monitoring/run_metrics.py, shared with the quality checks, so the
+pipeline and the checks write identical records and can share a sink.
+
+Stages that run SQL wrap their DuckDB cursors with profiled(); while a stage is
+recorded, DuckDB profiles those queries, rows scanned is read from the profiles
+(unless the stage sets it), and with --profile / MONITORING_PROFILE=1 the JSON
+profiles are attached to the record.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+RUN_METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'quality_monitoring', 'run_metrics.py')
+
+logger = logging.getLogger(__name__)
+
+
+def _load_run_metrics():
+    """
+    Load quality_monitoring/run_metrics.py by path.
+
+    Both folders are script directories rather than packages, so the module is
+    loaded from its file instead of putting quality_monitoring (and its other
+    modules) on sys.path. A process that already imported it reuses that module.
+    """
+    if 'run_metrics' in sys.modules:
+        return sys.modules['run_metrics']
+    spec = importlib.util.spec_from_file_location('run_metrics', RUN_METRICS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Registered before executing, as dataclasses look their module up while it runs
+    sys.modules['run_metrics'] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules['run_metrics']
+        raise
+    return module
+
+
+run_metrics = _load_run_metrics()
+PeakRSSSampler = run_metrics.PeakRSSSampler
+ProfilingCursor = run_metrics.ProfilingCursor
+RunMetrics = run_metrics.RunMetrics
+current_rss_bytes = run_metrics.current_rss_bytes
+emit_to = run_metrics.emit_to
+profiles_requested = run_metrics.profiles_requested
+rows_scanned = run_metrics.rows_scanned
+sinks_from_spec = run_metrics.sinks_from_spec
+
+# Profiles of the outermost stage being recorded, collected from cursors on any thread
+# (load_to_duckdb loads tables concurrently); nested stages also collect their own
+_stage_profiles: Optional[List[Dict[str, Any]]] = None
+_stage_lock = threading.Lock()
+_local = threading.local()
+_capture_profiles: Optional[bool] = None
+
+
+def configure(capture_profiles: Optional[bool] = None):
+    """Attach query profiles to every stage record (None: follow MONITORING_PROFILE)."""
+    global _capture_profiles
+    _capture_profiles = capture_profiles
+
+
+def _thread_stages() -> List[List[Dict[str, Any]]]:
+    """Profile lists of the stages open on this thread, outermost first."""
+    if not hasattr(_local, 'stages'):
+        _local.stages = []
+    return _local.stages
+
+
+class _ProfileFanout:
+    """Hands each collected profile to every stage the cursor was opened in."""
+
+    def __init__(self, targets: List[List[Dict[str, Any]]]):
+        self.targets = targets
+
+    def append(self, profile: Dict[str, Any]):
+        for target in self.targets:
+            target.append(profile)
+
+
+def profiled(cursor):
+    """
+    Return cursor wrapped so its queries are profiled for the stages being recorded.
+
+    The profiles go to the stages open on this thread and to the outermost stage.
+    Outside a recorded stage (no sinks) the cursor is returned unchanged.
+
+    Args:
+        cursor: DuckDB connection or cursor
+
+    Returns:
+        The cursor, or a ProfilingCursor delegating to it
+    """
+    with _stage_lock:
+        outer = _stage_profiles
+    targets = list(_thread_stages())
+    if outer is not None and all(target is not outer for target in targets):
+        targets.append(outer)
+    return ProfilingCursor(cursor, _ProfileFanout(targets)) if targets else cursor
+
+
+class StageStats:
+    """Row counts filled in by the measured stage."""
+
+    def __init__(self):
+        self.rows_scanned: Optional[int] = None
+        self.rows_returned: Optional[int] = None
+        # Time inside the block spent on work recorded as a separate stage
+        self.excluded_seconds = 0.0
+        # Records of nested stages, emitted with this one (set by record_stage)
+        self.records: Optional[List] = None
+
+
+class ChunkTimer:
+    """
+    Iterate over chunks, timing how long the iterator takes to produce them.
+
+    Streamed tables are generated while they are written; the time spent in the
+    generator is recorded as its own stage and excluded from the writer's.
+    """
+
+    def __init__(self, chunks: Iterable):
+        self._chunks = iter(chunks)
+        self.seconds = 0.0
+        self.rows = 0
+
+    def __iter__(self) -> 'ChunkTimer':
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            chunk = next(self._chunks)
+        finally:
+            self.seconds += time.perf_counter() - started
+        self.rows += len(chunk)
+        return chunk
+
+
+@contextmanager
+def measure_stage(name: str, records: Optional[List], capture_profiles: Optional[bool] = None) -> Iterator[StageStats]:
+    """
+    Measure one pipeline stage and append its record to records.
+
+    Used for stages inside worker threads and processes, whose records are
+    emitted by the main process (see record_stage and merge_records).
+
+    Args:
+        name: Stage name, e.g. 'load_customers'
+        records: List the RunMetrics record is appended to; with None the stage runs unmeasured
+        capture_profiles: Attach the stage's query profiles to the record
+            (defaults to configure(), then MONITORING_PROFILE)
+
+    Usage:
+        with measure_stage('write_customers', records) as stats:
+            stats.rows_returned = write_table(...)
+    """
+    global _stage_profiles
+
+    stats = StageStats()
+    if records is None:
+        yield stats
+        return
+    if capture_profiles is None:
+        capture_profiles = _capture_profiles if _capture_profiles is not None else profiles_requested()
+
+    started_at = datetime.utcnow()
+    status, error = 'ok', ''
+    started = time.perf_counter()
+    profiles: List[Dict[str, Any]] = []
+    with _stage_lock:
+        outermost = _stage_profiles is None
+        if outermost:
+            _stage_profiles = profiles
+    _thread_stages().append(profiles)
+    try:
+        with PeakRSSSampler() as sampler:
+            try:
+                yield stats
+            except BaseException as e:
+                status, error = 'error', f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                wall_seconds = time.perf_counter() - started - stats.excluded_seconds
+                peak_rss_bytes = max(sampler.peak_bytes, current_rss_bytes())
+    finally:
+        _thread_stages().remove(profiles)
+        if outermost:
+            with _stage_lock:
+                _stage_profiles = None
+        records.append(RunMetrics(
+            component='stage',
+            name=name,
+            started_at_utc=started_at,
+            wall_seconds=wall_seconds,
+            rows_scanned=(
+                stats.rows_scanned if stats.rows_scanned is not None
+                else sum(rows_scanned(p) for p in profiles) if profiles else None
+            ),
+            rows_returned=stats.rows_returned,
+            peak_rss_bytes=peak_rss_bytes,
+            status=status,
+            error=error,
+            profile=json.dumps(profiles) if capture_profiles and profiles else None,
+        ))
+
+
+def generator_record(write_record, name: str, timer: ChunkTimer):
+    """Record of the generator behind a streamed write, split off the writer's record."""
+    return replace(
+        write_record,
+        name=name,
+        wall_seconds=timer.seconds,
+        rows_scanned=None,
+        rows_returned=timer.rows,
+        profile=None,
+    )
+
+
+def merge_records(records: List) -> List:
+    """
+    Combine records of the same stage, e.g. one table's stage in every shard.
+
+    Wall time and rows are summed (shards may run in parallel, so the wall time is
+    the total across workers), the peak RSS is the largest of any worker, and the
+    stage fails if any part failed. Order of first appearance is kept.
+    """
+    merged: Dict[str, Any] = {}
+    for record in records:
+        previous = merged.get(record.name)
+        if previous is None:
+            merged[record.name] = record
+            continue
+
+        def total(field: str) -> Optional[int]:
+            values = [getattr(r, field) for r in (previous, record) if getattr(r, field) is not None]
+            return sum(values) if values else None
+
+        profiles = [json.loads(r.profile) for r in (previous, record) if r.profile]
+        merged[record.name] = replace(
+            previous,
+            started_at_utc=min(previous.started_at_utc, record.started_at_utc),
+            wall_seconds=previous.wall_seconds + record.wall_seconds,
+            rows_scanned=total('rows_scanned'),
+            rows_returned=total('rows_returned'),
+            peak_rss_bytes=max(previous.peak_rss_bytes or 0, record.peak_rss_bytes or 0) or None,
+            status='error' if 'error' in (previous.status, record.status) else 'ok',
+            error=previous.error or record.error,
+            profile=json.dumps([p for batch in profiles for p in batch]) if profiles else None,
+        )
+    return list(merged.values())
+
+
+@contextmanager
+def record_stage(name: str, sinks: List, capture_profiles: Optional[bool] = None) -> Iterator[StageStats]:
+    """
+    Measure one pipeline stage and emit its record to every sink.
+
+    Records of the stages nested in it (stats.records, e.g. per-table stages from
+    worker processes) are merged per stage name and emitted after it.
+
+    Args:
+        name: Stage name, e.g. 'load_to_duckdb'
+        sinks: Sinks from sinks_from_spec; with none the stage runs unmeasured
+        capture_profiles: Attach the stage's query profiles to the record
+
+    Usage:
+        with record_stage('load_to_duckdb', sinks) as stats:
+            row_counts = load_to_duckdb(..., stage_records=stats.records)
+            stats.rows_returned = sum(row_counts.values())
+    """
+    records = [] if sinks else None
+    nested = [] if sinks else None
+    try:
+        with measure_stage(name, records, capture_profiles) as stats:
+            stats.records = nested
+            yield stats
+    finally:
+        for record in (records or []) + merge_records(nested or []):
+            emit_to(sinks, record)
@@ -0,0 +1,32 @@
+{% macro changed_since_last_snapshot(updated_at_column, lookback_days=none) %}
+{#
+    Restrict a snapshot's source query to rows changed since the last snapshot run.
+    
+    The check strategy joins every source row to the current snapshot rows and
+    compares check_cols. Filtering the source to recently updated keys means each
+    run only hashes and compares keys that can have changed; keys missing from the
+    filtered source keep their current snapshot row untouched.
+    
+    Args:
+        updated_at_column: Source column recording when a row last changed
+        lookback_days: Overlap with the previous run to pick up late-arriving changes
+            (defaults to the snapshot_lookback_days var). Re-selected rows with an
+            unchanged hash_diff are ignored by the check strategy.
+    
+    Returns:
+        A WHERE clause, or nothing on the first run (the snapshot table does not exist yet)
+    
+    Usage:
+        select *
+        from {{ ref('stg_subscriptions') }}
+        {{ changed_since_last_snapshot('updated_at') }}
+#}
+{%- set lookback_days = lookback_days if lookback_days is not none else var('snapshot_lookback_days', 3) -%}
+{%- set existing = adapter.get_relation(database=this.database, schema=this.schema, identifier=this.identifier) if execute else none -%}
+{%- if existing is not none %}
+where {{ updated_at_column }} >= (
+    select max({{ updated_at_column }}) - interval '{{ lookback_days }} days'
+    from {{ this }}
+)
+{%- endif %}
+{% endmacro %}
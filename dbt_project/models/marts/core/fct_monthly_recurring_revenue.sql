@@ -1,44 +1,10 @@
-with months as (
-    select distinct
-        date_month
-    from {{ ref('dim_dates') }}
-),
-
-subscriptions as (
+with subscription_months as (
     select
-        subscription_id,
         customer_id,
-        plan_id,
-        start_date,
-        end_date,
-        status,
-        billing_cycle,
-        amount,
-        -- Normalize MRR from amount + billing_cycle (more robust than trusting raw mrr_amount)
-        {{ calculate_mrr('amount', 'billing_cycle') }} as normalized_mrr_amount
-    from {{ ref('stg_subscriptions') }}
-),
-
-subscription_months as (
-    select
-        s.customer_id,
-        s.subscription_id,
-        s.plan_id,
-        m.date_month,
-        s.status,
-        s.billing_cycle,
-        s.amount,
-        case
-            when s.status = 'paused' then 0
-            else s.normalized_mrr_amount
-        end as mrr_amount
-    from subscriptions s
-    join months m
-        on m.date_month >= date_trunc('month', s.start_date)
-        and (
-            s.end_date is null
-            or m.date_month <= date_trunc('month', s.end_date)
-        )
+        subscription_id,
+        date_month,
+        mrr_amount
+    from {{ ref('fct_subscription_monthly_recurring_revenue') }}
 ),
 
 final as (
@@ -54,4 +20,3 @@ final as (
 
 select *
 from final
-
@@ -0,0 +1,33 @@
+{% snapshot snap_customers %}
+{#
+    SCD2 history of stg_customers.
+
+    Changes are detected on a single hash_diff of the tracked attributes rather than
+    a column-by-column compare, and only customers updated since the last run are
+    selected, so each run processes changed keys only.
+#}
+
+{{
+    config(
+        unique_key='customer_id',
+        strategy='check',
+        check_cols=['hash_diff'],
+    )
+}}
+
+select
+    *,
+    {{ dbt_utils.generate_surrogate_key([
+        'email',
+        'company_name',
+        'signup_date',
+        'end_date',
+        'account_status',
+        'industry',
+        'company_size',
+        'country',
+    ]) }} as hash_diff
+from {{ ref('stg_customers') }}
+{{ changed_since_last_snapshot('updated_at') }}
+
+{% endsnapshot %}
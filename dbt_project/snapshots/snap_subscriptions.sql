@@ -0,0 +1,33 @@
+{% snapshot snap_subscriptions %}
+{#
+    SCD2 history of stg_subscriptions.
+
+    Changes are detected on a single hash_diff of the tracked attributes rather than
+    a column-by-column compare, and only subscriptions updated since the last run are
+    selected, so each run processes changed keys only.
+#}
+
+{{
+    config(
+        unique_key='subscription_id',
+        strategy='check',
+        check_cols=['hash_diff'],
+    )
+}}
+
+select
+    *,
+    {{ dbt_utils.generate_surrogate_key([
+        'customer_id',
+        'plan_id',
+        'start_date',
+        'end_date',
+        'status',
+        'mrr_amount',
+        'billing_cycle',
+        'amount',
+    ]) }} as hash_diff
+from {{ ref('stg_subscriptions') }}
+{{ changed_since_last_snapshot('updated_at') }}
+
+{% endsnapshot %}
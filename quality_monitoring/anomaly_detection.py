@@ -5,7 +5,9 @@ This module identifies when metrics deviate significantly from expected patterns
 - MRR drops exceeding a configured threshold (week-over-week)
 - Churn spikes above a configured multiple of rolling average
 
-All checks query DuckDB marts tables generated by dbt.
+All checks query DuckDB marts tables generated by dbt. With incremental=True the
+aggregated series they window over are kept in a state database and only newly
+arrived periods are read from the marts (see anomaly_state).
 """
 
 from __future__ import annotations
@@ -14,10 +16,16 @@ import logging
 import os
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
-import duckdb
 import pandas as pd
+import pyarrow as pa
+
+from anomaly_state import SeriesSpec, refresh_series
+from check_rows import CheckRows
+from connection_provider import get_provider
+from instrumentation import instrumented_check
+from result_cache import cached_check
 
 logger = logging.getLogger(__name__)
 
@@ -26,18 +34,69 @@ logger = logging.getLogger(__name__)
 class AnomalyResult:
     check_name: str
     run_at_utc: datetime
-    anomalies: pd.DataFrame
+    anomalies: CheckRows
+
+
+MRR_MONTHLY_SERIES = SeriesSpec(
+    name="mrr_monthly_total",
+    period_column="date_month",
+    source_sql="""
+        select
+            date_month,
+            sum(mrr_amount) as total_mrr
+        from main_marts.fct_monthly_recurring_revenue
+        {where}
+        group by 1
+    """,
+    source_table="main_marts.fct_monthly_recurring_revenue",
+    source_columns=("date_month", "mrr_amount"),
+)
+
+CHURN_RATE_SERIES = SeriesSpec(
+    name="churn_rate_by_segment",
+    period_column="date_month",
+    source_sql="""
+        select
+            date_month,
+            customer_segment,
+            customer_churn_rate
+        from main_marts.churn_analysis
+        {where}
+    """,
+    source_table="main_marts.churn_analysis",
+    source_columns=("date_month", "customer_segment", "customer_churn_rate"),
+)
 
 
-def _connect(db_path: str) -> duckdb.DuckDBPyConnection:
-    return duckdb.connect(db_path, read_only=True)
+def _series_sql(spec: SeriesSpec, incremental: bool) -> str:
+    """SQL for a check's input series: aggregated from the marts, or the incremental state."""
+    return f"select * from {spec.state_table}" if incremental else spec.query()[0]
 
 
+def _series_registrations(
+    db_path: str,
+    spec: SeriesSpec,
+    incremental: bool,
+    state_path: Optional[str],
+    full_refresh: bool,
+) -> Dict[str, pa.Table]:
+    """In incremental mode, refresh the series state; returns it keyed by the name _series_sql reads."""
+    if not incremental:
+        return {}
+    with get_provider(db_path).cursor() as conn:
+        return {spec.state_table: refresh_series(conn, db_path, spec, state_path, full_refresh)}
+
+
+@cached_check(inputs=["main_marts.dim_dates", "main_marts.fct_monthly_recurring_revenue"], date_dependent=True)
+@instrumented_check
 def detect_mrr_anomalies(
     db_path: str,
     lookback_days: int = 180,
     z_threshold: float = 2.5,
     rolling_window_days: int = 7,
+    incremental: bool = False,
+    state_path: Optional[str] = None,
+    full_refresh: bool = False,
 ) -> AnomalyResult:
     """
     Detect daily MRR anomalies using z-score over a rolling window.
@@ -45,10 +104,10 @@ def detect_mrr_anomalies(
     Notes:
     - We compute daily MRR by spreading customer-month MRR across days in that month (simple proxy).
     - This is sufficient for portfolio monitoring; if you have true daily revenue events, swap this query.
+    - incremental=True reads only new months from fct_monthly_recurring_revenue (see anomaly_state).
     """
     run_at = datetime.utcnow()
-    conn = _connect(db_path)
-
+    monthly_mrr_sql = _series_sql(MRR_MONTHLY_SERIES, incremental)
     query = f"""
         with date_spine as (
             select date_day
@@ -57,11 +116,7 @@ def detect_mrr_anomalies(
               and date_day < current_date
         ),
         monthly_mrr as (
-            select
-                date_month,
-                sum(mrr_amount) as total_mrr
-            from main_marts.fct_monthly_recurring_revenue
-            group by 1
+            {monthly_mrr_sql}
         ),
         daily_mrr as (
             select
@@ -102,37 +157,40 @@ def detect_mrr_anomalies(
         order by day;
     """
 
-    df = conn.execute(query).df()
-    conn.close()
+    registrations = _series_registrations(db_path, MRR_MONTHLY_SERIES, incremental, state_path, full_refresh)
+    anomalies = CheckRows(db_path, query, registrations=registrations)
 
-    if len(df) > 0:
-        logger.warning("MRR anomaly check: found %s anomalous days (z>=%.2f)", len(df), z_threshold)
+    if anomalies.count() > 0:
+        logger.warning("MRR anomaly check: found %s anomalous days (z>=%.2f)", anomalies.count(), z_threshold)
     else:
         logger.info("MRR anomaly check: no anomalies detected (z>=%.2f)", z_threshold)
 
-    return AnomalyResult(check_name="mrr_zscore", run_at_utc=run_at, anomalies=df)
+    return AnomalyResult(check_name="mrr_zscore", run_at_utc=run_at, anomalies=anomalies)
 
 
+@cached_check(inputs=["main_marts.fct_monthly_recurring_revenue"], date_dependent=True)
+@instrumented_check
 def detect_weekly_mrr_drop(
     db_path: str,
     drop_threshold_pct: float = 0.15,
     lookback_months: int = 12,
+    incremental: bool = False,
+    state_path: Optional[str] = None,
+    full_refresh: bool = False,
 ) -> AnomalyResult:
     """
     Flag month-over-month MRR drops larger than a threshold.
     (For this synthetic dataset, month-grain monitoring is more faithful than daily.)
     """
     run_at = datetime.utcnow()
-    conn = _connect(db_path)
-
+    monthly_mrr_sql = _series_sql(MRR_MONTHLY_SERIES, incremental)
     query = f"""
         with monthly as (
             select
                 date_month,
-                sum(mrr_amount) as total_mrr
-            from main_marts.fct_monthly_recurring_revenue
+                total_mrr
+            from ({monthly_mrr_sql})
             where date_month >= date_trunc('month', current_date) - interval {lookback_months} month
-            group by 1
         ),
         with_prev as (
             select
@@ -153,32 +211,38 @@ def detect_weekly_mrr_drop(
         order by date_month;
     """
 
-    df = conn.execute(query).df()
-    conn.close()
+    registrations = _series_registrations(db_path, MRR_MONTHLY_SERIES, incremental, state_path, full_refresh)
+    anomalies = CheckRows(db_path, query, registrations=registrations)
 
-    if len(df) > 0:
-        logger.warning("MRR drop check: found %s months with drop >= %.0f%%", len(df), drop_threshold_pct * 100)
+    if anomalies.count() > 0:
+        logger.warning("MRR drop check: found %s months with drop >= %.0f%%", anomalies.count(), drop_threshold_pct * 100)
     else:
         logger.info("MRR drop check: no drops >= %.0f%%", drop_threshold_pct * 100)
 
-    return AnomalyResult(check_name="mrr_drop_mom", run_at_utc=run_at, anomalies=df)
+    return AnomalyResult(check_name="mrr_drop_mom", run_at_utc=run_at, anomalies=anomalies)
 
 
+@cached_check(inputs=["main_marts.churn_analysis"])
+@instrumented_check
 def detect_churn_spikes(
     db_path: str,
     rolling_months: int = 3,
     spike_multiple: float = 2.0,
     segment: Optional[str] = None,
+    incremental: bool = False,
+    state_path: Optional[str] = None,
+    full_refresh: bool = False,
 ) -> AnomalyResult:
     """
     Flag churn spikes when churn rate exceeds spike_multiple * rolling average.
     """
     run_at = datetime.utcnow()
-    conn = _connect(db_path)
-
     segment_filter = ""
+    params: list = []
     if segment is not None:
-        segment_filter = f"where customer_segment = '{segment}'"
+        segment_filter = "where customer_segment = ?"
+        params.append(segment)
+    params.append(spike_multiple)
 
     query = f"""
         with base as (
@@ -186,7 +250,7 @@ def detect_churn_spikes(
                 date_month,
                 customer_segment,
                 customer_churn_rate
-            from main_marts.churn_analysis
+            from ({_series_sql(CHURN_RATE_SERIES, incremental)})
             {segment_filter}
         ),
         stats as (
@@ -197,7 +261,7 @@ def detect_churn_spikes(
                 avg(customer_churn_rate) over (
                     partition by customer_segment
                     order by date_month
-                    rows between {rolling_months} preceding and 1 preceding
+                    rows between {int(rolling_months)} preceding and 1 preceding
                 ) as rolling_avg
             from base
         )
@@ -210,32 +274,242 @@ def detect_churn_spikes(
         from stats
         where rolling_avg is not null
           and rolling_avg > 0
-          and customer_churn_rate / rolling_avg >= {spike_multiple}
+          and customer_churn_rate / rolling_avg >= ?
         order by date_month, customer_segment;
     """
 
-    df = conn.execute(query).df()
-    conn.close()
+    registrations = _series_registrations(db_path, CHURN_RATE_SERIES, incremental, state_path, full_refresh)
+    anomalies = CheckRows(db_path, query, params, registrations)
 
-    if len(df) > 0:
-        logger.warning("Churn spike check: found %s spikes (>= %.2fx rolling avg)", len(df), spike_multiple)
+    if anomalies.count() > 0:
+        logger.warning("Churn spike check: found %s spikes (>= %.2fx rolling avg)", anomalies.count(), spike_multiple)
     else:
         logger.info("Churn spike check: no spikes detected (>= %.2fx rolling avg)", spike_multiple)
 
-    return AnomalyResult(check_name="churn_spike", run_at_utc=run_at, anomalies=df)
+    return AnomalyResult(check_name="churn_spike", run_at_utc=run_at, anomalies=anomalies)
+
+
+# Slices the sweep checks: every segment x plan tier x billing cycle, each dimension on its
+# own and the overall total. The pairwise rollups a full CUBE adds would cost another three
+# customer-grain copies of the mart for slices nobody alerts on.
+SLICE_GROUPING_SETS = """grouping sets (
+    (),
+    (customer_segment),
+    (plan_tier),
+    (billing_cycle),
+    (customer_segment, plan_tier, billing_cycle)
+)"""
+
+SLICE_METRICS_QUERY = f"""
+    with subscription_months as (
+        -- MRR per subscription-month from the mart fct_monthly_recurring_revenue is rolled up
+        -- from, so slices add up to the same totals; segment and plan tier come from the dims
+        select
+            f.customer_id,
+            coalesce(c.customer_segment, 'unknown') as customer_segment,
+            coalesce(p.plan_tier, 'unknown') as plan_tier,
+            coalesce(f.billing_cycle, 'unknown') as billing_cycle,
+            f.date_month,
+            f.mrr_amount
+        from main_marts.fct_subscription_monthly_recurring_revenue f
+        left join main_marts.dim_customers c on c.customer_id = f.customer_id
+        left join main_marts.dim_plans p on p.plan_id = f.plan_id
+        where f.date_month >= ? and f.date_month <= ?
+    ),
+    slice_mrr as (
+        -- Totals need no customer grain; rolled-up dimensions read 'all'
+        select
+            case when grouping(customer_segment) = 1 then 'all' else customer_segment end as customer_segment,
+            case when grouping(plan_tier) = 1 then 'all' else plan_tier end as plan_tier,
+            case when grouping(billing_cycle) = 1 then 'all' else billing_cycle end as billing_cycle,
+            date_month,
+            sum(mrr_amount) as total_mrr,
+            count(distinct customer_id) as slice_customers
+        from subscription_months
+        group by date_month, {SLICE_GROUPING_SETS}
+    ),
+    churn_slices as (
+        -- A slice never reaching min_slice_customers cannot pass the churn rule's
+        -- starting_customers floor in any month, so its churn is not computed
+        select customer_segment, plan_tier, billing_cycle
+        from slice_mrr
+        group by customer_segment, plan_tier, billing_cycle
+        having max(slice_customers) >= ?
+    ),
+    customer_slices as (
+        -- One row per customer, slice and month
+        select
+            customer_id,
+            date_month,
+            case when grouping(customer_segment) = 1 then 'all' else customer_segment end as customer_segment,
+            case when grouping(plan_tier) = 1 then 'all' else plan_tier end as plan_tier,
+            case when grouping(billing_cycle) = 1 then 'all' else billing_cycle end as billing_cycle,
+            sum(mrr_amount) as mrr_amount
+        from subscription_months
+        group by customer_id, date_month, {SLICE_GROUPING_SETS}
+    ),
+    paying as (
+        select s.*
+        from customer_slices s
+        join churn_slices using (customer_segment, plan_tier, billing_cycle)
+        where s.mrr_amount > 0
+    ),
+    slice_churn as (
+        -- A customer paying in a slice one month churns from it the next month if it stops paying
+        -- there (same definition as churn_analysis, applied per slice); a hash join against the
+        -- next month is much cheaper than sorting every customer-slice for a window
+        select
+            p.customer_segment,
+            p.plan_tier,
+            p.billing_cycle,
+            cast(p.date_month + interval 1 month as date) as date_month,
+            count(*) as starting_customers,
+            count(*) - count(n.customer_id) as churned_customers
+        from paying p
+        left join paying n
+            on n.customer_id = p.customer_id
+            and n.customer_segment = p.customer_segment
+            and n.plan_tier = p.plan_tier
+            and n.billing_cycle = p.billing_cycle
+            and n.date_month = cast(p.date_month + interval 1 month as date)
+        group by 1, 2, 3, 4
+    )
+    select
+        customer_segment,
+        plan_tier,
+        billing_cycle,
+        date_month,
+        coalesce(m.total_mrr, 0) as total_mrr,
+        coalesce(c.starting_customers, 0) as starting_customers,
+        coalesce(c.churned_customers, 0) as churned_customers,
+        case
+            when coalesce(c.starting_customers, 0) = 0 then 0
+            else c.churned_customers::double / c.starting_customers
+        end as customer_churn_rate
+    from slice_mrr m
+    full outer join slice_churn c using (customer_segment, plan_tier, billing_cycle, date_month)
+    where date_month <= ?
+"""
+
+
+@cached_check(
+    inputs=[
+        "main_marts.fct_subscription_monthly_recurring_revenue",
+        "main_marts.dim_customers",
+        "main_marts.dim_plans",
+    ],
+    date_dependent=True,
+)
+@instrumented_check
+def detect_slice_anomalies(
+    db_path: str,
+    lookback_months: int = 12,
+    rolling_months: int = 3,
+    spike_multiple: float = 2.0,
+    drop_threshold_pct: float = 0.15,
+    min_slice_customers: int = 10,
+) -> AnomalyResult:
+    """
+    Sweep churn-spike and MRR-drop rules over every segment x plan tier x billing cycle
+    slice and the per-dimension and overall rollups ('all' in a dimension column).
+
+    The slice metrics come from one grouped query (a single scan of
+    fct_subscription_monthly_recurring_revenue, the subscription-grain mart that
+    fct_monthly_recurring_revenue rolls up, grouped by SLICE_GROUPING_SETS); both
+    rules are then evaluated for all slices at once over that small result, so the
+    number of queries does not grow with slices.
+
+    Notes:
+    - Churn uses churn_analysis' definition (paying last month, not paying this month)
+      per slice, so the segment rollups (plan tier and billing cycle 'all') match it.
+    - Churn needs a row per customer, slice and month, which dominates the cost. It is
+      only computed for slices with min_slice_customers customers in some month of the
+      window; smaller slices are still checked for MRR drops but never for churn spikes
+      (their rates are too noisy to compare) and report 0 starting customers.
+    """
+    run_at = datetime.utcnow()
+    this_month = pd.Timestamp(run_at).to_period("M")
+    lookback_start = (this_month - lookback_months).to_timestamp().date()
+    # Earlier months only feed lags and rolling averages
+    window_start = (this_month - lookback_months - rolling_months - 1).to_timestamp().date()
+    last_month = this_month.to_timestamp().date()
+
+    rules_query = f"""
+        with stats as (
+            select
+                *,
+                lag(total_mrr) over w as prev_mrr,
+                avg(customer_churn_rate) over (
+                    w rows between {int(rolling_months)} preceding and 1 preceding
+                ) as rolling_avg
+            from slice_metrics
+            window w as (partition by customer_segment, plan_tier, billing_cycle order by date_month)
+        )
+        select
+            'mrr_drop' as rule,
+            customer_segment,
+            plan_tier,
+            billing_cycle,
+            date_month,
+            total_mrr as metric_value,
+            prev_mrr as baseline_value,
+            (total_mrr - prev_mrr) / prev_mrr as score,
+            starting_customers
+        from stats
+        where date_month >= ?
+          and prev_mrr > 0
+          and (total_mrr - prev_mrr) / prev_mrr <= -?
+        union all
+        select
+            'churn_spike' as rule,
+            customer_segment,
+            plan_tier,
+            billing_cycle,
+            date_month,
+            customer_churn_rate as metric_value,
+            rolling_avg as baseline_value,
+            customer_churn_rate / rolling_avg as score,
+            starting_customers
+        from stats
+        where date_month >= ?
+          and starting_customers >= ?
+          and rolling_avg > 0
+          and customer_churn_rate / rolling_avg >= ?
+        order by rule, date_month, customer_segment, plan_tier, billing_cycle
+    """
+
+    with get_provider(db_path).cursor() as conn:
+        slice_metrics = conn.execute(
+            SLICE_METRICS_QUERY, [window_start, last_month, min_slice_customers, last_month]
+        ).fetch_arrow_table()
+    anomalies = CheckRows(
+        db_path,
+        rules_query,
+        [lookback_start, drop_threshold_pct, lookback_start, min_slice_customers, spike_multiple],
+        {"slice_metrics": slice_metrics},
+    )
+
+    if anomalies.count() > 0:
+        logger.warning("Slice sweep: %s anomalies across %s slice-months", anomalies.count(), slice_metrics.num_rows)
+    else:
+        logger.info("Slice sweep: no anomalies across %s slice-months", slice_metrics.num_rows)
+
+    return AnomalyResult(check_name="slice_sweep", run_at_utc=run_at, anomalies=anomalies)
 
 
 def main() -> int:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
     db_path = os.environ.get("DB_PATH", "./data/warehouse/saas_analytics.duckdb")
+    # Keep series state in ANOMALY_STATE_DB and only read new periods from the marts
+    incremental = os.environ.get("ANOMALY_INCREMENTAL", "") == "1"
 
     results = [
-        detect_weekly_mrr_drop(db_path=db_path),
-        detect_churn_spikes(db_path=db_path),
+        detect_weekly_mrr_drop(db_path=db_path, incremental=incremental),
+        detect_churn_spikes(db_path=db_path, incremental=incremental),
     ]
 
-    any_anomalies = any(len(r.anomalies) > 0 for r in results)
+    any_anomalies = any(r.anomalies.count() > 0 for r in results)
     return 2 if any_anomalies else 0
 
 
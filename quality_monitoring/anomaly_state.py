@@ -0,0 +1,319 @@
+"""
+Persisted series state for incremental anomaly detection.
+
+The anomaly checks aggregate large marts (e.g. one row per customer-month in
+fct_monthly_recurring_revenue) into small period series and then apply rolling
+windows to them. In incremental mode the aggregated series is kept in a state
+database together with a watermark (the newest period stored). Each run only
+aggregates source rows at or after the watermark, replaces those periods in the
+state, and hands the full series back to the check, which evaluates its
+windows exactly as a full recompute would.
+
+The watermark period itself is always re-aggregated because the newest month
+may still be filling up. Earlier periods can be restated too (late payments,
+SCD2 corrections), so the state also records:
+- the version of the source table (result_cache.fingerprint_inputs: file
+  size/mtime by default, or dbt's invocation_id). While it is unchanged the
+  stored periods are trusted and no extra query runs.
+- a fingerprint per period: row count and a sum of row hashes over the columns
+  the series reads.
+
+The file version changes on every dbt rebuild or warehouse write, so a changed
+version must not cost a full scan. It triggers two extra queries:
+- the fingerprints of the newest ANOMALY_RESTATEMENT_PERIODS stored periods
+  (default 3, the watermark included) and anything after them; only those rows
+  are hashed. Everything from the earliest period whose fingerprint differs on
+  is re-aggregated.
+- a count of the rows before that window, which reads only the period column.
+  If it differs from the stored row counts (rows inserted or deleted in an
+  older period), the series is rebuilt and fingerprinted in full.
+So a rebuild costs a scan of the period column plus hashing the window, on top
+of the incremental aggregate. Restatements older than the window that keep the
+row counts (values updated in place) are not detected; run with
+full_refresh=True after backfilling old periods. full_refresh=True rebuilds the
+series unconditionally; state built from another warehouse file is discarded.
+
+State lives in its own DuckDB file, since the warehouse is opened read-only:
+- ANOMALY_STATE_DB: state database (default ./data/warehouse/monitoring_state.duckdb)
+- ANOMALY_RESTATEMENT_PERIODS: stored periods re-validated by checksum when the
+  source version changes (default 3)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+
+from result_cache import fingerprint_inputs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = "./data/warehouse/monitoring_state.duckdb"
+DEFAULT_RESTATEMENT_PERIODS = 3
+
+WATERMARKS_DDL = """
+    create table if not exists anomaly_watermarks (
+        series_name varchar primary key,
+        source_db varchar,
+        watermark date,
+        rows_refreshed bigint,
+        refreshed_at timestamp
+    )
+"""
+# Added after the first release; state files created before it lack the column
+WATERMARKS_MIGRATION = "alter table anomaly_watermarks add column if not exists source_version varchar"
+FINGERPRINTS_DDL = """
+    create table if not exists anomaly_fingerprints (
+        series_name varchar,
+        period date,
+        row_count bigint,
+        checksum hugeint
+    )
+"""
+
+
+@dataclass(frozen=True)
+class SeriesSpec:
+    # Also the state table name (prefixed with "series_")
+    name: str
+    period_column: str
+    # Aggregate over the warehouse with a "{where}" placeholder for the watermark filter
+    source_sql: str
+    # Table source_sql reads, and the columns of it that feed the aggregate
+    source_table: str
+    source_columns: Tuple[str, ...]
+
+    @property
+    def state_table(self) -> str:
+        return f"series_{self.name}"
+
+    def fingerprint_query(self, since: Optional[Any] = None) -> Tuple[str, List[Any]]:
+        """Row count and checksum per period of the source rows the series is built from, from since on."""
+        where, params = ("", []) if since is None else (f"where {self.period_column} >= ?", [since])
+        sql = f"""
+            select
+                {self.period_column} as period,
+                count(*) as row_count,
+                sum(hash({", ".join(self.source_columns)}))::hugeint as checksum
+            from {self.source_table}
+            {where}
+            group by 1
+        """
+        return sql, params
+
+    def older_rows_query(self, before: Any) -> Tuple[str, List[Any]]:
+        """Count of the source rows before a period (or without one); reads only the period column."""
+        sql = f"""
+            select count(*)
+            from {self.source_table}
+            where {self.period_column} < ? or {self.period_column} is null
+        """
+        return sql, [before]
+
+    def query(self, since: Optional[Any] = None) -> Tuple[str, List[Any]]:
+        if since is None:
+            return self.source_sql.format(where=""), []
+        return self.source_sql.format(where=f"where {self.period_column} >= ?"), [since]
+
+
+_connections: Dict[str, duckdb.DuckDBPyConnection] = {}
+# One writer at a time per process; refreshes are small and checks may share a series
+_lock = threading.Lock()
+
+
+def state_path_from_env() -> str:
+    return os.environ.get("ANOMALY_STATE_DB", DEFAULT_STATE_PATH)
+
+
+def restatement_periods_from_env() -> int:
+    return int(os.environ.get("ANOMALY_RESTATEMENT_PERIODS", DEFAULT_RESTATEMENT_PERIODS))
+
+
+def _state_connection(state_path: str) -> duckdb.DuckDBPyConnection:
+    key = os.path.abspath(state_path)
+    conn = _connections.get(key)
+    if conn is None:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        conn = duckdb.connect(key)
+        conn.execute(WATERMARKS_DDL)
+        conn.execute(WATERMARKS_MIGRATION)
+        conn.execute(FINGERPRINTS_DDL)
+        _connections[key] = conn
+    return conn
+
+
+def _window_start(conn: duckdb.DuckDBPyConnection, spec: SeriesSpec, periods: int) -> Optional[Any]:
+    """Oldest of the newest `periods` stored fingerprinted periods; None if there are none."""
+    return conn.execute(
+        """
+        select min(period)
+        from (
+            select period
+            from anomaly_fingerprints
+            where series_name = ? and period is not null
+            order by period desc
+            limit ?
+        )
+        """,
+        [spec.name, max(periods, 1)],
+    ).fetchone()[0]
+
+
+def _first_restated_period(
+    conn: duckdb.DuckDBPyConnection, spec: SeriesSpec, window_start: Optional[Any]
+) -> Tuple[bool, Optional[Any]]:
+    """
+    Compare the fingerprints registered as new_fingerprints with the stored ones from window_start on.
+
+    Returns (changed, earliest changed period); the period is None when a change
+    cannot be placed (e.g. in rows without a period).
+    """
+    window = "" if window_start is None else "and period >= ?"
+    changed, first_period = conn.execute(
+        f"""
+        select count(*), min(period)
+        from (select * from anomaly_fingerprints where series_name = ? {window}) stored
+        full outer join new_fingerprints fresh using (period)
+        where stored.row_count is distinct from fresh.row_count
+           or stored.checksum is distinct from fresh.checksum
+        """,
+        [spec.name] + ([] if window_start is None else [window_start]),
+    ).fetchone()
+    return changed > 0, first_period
+
+
+def _older_rows_changed(
+    conn: duckdb.DuckDBPyConnection, warehouse_conn: duckdb.DuckDBPyConnection, spec: SeriesSpec, window_start: Any
+) -> bool:
+    """True if the source rows before window_start no longer add up to the stored row counts."""
+    stored = conn.execute(
+        """
+        select coalesce(sum(row_count), 0)
+        from anomaly_fingerprints
+        where series_name = ? and (period < ? or period is null)
+        """,
+        [spec.name, window_start],
+    ).fetchone()[0]
+    sql, params = spec.older_rows_query(window_start)
+    return warehouse_conn.execute(sql, params).fetchone()[0] != stored
+
+
+def refresh_series(
+    warehouse_conn: duckdb.DuckDBPyConnection,
+    db_path: str,
+    spec: SeriesSpec,
+    state_path: Optional[str] = None,
+    full_refresh: bool = False,
+    restatement_periods: Optional[int] = None,
+):
+    """
+    Bring a series' state up to date and return the whole series as an Arrow table.
+
+    Args:
+        warehouse_conn: Cursor on the (read-only) warehouse to aggregate from
+        db_path: Warehouse path, recorded so state built from another warehouse is discarded
+        spec: Series to refresh
+        state_path: State database (defaults to ANOMALY_STATE_DB)
+        full_refresh: Rebuild the series from all source rows
+        restatement_periods: Stored periods re-validated by checksum when the source
+            version changed (defaults to ANOMALY_RESTATEMENT_PERIODS)
+
+    Returns:
+        pyarrow.Table with the series' columns, same types as the source aggregate
+    """
+    state_path = state_path or state_path_from_env()
+    if restatement_periods is None:
+        restatement_periods = restatement_periods_from_env()
+    source_db = os.path.abspath(db_path)
+    source_version = repr(fingerprint_inputs(db_path, [spec.source_table]))
+    with _lock:
+        conn = _state_connection(state_path)
+        row = conn.execute(
+            "select watermark, source_db, source_version from anomaly_watermarks where series_name = ?", [spec.name]
+        ).fetchone()
+        has_table = conn.execute(
+            "select count(*) from duckdb_tables() where table_name = ?", [spec.state_table]
+        ).fetchone()[0] > 0
+
+        since = None
+        if row is not None and row[0] is not None and row[1] == source_db and has_table and not full_refresh:
+            since = row[0]
+        # Fingerprints are only needed to validate stored periods after the source changed, or to seed a rebuild;
+        # window_start is the first period they cover (None: all periods)
+        fingerprints = None
+        window_start = None
+        try:
+            if since is not None and row[2] != source_version:
+                window_start = _window_start(conn, spec, restatement_periods)
+                fingerprints = warehouse_conn.execute(*spec.fingerprint_query(window_start)).fetch_arrow_table()
+                conn.register("new_fingerprints", fingerprints)
+                changed, first_period = _first_restated_period(conn, spec, window_start)
+                if window_start is not None and _older_rows_changed(conn, warehouse_conn, spec, window_start):
+                    logger.info("Series %s: rows changed before %s; rebuilding", spec.name, window_start)
+                    since = None
+                elif changed and first_period is None:
+                    since = None
+                elif changed and first_period < since:
+                    logger.info("Series %s: source restated from %s; re-aggregating from there", spec.name, first_period)
+                    since = first_period
+            if since is None:
+                window_start = None
+                fingerprints = warehouse_conn.execute(*spec.fingerprint_query()).fetch_arrow_table()
+                conn.register("new_fingerprints", fingerprints)
+            sql, params = spec.query(since)
+            new_rows = warehouse_conn.execute(sql, params).fetch_arrow_table()
+
+            conn.register("new_series_rows", new_rows)
+            try:
+                conn.execute("begin transaction")
+                if since is None:
+                    conn.execute(f"create or replace table {spec.state_table} as select * from new_series_rows")
+                else:
+                    conn.execute(f"delete from {spec.state_table} where {spec.period_column} >= ?", [since])
+                    conn.execute(f"insert into {spec.state_table} select * from new_series_rows")
+                if fingerprints is not None:
+                    if window_start is None:
+                        conn.execute("delete from anomaly_fingerprints where series_name = ?", [spec.name])
+                    else:
+                        conn.execute(
+                            "delete from anomaly_fingerprints where series_name = ? and period >= ?",
+                            [spec.name, window_start],
+                        )
+                    conn.execute(
+                        "insert into anomaly_fingerprints select ?, period, row_count, checksum from new_fingerprints",
+                        [spec.name],
+                    )
+                watermark = conn.execute(f"select max({spec.period_column}) from {spec.state_table}").fetchone()[0]
+                conn.execute(
+                    "insert or replace into anomaly_watermarks "
+                    "(series_name, source_db, watermark, rows_refreshed, refreshed_at, source_version) "
+                    "values (?, ?, ?, ?, current_timestamp, ?)",
+                    [spec.name, source_db, watermark, new_rows.num_rows, source_version],
+                )
+                conn.execute("commit")
+            except Exception:
+                conn.execute("rollback")
+                raise
+            finally:
+                conn.unregister("new_series_rows")
+        finally:
+            if fingerprints is not None:
+                conn.unregister("new_fingerprints")
+
+        logger.debug(
+            "Series %s: %s rows refreshed since %s, watermark now %s",
+            spec.name, new_rows.num_rows, since or "the beginning", watermark,
+        )
+        return conn.execute(f"select * from {spec.state_table}").fetch_arrow_table()
+
+
+def close_all() -> None:
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
@@ -0,0 +1,138 @@
+"""
+Lazily evaluated rows of a check result (anomalies, validation failures).
+
+Checks used to materialize every flagged row into a pandas DataFrame, even though
+most callers only ask whether there are any. CheckRows keeps the query instead and
+runs only what the caller asks for:
+- count() / len(): select count(*) over the query (memoized)
+- head(n): the first n rows as a DataFrame (LIMIT n)
+- reader(): a streaming pyarrow RecordBatchReader
+- to_arrow() / to_pandas(): explicit full materialization
+
+Each call runs on its own cursor of the shared connection (connection_provider),
+so results can be consumed from any thread and after the check returned. Small
+in-memory inputs the query depends on (e.g. registered Arrow tables) travel with it.
+Rows computed outside DuckDB can be wrapped with CheckRows.from_arrow.
+
+Only in-memory rows can be pickled (e.g. into the result cache): a pickled query
+would be re-run against whatever the warehouse holds when it is read back.
+materialize() reads the rows in first.
+"""
+
+from __future__ import annotations
+
+import pickle
+import threading
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+
+from connection_provider import get_provider
+
+DEFAULT_BATCH_ROWS = 100_000
+
+
+class CheckRows:
+    def __init__(
+        self,
+        db_path: str,
+        query: str,
+        params: Optional[Sequence[Any]] = None,
+        registrations: Optional[Dict[str, pa.Table]] = None,
+    ):
+        self.db_path = db_path
+        # Trailing semicolons would break wrapping the query in count/limit
+        self.query = query.strip().rstrip(";")
+        self.params = list(params or [])
+        self.registrations = dict(registrations or {})
+        self._table: Optional[pa.Table] = None
+        self._count: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> CheckRows:
+        """Wrap rows that are already in memory; no query is run."""
+        rows = cls(db_path="", query="")
+        rows._table = table
+        rows._count = table.num_rows
+        return rows
+
+    def materialize(self, max_rows: Optional[int] = None) -> Optional[CheckRows]:
+        """
+        The rows read into memory, as a CheckRows that no longer references its query.
+
+        Returns None (reading at most max_rows + 1 rows) if there are more than max_rows.
+        """
+        if self._table is not None:
+            return self if max_rows is None or self._table.num_rows <= max_rows else None
+        if max_rows is not None and self._count is not None and self._count > max_rows:
+            return None
+        sql = self.query if max_rows is None else f"select * from ({self.query}) limit {int(max_rows) + 1}"
+        with get_provider(self.db_path).cursor() as conn:
+            table = self._execute(conn, sql).fetch_arrow_table()
+        if max_rows is not None and table.num_rows > max_rows:
+            return None
+        return CheckRows.from_arrow(table)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        if self._table is None:
+            raise pickle.PicklingError("CheckRows backed by a query cannot be pickled; materialize() it first")
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _execute(self, conn, sql: str):
+        for name, table in self.registrations.items():
+            conn.register(name, table)
+        return conn.execute(sql, self.params)
+
+    def count(self) -> int:
+        with self._lock:
+            if self._count is None:
+                with get_provider(self.db_path).cursor() as conn:
+                    self._count = self._execute(conn, f"select count(*) from ({self.query})").fetchone()[0]
+            return self._count
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        if self._table is not None:
+            return self._table.slice(0, n).to_pandas()
+        with get_provider(self.db_path).cursor() as conn:
+            return self._execute(conn, f"select * from ({self.query}) limit {int(n)}").df()
+
+    def _batches(self, batch_size: int) -> Iterator[Any]:
+        # First item is the schema; the cursor stays open until the stream is exhausted or dropped
+        with get_provider(self.db_path).cursor() as conn:
+            reader = self._execute(conn, self.query).fetch_record_batch(batch_size)
+            yield reader.schema
+            for batch in reader:
+                yield batch
+
+    def reader(self, batch_size: int = DEFAULT_BATCH_ROWS) -> pa.RecordBatchReader:
+        """Stream the rows as Arrow record batches without holding them all in memory."""
+        if self._table is not None:
+            return pa.RecordBatchReader.from_batches(self._table.schema, self._table.to_batches(batch_size))
+        batches = self._batches(batch_size)
+        schema = next(batches)
+        return pa.RecordBatchReader.from_batches(schema, batches)
+
+    def to_arrow(self) -> pa.Table:
+        if self._table is not None:
+            return self._table
+        with get_provider(self.db_path).cursor() as conn:
+            return self._execute(conn, self.query).fetch_arrow_table()
+
+    def to_pandas(self) -> pd.DataFrame:
+        return self.to_arrow().to_pandas()
+
+    def __repr__(self) -> str:
+        count = "?" if self._count is None else self._count
+        return f"CheckRows(rows={count})"
+
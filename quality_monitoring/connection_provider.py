@@ -0,0 +1,211 @@
+"""
+Shared DuckDB connection provider for the quality monitoring checks.
+
+Every check used to open (and close) its own read-only connection, paying the
+database open and catalog load on each call. The provider keeps one long-lived
+read-only connection per database file and hands each caller its own cursor,
+so checks can share it safely from multiple threads.
+
+Settings come from arguments or the environment:
+- DB_PATH: database file (default ./data/warehouse/saas_analytics.duckdb)
+- DUCKDB_THREADS: DuckDB worker threads (default: DuckDB's own, one per core)
+- DUCKDB_MEMORY_LIMIT: e.g. "2GB" (default: DuckDB's own, 80% of RAM)
+
+Inside collect_profiles(), cursors handed to the calling thread have DuckDB's
+JSON profiler enabled and record the profile of every query they run (see
+run_metrics.ProfilingCursor and instrumentation).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterator, List, Optional
+
+import duckdb
+
+from run_metrics import ProfilingCursor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "./data/warehouse/saas_analytics.duckdb"
+
+_profiling = threading.local()
+
+
+@dataclass(frozen=True)
+class ConnectionSettings:
+    db_path: str = DEFAULT_DB_PATH
+    threads: Optional[int] = None
+    memory_limit: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, db_path: Optional[str] = None) -> ConnectionSettings:
+        threads = os.environ.get("DUCKDB_THREADS")
+        return cls(
+            db_path=db_path or os.environ.get("DB_PATH", DEFAULT_DB_PATH),
+            threads=int(threads) if threads else None,
+            memory_limit=os.environ.get("DUCKDB_MEMORY_LIMIT") or None,
+        )
+
+    def duckdb_config(self) -> Dict[str, object]:
+        config: Dict[str, object] = {}
+        if self.threads is not None:
+            config["threads"] = self.threads
+        if self.memory_limit is not None:
+            config["memory_limit"] = self.memory_limit
+        return config
+
+
+@contextmanager
+def collect_profiles() -> Iterator[List[Dict[str, Any]]]:
+    """
+    Profile the queries run on cursors this thread opens inside the block.
+
+    Yields the list the JSON profiles are appended to; profiles collected in a nested
+    block are also added to the enclosing one.
+    """
+    outer = getattr(_profiling, "profiles", None)
+    profiles: List[Dict[str, Any]] = []
+    _profiling.profiles = profiles
+    try:
+        yield profiles
+    finally:
+        _profiling.profiles = outer
+        if outer is not None:
+            outer.extend(profiles)
+
+
+class ConnectionProvider:
+    """
+    One lazily opened, long-lived read-only connection with per-caller cursors.
+
+    DuckDB connections are not safe to use from several threads at once, but
+    cursors (duplicate connections to the same database instance) are. The
+    shared connection is only touched under a lock, to open it and to create
+    cursors; queries then run on the caller's cursor without locking.
+
+    Open cursors are tracked per thread so a supervisor (see run_checks) can
+    interrupt the query a timed-out check is running.
+    """
+
+    def __init__(self, settings: ConnectionSettings):
+        self.settings = settings
+        self._conn: Optional[duckdb.DuckDBPyConnection] = None
+        self._lock = threading.Lock()
+        self._active: Dict[int, List[duckdb.DuckDBPyConnection]] = {}
+
+    def connection(self) -> duckdb.DuckDBPyConnection:
+        with self._lock:
+            if self._conn is None:
+                logger.debug("Opening read-only DuckDB connection to %s", self.settings.db_path)
+                self._conn = duckdb.connect(
+                    self.settings.db_path, read_only=True, config=self.settings.duckdb_config()
+                )
+            return self._conn
+
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        conn = self.connection()
+        thread_id = threading.get_ident()
+        with self._lock:
+            cur = conn.cursor()
+            self._active.setdefault(thread_id, []).append(cur)
+        profiles = getattr(_profiling, "profiles", None)
+        profiled = None
+        try:
+            if profiles is not None:
+                profiled = ProfilingCursor(cur, profiles)
+            yield cur if profiled is None else profiled
+        finally:
+            with self._lock:
+                self._active[thread_id].remove(cur)
+                if not self._active[thread_id]:
+                    del self._active[thread_id]
+            if profiled is not None:
+                profiled.collect()
+            cur.close()
+
+    def interrupt(self, thread_id: int) -> int:
+        """Interrupt the queries running on cursors opened by a thread; returns how many."""
+        with self._lock:
+            cursors = list(self._active.get(thread_id, []))
+        for cur in cursors:
+            cur.interrupt()
+        return len(cursors)
+
+    def configure(self, threads: Optional[int] = None, memory_limit: Optional[str] = None) -> None:
+        """Change threads/memory_limit; applied to the open connection, or at open time."""
+        if threads is None and memory_limit is None:
+            return
+        with self._lock:
+            self.settings = replace(
+                self.settings,
+                threads=threads if threads is not None else self.settings.threads,
+                memory_limit=memory_limit if memory_limit is not None else self.settings.memory_limit,
+            )
+            if self._conn is not None:
+                # Both are database-wide settings, so they also apply to existing cursors
+                if threads is not None:
+                    self._conn.execute(f"SET threads = {int(threads)}")
+                if memory_limit is not None:
+                    self._conn.execute("SET memory_limit = '%s'" % memory_limit.replace("'", "''"))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_providers: Dict[str, ConnectionProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(
+    db_path: Optional[str] = None,
+    threads: Optional[int] = None,
+    memory_limit: Optional[str] = None,
+) -> ConnectionProvider:
+    """
+    Return the process-wide provider for a database file, creating it on first use.
+
+    DuckDB refuses to open one file twice in a process with different settings, so
+    providers are keyed by path only; passing threads/memory_limit for an existing
+    provider reconfigures it.
+    """
+    settings = ConnectionSettings.from_env(db_path)
+    key = os.path.abspath(settings.db_path)
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            provider = ConnectionProvider(
+                replace(
+                    settings,
+                    threads=threads if threads is not None else settings.threads,
+                    memory_limit=memory_limit if memory_limit is not None else settings.memory_limit,
+                )
+            )
+            _providers[key] = provider
+            return provider
+    provider.configure(threads=threads, memory_limit=memory_limit)
+    return provider
+
+
+def interrupt_thread(thread_id: int) -> int:
+    """Interrupt a thread's running queries on every shared connection."""
+    with _providers_lock:
+        providers = list(_providers.values())
+    return sum(provider.interrupt(thread_id) for provider in providers)
+
+
+def close_all() -> None:
+    """Close every shared connection (e.g. before a writer needs the database file)."""
+    with _providers_lock:
+        providers = list(_providers.values())
+        _providers.clear()
+    for provider in providers:
+        provider.close()
@@ -0,0 +1,336 @@
+"""
+Per-customer MRR anomaly detection.
+
+The checks in anomaly_detection look at total MRR and segment churn, so a single
+large account contracting disappears in the totals. This module scores every
+customer series in fct_monthly_recurring_revenue instead:
+
+- rows are streamed from DuckDB as Arrow record batches ordered by customer and
+  month, so each batch holds whole customer series (the last customer of a batch
+  is carried into the next one) and memory is bounded by the batch size
+- each batch is pivoted into a customers x months matrix and a rolling window
+  mean/variance is maintained with Welford updates (add the newest month,
+  remove the one leaving the window), vectorized across all customers in the batch
+- each month in the evaluation window is z-scored against the preceding window
+- only a running top-K of the most anomalous customers is kept between batches
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+
+from anomaly_detection import AnomalyResult
+from check_rows import CheckRows
+from connection_provider import get_provider
+from instrumentation import instrumented_check
+from result_cache import cached_check
+
+logger = logging.getLogger(__name__)
+
+ROWS_PER_BATCH = 1_000_000
+# Flagged customers logged by main(); the full result stays in AnomalyResult.anomalies
+MAIN_LOG_ROWS = 20
+
+RESULT_SCHEMA = pa.schema(
+    [
+        ("customer_id", pa.int64()),
+        ("date_month", pa.date32()),
+        ("mrr_amount", pa.float64()),
+        ("rolling_mean", pa.float64()),
+        ("rolling_std", pa.float64()),
+        ("mrr_change", pa.float64()),
+        ("z_score", pa.float64()),
+    ]
+)
+
+
+@dataclass(frozen=True)
+class CustomerScores:
+    """Most anomalous month per customer (customers without a scorable month are omitted)."""
+
+    customer_id: np.ndarray
+    month_index: np.ndarray
+    mrr_amount: np.ndarray
+    rolling_mean: np.ndarray
+    rolling_std: np.ndarray
+    z_score: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.customer_id)
+
+    def take(self, idx: np.ndarray) -> CustomerScores:
+        return CustomerScores(
+            customer_id=self.customer_id[idx],
+            month_index=self.month_index[idx],
+            mrr_amount=self.mrr_amount[idx],
+            rolling_mean=self.rolling_mean[idx],
+            rolling_std=self.rolling_std[idx],
+            z_score=self.z_score[idx],
+        )
+
+    @classmethod
+    def concat(cls, parts: list) -> CustomerScores:
+        return cls(**{f: np.concatenate([getattr(p, f) for p in parts]) for f in cls.__dataclass_fields__})
+
+
+def _rank_key(z_score: np.ndarray, direction: str) -> np.ndarray:
+    if direction == "down":
+        return -z_score
+    if direction == "up":
+        return z_score
+    return np.abs(z_score)
+
+
+def top_k(scores: CustomerScores, k: int, direction: str = "down") -> CustomerScores:
+    """Keep the k highest-ranked customers, most anomalous first."""
+    key = _rank_key(scores.z_score, direction)
+    if len(scores) > k:
+        keep = np.argpartition(-key, k - 1)[:k]
+        scores, key = scores.take(keep), key[keep]
+    return scores.take(np.argsort(-key, kind="stable"))
+
+
+def score_customer_batch(
+    customer_ids: np.ndarray,
+    month_index: np.ndarray,
+    mrr: np.ndarray,
+    n_months: int,
+    eval_start: int,
+    window_months: int = 6,
+    min_periods: int = 3,
+    min_relative_std: float = 0.05,
+    min_std: float = 1.0,
+    direction: str = "down",
+) -> CustomerScores:
+    """
+    Score whole customer series with a rolling-window Welford mean/variance.
+
+    Args:
+        customer_ids: Customer of each row; rows of one customer must be contiguous
+        month_index: Month of each row, 0..n_months-1
+        mrr: MRR of each row
+        n_months: Length of the month axis
+        eval_start: First month index that is scored (earlier months only seed the window)
+        window_months: Months before the scored month that form its baseline
+        min_periods: Minimum baseline months before a month is scored
+        min_relative_std: Floor on the baseline std as a fraction of |mean|, so
+            flat series (std 0) score plan changes instead of dividing by zero
+        min_std: Absolute baseline std floor (currency units); also absorbs the
+            rounding residue Welford removals leave on all-zero baselines
+        direction: "down" (contractions), "up" (expansions) or "both"
+
+    Returns:
+        CustomerScores with each customer's most anomalous scored month
+
+    Business Logic:
+        Months missing inside a customer's series are treated as 0 MRR (paused or
+        lapsed), months after its last row are not scored (churn is covered by
+        detect_churn_spikes).
+    """
+    if len(customer_ids) == 0:
+        return CustomerScores(*(np.empty(0, dtype=t) for t in (np.int64, np.int64, float, float, float, float)))
+
+    starts = np.flatnonzero(np.r_[True, customer_ids[1:] != customer_ids[:-1]])
+    row_customer = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(customer_ids)]))
+    n_customers = len(starts)
+
+    values = np.full((n_customers, n_months), np.nan)
+    values[row_customer, month_index] = mrr
+    first = np.full(n_customers, n_months)
+    last = np.full(n_customers, -1)
+    np.minimum.at(first, row_customer, month_index)
+    np.maximum.at(last, row_customer, month_index)
+    months = np.arange(n_months)
+    in_span = (months >= first[:, None]) & (months <= last[:, None])
+    values[in_span & np.isnan(values)] = 0.0
+
+    count = np.zeros(n_customers)
+    mean = np.zeros(n_customers)
+    m2 = np.zeros(n_customers)
+    best_key = np.full(n_customers, -np.inf)
+    best = {name: np.full(n_customers, np.nan) for name in ("month", "mrr", "mean", "std", "z")}
+
+    for t in range(1, n_months):
+        # Welford add: the month entering the baseline window
+        x = values[:, t - 1]
+        add = ~np.isnan(x)
+        count = count + add
+        delta = np.where(add, x - mean, 0.0)
+        mean = mean + np.divide(delta, count, out=np.zeros(n_customers), where=count > 0)
+        m2 = m2 + np.where(add, delta * (x - mean), 0.0)
+
+        # Welford remove: the month leaving the baseline window
+        if t - 1 - window_months >= 0:
+            x_old = values[:, t - 1 - window_months]
+            remove = ~np.isnan(x_old)
+            count = count - remove
+            delta_old = np.where(remove, x_old - mean, 0.0)
+            mean = np.where(count > 0, mean - np.divide(delta_old, count, out=np.zeros(n_customers), where=count > 0), 0.0)
+            m2 = np.where(count > 0, m2 - np.where(remove, delta_old * (x_old - mean), 0.0), 0.0)
+            # Guard against tiny negative m2 from floating point cancellation
+            m2 = np.maximum(m2, 0.0)
+
+        if t < eval_start:
+            continue
+        current = values[:, t]
+        scorable = ~np.isnan(current) & (count >= min_periods)
+        if not scorable.any():
+            continue
+        std = np.sqrt(np.divide(m2, count - 1, out=np.zeros(n_customers), where=count > 1))
+        std = np.maximum(np.maximum(std, min_relative_std * np.abs(mean)), min_std)
+        z = (current - mean) / std
+        key = np.where(scorable, _rank_key(z, direction), -np.inf)
+        better = key > best_key
+        best_key = np.where(better, key, best_key)
+        for name, value in (("month", t), ("mrr", current), ("mean", mean), ("std", std), ("z", z)):
+            best[name] = np.where(better, value, best[name])
+
+    found = np.isfinite(best_key)
+    return CustomerScores(
+        customer_id=customer_ids[starts][found],
+        month_index=best["month"][found].astype(np.int64),
+        mrr_amount=best["mrr"][found],
+        rolling_mean=best["mean"][found],
+        rolling_std=best["std"][found],
+        z_score=best["z"][found],
+    )
+
+
+@cached_check(inputs=["main_marts.fct_monthly_recurring_revenue"])
+@instrumented_check
+def detect_customer_mrr_anomalies(
+    db_path: str,
+    top_k_customers: int = 25,
+    z_threshold: float = 3.0,
+    lookback_months: int = 3,
+    window_months: int = 6,
+    min_periods: int = 3,
+    min_relative_std: float = 0.05,
+    min_std: float = 1.0,
+    direction: str = "down",
+    rows_per_batch: int = ROWS_PER_BATCH,
+) -> AnomalyResult:
+    """
+    Rank customers by how far their recent MRR moved from their own rolling baseline.
+
+    Args:
+        db_path: DuckDB warehouse path
+        top_k_customers: Maximum customers returned
+        z_threshold: Minimum z (below -z_threshold for "down") for a customer to be reported
+        lookback_months: Most recent months that are scored
+        window_months: Baseline months before each scored month
+        min_periods: Minimum baseline months before a month is scored
+        min_relative_std: Baseline std floor as a fraction of the baseline mean
+        min_std: Absolute baseline std floor (currency units)
+        direction: "down" (contractions), "up" (expansions) or "both"
+        rows_per_batch: Arrow batch size streamed from DuckDB
+
+    Returns:
+        AnomalyResult with up to top_k_customers rows, most anomalous first, one per
+        customer at its most anomalous month
+    """
+    run_at = datetime.utcnow()
+    if direction not in ("down", "up", "both"):
+        raise ValueError(f"direction must be 'down', 'up' or 'both', got {direction!r}")
+
+    with get_provider(db_path).cursor() as conn:
+        max_month = conn.execute("select max(date_month) from main_marts.fct_monthly_recurring_revenue").fetchone()[0]
+        if max_month is None:
+            return AnomalyResult(
+                check_name="customer_mrr_zscore",
+                run_at_utc=run_at,
+                anomalies=CheckRows.from_arrow(RESULT_SCHEMA.empty_table()),
+            )
+
+        # Only the scored months and the baseline window before them are read
+        n_months = lookback_months + window_months
+        base_month = np.datetime64(max_month, "M") - (n_months - 1)
+        reader = conn.execute(
+            """
+            select customer_id, date_month, mrr_amount
+            from main_marts.fct_monthly_recurring_revenue
+            where date_month >= ?
+            order by customer_id, date_month
+            """,
+            [base_month.astype("datetime64[D]").item()],
+        ).fetch_record_batch(rows_per_batch)
+
+        leaders: Optional[CustomerScores] = None
+        carry = None
+        rows_scanned = 0
+        for batch in reader:
+            rows_scanned += batch.num_rows
+            customer_ids = batch.column("customer_id").to_numpy(zero_copy_only=False)
+            months = batch.column("date_month").to_numpy(zero_copy_only=False).astype("datetime64[M]")
+            month_index = (months - base_month).astype(np.int64)
+            mrr = batch.column("mrr_amount").to_numpy(zero_copy_only=False).astype(float)
+            if carry is not None:
+                customer_ids, month_index, mrr = (np.concatenate([c, a]) for c, a in zip(carry, (customer_ids, month_index, mrr)))
+
+            # The last customer may continue in the next batch; hold its rows back
+            tail = np.searchsorted(customer_ids, customer_ids[-1], side="left") if len(customer_ids) else 0
+            carry = (customer_ids[tail:], month_index[tail:], mrr[tail:])
+            scores = score_customer_batch(
+                customer_ids[:tail], month_index[:tail], mrr[:tail],
+                n_months=n_months, eval_start=window_months, window_months=window_months,
+                min_periods=min_periods, min_relative_std=min_relative_std, min_std=min_std, direction=direction,
+            )
+            leaders = top_k(scores if leaders is None else CustomerScores.concat([leaders, scores]), top_k_customers, direction)
+
+    if carry is not None and len(carry[0]) > 0:
+        scores = score_customer_batch(
+            *carry,
+            n_months=n_months, eval_start=window_months, window_months=window_months,
+            min_periods=min_periods, min_relative_std=min_relative_std, min_std=min_std, direction=direction,
+        )
+        leaders = top_k(scores if leaders is None else CustomerScores.concat([leaders, scores]), top_k_customers, direction)
+
+    if leaders is not None:
+        leaders = leaders.take(np.flatnonzero(_rank_key(leaders.z_score, direction) >= z_threshold))
+    table = RESULT_SCHEMA.empty_table() if leaders is None else pa.Table.from_pydict(
+        {
+            "customer_id": leaders.customer_id,
+            "date_month": (base_month + leaders.month_index).astype("datetime64[D]"),
+            "mrr_amount": leaders.mrr_amount,
+            "rolling_mean": leaders.rolling_mean,
+            "rolling_std": leaders.rolling_std,
+            "mrr_change": leaders.mrr_amount - leaders.rolling_mean,
+            "z_score": leaders.z_score,
+        },
+        schema=RESULT_SCHEMA,
+    )
+
+    if table.num_rows > 0:
+        logger.warning(
+            "Customer MRR check: %s customers beyond z=%.2f (%s, scanned %s rows)",
+            table.num_rows, z_threshold, direction, rows_scanned,
+        )
+    else:
+        logger.info(
+            "Customer MRR check: no customers beyond z=%.2f (%s, scanned %s rows)", z_threshold, direction, rows_scanned
+        )
+
+    return AnomalyResult(check_name="customer_mrr_zscore", run_at_utc=run_at, anomalies=CheckRows.from_arrow(table))
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    db_path = os.environ.get("DB_PATH", "./data/warehouse/saas_analytics.duckdb")
+    result = detect_customer_mrr_anomalies(db_path)
+    if result.anomalies.count() > 0:
+        logger.warning(
+            "Top flagged customers:\n%s", result.anomalies.head(MAIN_LOG_ROWS).to_string(index=False)
+        )
+    return 2 if result.anomalies.count() > 0 else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
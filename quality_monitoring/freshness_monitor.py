@@ -3,19 +3,33 @@ Monitor data freshness in DuckDB.
 
 Checks whether source tables have recent data based on their loaded_at fields.
 Intended to be run in CI or on a schedule.
+
+The newest loaded_at per table is found metadata-first, so the check stays
+cheap enough to run every few minutes on large tables:
+- Parquet sources: row group footer max values, which are exact as written.
+- Warehouse tables: DuckDB segment statistics give an upper bound (deletes and
+  updates never shrink them), confirmed with a probe filtered to that bound that
+  zone maps prune down to the row groups that can contain it.
+- Anything the metadata cannot answer falls back to a scan.
+Probes and scans for all tables run as one combined query, and results are
+cached per table version (table oid/size and database file, or Parquet files).
 """
 
 from __future__ import annotations
 
+import glob
 import logging
 import os
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, replace
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-import duckdb
 import pandas as pd
 
+from connection_provider import get_provider
+from instrumentation import instrumented_check
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,6 +39,8 @@ class FreshnessCheck:
     loaded_at_field: str
     warn_hours: int = 24
     error_hours: int = 48
+    # Read the table from a Parquet dataset (e.g. generator --output-format parquet) instead of the warehouse
+    parquet_glob: Optional[str] = None
 
 
 DEFAULT_CHECKS: List[FreshnessCheck] = [
@@ -37,50 +53,179 @@ DEFAULT_CHECKS: List[FreshnessCheck] = [
     FreshnessCheck(table="support_tickets", loaded_at_field="created_at"),
 ]
 
+# (source, loaded_at_field) -> (version, max_loaded_at)
+_cache: Dict[Tuple[str, str], Tuple[Tuple, pd.Timestamp]] = {}
+_cache_lock = threading.Lock()
+
+
+def parquet_checks(raw_dir: str, checks: List[FreshnessCheck] = DEFAULT_CHECKS) -> List[FreshnessCheck]:
+    """Point checks at the generator's Parquet datasets (<raw_dir>/<table>/**/*.parquet)."""
+    return [replace(c, parquet_glob=os.path.join(raw_dir, c.table, "**", "*.parquet")) for c in checks]
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def _quote(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def _source_sql(c: FreshnessCheck) -> str:
+    if c.parquet_glob:
+        return f"read_parquet('{_quote(c.parquet_glob)}', hive_partitioning = false)"
+    return c.table
+
+
+def _source_key(db_path: str, c: FreshnessCheck) -> Tuple[str, str]:
+    source = f"parquet:{os.path.abspath(c.parquet_glob)}" if c.parquet_glob else f"{os.path.abspath(db_path)}:{c.table}"
+    return source, c.loaded_at_field
+
+
+def _file_version(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _parquet_version(pattern: str) -> Tuple:
+    return tuple((path,) + (_file_version(path) or ()) for path in sorted(glob.glob(pattern, recursive=True)))
+
+
+def _to_utc(value) -> pd.Timestamp:
+    if value is None or pd.isna(value):
+        return pd.NaT
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        return ts.tz_localize("UTC")
+    return ts.tz_convert("UTC")
+
+
+def _union_query(parts: Dict[int, str]) -> str:
+    return "\nunion all\n".join(f"select {i} as check_idx, cast(({sql}) as timestamp) as max_loaded_at" for i, sql in parts.items())
+
 
+def latest_loaded_at(conn, db_path: str, checks: List[FreshnessCheck]) -> Dict[int, Tuple[pd.Timestamp, str]]:
+    """
+    Newest loaded_at per check (by index in checks) and how it was found:
+    "cache", "parquet_footer", "stats" (segment stats confirmed by a pruned probe) or "scan".
+    """
+    # Warehouse tables (not views) with their column types; oid and size change when a table is replaced or grows
+    catalog: Dict[str, Tuple[int, int, Dict[str, str]]] = {}
+    for table_name, table_oid, estimated_size, column_name, data_type in conn.execute(
+        """
+        select t.table_name, t.table_oid, t.estimated_size, c.column_name, c.data_type
+        from duckdb_tables() t
+        join duckdb_columns() c on c.table_oid = t.table_oid
+        where t.database_name = current_database() and t.schema_name = current_schema()
+        """
+    ).fetchall():
+        catalog.setdefault(table_name, (table_oid, estimated_size, {}))[2][column_name] = data_type
+
+    # A read-only connection holds the file lock, so the file only changes between connections
+    db_version = (_file_version(db_path), _file_version(f"{db_path}.wal"))
+
+    results: Dict[int, Tuple[pd.Timestamp, str]] = {}
+    versions: Dict[int, Tuple] = {}
+    metadata_parts: Dict[int, str] = {}
+    for i, c in enumerate(checks):
+        version: Optional[Tuple] = None
+        if c.parquet_glob:
+            version = _parquet_version(c.parquet_glob) or None
+            if version:
+                # Footer stats are exact for dates/timestamps (only byte arrays get truncated);
+                # return NULL unless every row group carries them
+                metadata_parts[i] = f"""
+                    select case when bool_and(type <> 'BYTE_ARRAY'
+                                              and (stats_max_value is not null or stats_null_count = num_values))
+                                then max(try_cast(stats_max_value as timestamp)) end
+                    from parquet_metadata('{_quote(c.parquet_glob)}')
+                    where path_in_schema = '{_quote(c.loaded_at_field)}'
+                """
+        elif c.table in catalog and c.loaded_at_field in catalog[c.table][2]:
+            table_oid, estimated_size, _ = catalog[c.table]
+            version = (db_version, table_oid, estimated_size)
+            metadata_parts[i] = f"""
+                select max(try_cast(regexp_extract(stats, 'Max: ([^,\\]]+)', 1) as timestamp))
+                from pragma_storage_info('{_quote(c.table)}')
+                where column_name = '{_quote(c.loaded_at_field)}' and segment_type <> 'VALIDITY'
+            """
+        if version is not None:
+            versions[i] = version
+            with _cache_lock:
+                cached = _cache.get(_source_key(db_path, c))
+            if cached is not None and cached[0] == version:
+                results[i] = (cached[1], "cache")
+                metadata_parts.pop(i, None)
+
+    candidates: Dict[int, pd.Timestamp] = {}
+    if metadata_parts:
+        for i, value in conn.execute(_union_query(metadata_parts)).fetchall():
+            if value is not None:
+                candidates[i] = value
+
+    data_parts: Dict[int, str] = {}
+    for i, c in enumerate(checks):
+        if i in results:
+            continue
+        if c.parquet_glob and i in candidates:
+            results[i] = (_to_utc(candidates[i]), "parquet_footer")
+        elif i in candidates:
+            # The probe returns the true max whenever it is >= the stats bound; NULL means rows were removed
+            column_type = catalog[c.table][2][c.loaded_at_field]
+            data_parts[i] = (
+                f"select max({c.loaded_at_field}) from {c.table} "
+                f"where {c.loaded_at_field} >= cast('{candidates[i]}' as {column_type})"
+            )
+        else:
+            data_parts[i] = f"select max({c.loaded_at_field}) from {_source_sql(c)}"
+
+    scans: Dict[int, str] = {}
+    if data_parts:
+        for i, value in conn.execute(_union_query(data_parts)).fetchall():
+            if i in candidates and value is None:
+                scans[i] = f"select max({checks[i].loaded_at_field}) from {checks[i].table}"
+            else:
+                results[i] = (_to_utc(value), "stats" if i in candidates else "scan")
+    if scans:
+        logger.info("Segment stats were stale for %s; scanning", ", ".join(checks[i].table for i in scans))
+        for i, value in conn.execute(_union_query(scans)).fetchall():
+            results[i] = (_to_utc(value), "scan")
+
+    for i, version in versions.items():
+        if results[i][1] != "cache":
+            with _cache_lock:
+                _cache[_source_key(db_path, checks[i])] = (version, results[i][0])
+    return results
+
+
+@instrumented_check
 def check_freshness(db_path: str, checks: List[FreshnessCheck] = DEFAULT_CHECKS) -> pd.DataFrame:
     """
     Returns a dataframe with latest timestamp/date per table and freshness status.
     """
-    conn = duckdb.connect(db_path, read_only=True)
-
     rows: List[Dict] = []
     now_utc = pd.Timestamp.now(tz="UTC")
 
     # First pass: get max_loaded_at per table
-    max_loaded_by_table: Dict[str, pd.Timestamp] = {}
-    for c in checks:
-        # Some loaded_at fields are DATE; cast to TIMESTAMP for consistent math
-        sql = f"""
-            select
-                '{c.table}' as table_name,
-                '{c.loaded_at_field}' as loaded_at_field,
-                max(cast({c.loaded_at_field} as timestamp)) as max_loaded_at
-            from {c.table}
-        """
-        df = conn.execute(sql).df()
-        max_loaded_at = df.loc[0, "max_loaded_at"]
-        if pd.isna(max_loaded_at):
-            max_loaded_by_table[c.table] = pd.NaT
-        else:
-            ts = pd.Timestamp(max_loaded_at)
-            if ts.tzinfo is None:
-                ts = ts.tz_localize("UTC")
-            else:
-                ts = ts.tz_convert("UTC")
-            max_loaded_by_table[c.table] = ts
+    with get_provider(db_path).cursor() as conn:
+        latest = latest_loaded_at(conn, db_path, checks)
 
     # Auto-detect historical/static datasets:
     # If the newest timestamp is older than 48 hours, treat freshness as "relative to newest table time"
     # rather than "relative to now". This avoids constant failures for historical synthetic datasets.
-    non_null = [t for t in max_loaded_by_table.values() if not pd.isna(t)]
+    non_null = [ts for ts, _ in latest.values() if not pd.isna(ts)]
     reference_time = now_utc
     if non_null:
         newest = max(non_null)
         if (now_utc - newest) > pd.Timedelta(hours=48):
             reference_time = newest
 
-        max_ts = max_loaded_by_table[c.table]
+    for i, c in enumerate(checks):
+        max_ts, method = latest[i]
         age_hours = None
         status = "unknown"
         if pd.isna(max_ts):
@@ -104,10 +249,10 @@ def check_freshness(db_path: str, checks: List[FreshnessCheck] = DEFAULT_CHECKS)
                 "warn_after_hours": c.warn_hours,
                 "error_after_hours": c.error_hours,
                 "reference_time_utc": reference_time.to_pydatetime(),
+                "method": method,
             }
         )
 
-    conn.close()
     return pd.DataFrame(rows).sort_values(["status", "age_hours"], ascending=[True, False])
 
 
@@ -115,11 +260,16 @@ def main() -> int:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
     db_path = os.environ.get("DB_PATH", "./data/warehouse/saas_analytics.duckdb")
-    df = check_freshness(db_path)
+    raw_parquet_dir = os.environ.get("RAW_PARQUET_DIR")
+    checks = parquet_checks(raw_parquet_dir) if raw_parquet_dir else DEFAULT_CHECKS
+    df = check_freshness(db_path, checks)
 
     # Log summary
     for _, row in df.iterrows():
-        msg = f"{row['table_name']}: status={row['status']} max_loaded_at={row['max_loaded_at']} age_hours={row['age_hours']}"
+        msg = (
+            f"{row['table_name']}: status={row['status']} max_loaded_at={row['max_loaded_at']} "
+            f"age_hours={row['age_hours']} method={row['method']}"
+        )
         if row["status"] == "error":
             logger.error(msg)
         elif row["status"] == "warn":
@@ -136,4 +286,3 @@ def main() -> int:
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
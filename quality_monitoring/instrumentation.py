@@ -0,0 +1,161 @@
+"""
+Run metrics for the monitoring checks, emitted to pluggable sinks for latency alerting.
+
+Every check is wrapped with instrumented_check, which records per call:
+- wall time, and whether the check raised
+- rows scanned, from DuckDB's profiler on the cursors the check opened
+- rows returned (flagged anomalies / validation failures / freshness rows)
+- peak resident memory of the process while the check ran; checks running
+  concurrently share the process, so this is an upper bound for each of them
+- optionally the query profiles themselves (the JSON EXPLAIN ANALYZE prints)
+
+Records go to the sinks in MONITORING_METRICS_SINK, a comma-separated list of
+prom:<path>, jsonl:<path> and duckdb:<path> (see run_metrics, which defines the
+record layout and sinks shared with the pipeline stages of data_generation).
+
+Without a sink checks run uninstrumented, with no profiling overhead.
+MONITORING_PROFILE=1 attaches the query profiles to each record.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Iterator, List, Optional
+
+from connection_provider import collect_profiles
+from run_metrics import (
+    MetricsSink,
+    PeakRSSSampler,
+    RunMetrics,
+    current_rss_bytes,
+    emit_to,
+    profiles_requested,
+    rows_scanned,
+    sinks_from_spec,
+)
+
+logger = logging.getLogger(__name__)
+
+_sinks: Optional[List[MetricsSink]] = None
+_capture_profiles: Optional[bool] = None
+_config_lock = threading.Lock()
+
+
+def configure(sinks: Optional[List[MetricsSink]] = None, capture_profiles: Optional[bool] = None) -> None:
+    """Override the sinks and profile capture otherwise read from the environment."""
+    global _sinks, _capture_profiles
+    with _config_lock:
+        if sinks is not None:
+            _sinks = list(sinks)
+        if capture_profiles is not None:
+            _capture_profiles = capture_profiles
+
+
+def active_sinks() -> List[MetricsSink]:
+    global _sinks
+    with _config_lock:
+        if _sinks is None:
+            _sinks = sinks_from_spec(os.environ.get("MONITORING_METRICS_SINK"))
+        return _sinks
+
+
+def capture_profiles() -> bool:
+    if _capture_profiles is not None:
+        return _capture_profiles
+    return profiles_requested()
+
+
+def emit(metrics: RunMetrics) -> None:
+    """Hand a record to every sink; a failing sink never fails the check."""
+    emit_to(active_sinks(), metrics)
+
+
+def rows_returned(result: Any) -> Optional[int]:
+    """Row count of a check result: AnomalyResult, ValidationResult or a DataFrame."""
+    for attr in ("anomalies", "failures"):
+        if hasattr(result, attr):
+            return len(getattr(result, attr))
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+class RunStats:
+    """Counts filled in by the instrumented block; rows_scanned defaults to the profiled scans."""
+
+    def __init__(self):
+        self.rows_returned: Optional[int] = None
+        self.rows_scanned: Optional[int] = None
+
+
+@contextmanager
+def record_run(component: str, name: str) -> Iterator[RunStats]:
+    """
+    Measure the block and emit one RunMetrics for it (nothing is measured without a sink).
+
+    Usage:
+        with record_run("check", "metric_validation.validate_grr_leq_nrr") as stats:
+            result = ...
+            stats.rows_returned = len(result.failures)
+    """
+    stats = RunStats()
+    if not active_sinks():
+        yield stats
+        return
+
+    started_at = datetime.utcnow()
+    status, error = "ok", ""
+    started = time.perf_counter()
+    with PeakRSSSampler() as sampler, collect_profiles() as profiles:
+        try:
+            yield stats
+        except BaseException as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            wall_seconds = time.perf_counter() - started
+            emit(
+                RunMetrics(
+                    component=component,
+                    name=name,
+                    started_at_utc=started_at,
+                    wall_seconds=wall_seconds,
+                    rows_scanned=(
+                        stats.rows_scanned if stats.rows_scanned is not None
+                        else sum(rows_scanned(p) for p in profiles)
+                    ),
+                    rows_returned=stats.rows_returned,
+                    # The sampler has not taken its closing sample yet; take it here
+                    peak_rss_bytes=max(sampler.peak_bytes, current_rss_bytes()),
+                    status=status,
+                    error=error,
+                    profile=json.dumps(profiles) if capture_profiles() else None,
+                )
+            )
+
+
+def instrumented_check(func: Callable) -> Callable:
+    """
+    Record a RunMetrics for every call of a check.
+
+    Apply it below cached_check, so only computed results are measured and a
+    cache hit does not show up as a latency drop.
+    """
+    name = f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with record_run("check", name) as stats:
+            result = func(*args, **kwargs)
+            stats.rows_returned = rows_returned(result)
+        return result
+
+    return wrapper
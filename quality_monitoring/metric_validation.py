@@ -3,6 +3,19 @@ Validate business rules that dbt tests can't easily express.
 
 These checks focus on cross-model consistency and metric logic validation.
 They are intended to be run after `dbt run` builds marts tables.
+
+Every check scans its inputs in full by default. With sampling=Sampling(...)
+(VALIDATION_SAMPLE / run_checks --sample, e.g. "bernoulli:1%") it reads only a
+sample and reports a ViolationEstimate alongside the sampled failures:
+- row checks: violation rate of the sampled rows with a Wilson confidence
+  interval, and a HyperLogLog count of distinct keys among the violations
+- MRR rollup: monthly fact totals estimated from the sample (Horvitz-Thompson,
+  scaled by the realized sampling fraction) with normal intervals adjusted across
+  months; a month fails only when its whole interval is beyond the tolerance
+Intervals are over independently sampled units: rows for bernoulli and reservoir,
+whole vectors for system, whose rows are not independent draws.
+Keep the exact mode for the final gate: a clean sample bounds the violation
+rate, it does not rule violations out.
 """
 
 from __future__ import annotations
@@ -11,31 +24,310 @@ import logging
 import os
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from statistics import NormalDist
+from typing import List, Optional, Sequence, Tuple
+
+import pyarrow as pa
 
-import duckdb
-import pandas as pd
+from check_rows import CheckRows
+from connection_provider import get_provider
+from instrumentation import instrumented_check
+from result_cache import cached_check
 
 logger = logging.getLogger(__name__)
 
+SAMPLE_METHODS = ("system", "bernoulli", "reservoir")
+# Rows per vector, the unit a system sample draws
+VECTOR_SIZE = 2048
+# Below this, a month's sampled variance is too unreliable to fail it on
+MIN_SAMPLED_UNITS_PER_MONTH = 30
+
+
+@dataclass(frozen=True)
+class Sampling:
+    """
+    How an approximate check samples its input table.
+
+    bernoulli samples rows independently, reservoir keeps a fixed number of rows
+    (but still reads the whole table), system samples whole vectors (~2048 rows;
+    cheapest, skips reading the rest). Samples are repeatable for a given seed.
+
+    All three give valid confidence bounds, but rows of one vector tend to be alike
+    (neighbouring months, customers or cohorts), so a system sample's bounds are
+    computed over the vectors it read, not its rows: they are much wider for the
+    same percent and need large tables to be useful.
+    """
+
+    method: str = "bernoulli"
+    percent: Optional[float] = 1.0
+    rows: Optional[int] = None
+    seed: int = 42
+    confidence: float = 0.95
+
+    def __post_init__(self):
+        if self.method not in SAMPLE_METHODS:
+            raise ValueError(f"Unknown sample method {self.method!r}; expected one of {SAMPLE_METHODS}")
+        if (self.rows is not None) != (self.method == "reservoir"):
+            raise ValueError("reservoir samples take rows; system and bernoulli take percent")
+
+    @classmethod
+    def parse(cls, spec: str) -> Sampling:
+        """Parse "<method>:<size>", e.g. "bernoulli:1%", "system:5%", "reservoir:100000"."""
+        method, _, size = spec.partition(":")
+        if not size:
+            raise ValueError(f"Invalid sample {spec!r}; expected <method>:<size>, e.g. bernoulli:1%")
+        if size.endswith("%"):
+            return cls(method=method, percent=float(size[:-1]))
+        return cls(method=method, percent=None, rows=int(size))
+
+    def clause(self) -> str:
+        size = f"{int(self.rows)} rows" if self.rows is not None else f"{float(self.percent):g}%"
+        return f"tablesample {self.method}({size}) repeatable ({int(self.seed)})"
+
+    @property
+    def unit(self) -> str:
+        """Expression for the independently sampled unit a row belongs to."""
+        return f"rowid // {VECTOR_SIZE}" if self.method == "system" else "rowid"
+
+    @property
+    def z(self) -> float:
+        return NormalDist().inv_cdf(0.5 + self.confidence / 2)
+
+
+@dataclass(frozen=True)
+class ViolationEstimate:
+    sampling: Sampling
+    input_rows: int  # rows of the checked table (catalog estimate)
+    sampled_rows: int  # input rows the sample read
+    unit: str  # what the rate is over: "rows", or "months" for the rollup
+    units_checked: int
+    violations: int  # violating units in the sample (= failures returned)
+    violation_rate: float
+    rate_lower: float
+    rate_upper: float
+    distinct_violating_keys: Optional[int] = None  # HyperLogLog estimate
+    sampled_units: Optional[int] = None  # independent draws the interval is over (vectors for system)
+
+    @property
+    def estimated_violations(self) -> float:
+        """Violating units extrapolated to the whole input."""
+        return self.violation_rate * (self.input_rows if self.unit == "rows" else self.units_checked)
+
+    def describe(self) -> str:
+        return "%s/%s sampled %s violate, rate %.4f (%g%% CI %.4f-%.4f; %s of %s input rows sampled in %s units)" % (
+            self.violations,
+            self.units_checked,
+            self.unit,
+            self.violation_rate,
+            self.sampling.confidence * 100,
+            self.rate_lower,
+            self.rate_upper,
+            self.sampled_rows,
+            self.input_rows,
+            self.sampled_units,
+        )
+
 
 @dataclass(frozen=True)
 class ValidationResult:
     check_name: str
     run_at_utc: datetime
-    failures: pd.DataFrame
+    failures: CheckRows
+    estimate: Optional[ViolationEstimate] = None  # set by sampled runs only
 
 
-def _connect(db_path: str) -> duckdb.DuckDBPyConnection:
-    return duckdb.connect(db_path, read_only=True)
+def wilson_interval(violations: float, n: int, z: float) -> Tuple[float, float]:
+    """
+    Wilson score interval for a proportion; stays informative at 0 violations.
 
+    n is the number of independent draws. For a cluster sample pass the number of
+    clusters and the violations scaled to it (rate * clusters), i.e. the effective
+    sample size under the worst-case design effect of fully correlated clusters.
+    """
+    if n == 0:
+        return 0.0, 1.0
+    rate = violations / n
+    denom = 1 + z * z / n
+    center = (rate + z * z / (2 * n)) / denom
+    half = z * ((rate * (1 - rate) / n + z * z / (4 * n * n)) ** 0.5) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def _input_rows(conn, table: str) -> int:
+    schema, _, name = table.rpartition(".")
+    row = conn.execute(
+        "select estimated_size from duckdb_tables() where schema_name = ? and table_name = ?", [schema or "main", name]
+    ).fetchone()
+    if row is not None:
+        return int(row[0])
+    return conn.execute(f"select count(*) from {table}").fetchone()[0]
+
+
+def _sample_violations(
+    db_path: str,
+    sampling: Sampling,
+    table: str,
+    columns: Sequence[str],
+    keys: Sequence[str],
+    violation: str,
+) -> Tuple[CheckRows, ViolationEstimate]:
+    """
+    Evaluate a row-level rule on a sample of table in one pass.
 
-def validate_mrr_rollup_matches_analysis(db_path: str, tolerance: float = 0.01) -> ValidationResult:
+    Returns the sampled violating rows (ordered by keys) and the estimate of the
+    violation rate over the whole table. The interval is over the sampled units
+    (Sampling.unit), so a system sample counts each vector it read once.
+    """
+    fields = ", ".join(f"{c} := {c}" for c in columns)
+    key_fields = ", ".join(f"{k} := {k}" for k in keys)
+    query = f"""
+        select
+            count(*) as sampled_rows,
+            count(distinct {sampling.unit}) as sampled_units,
+            count(*) filter (where {violation}) as violations,
+            approx_count_distinct(struct_pack({key_fields})) filter (where {violation}) as distinct_keys,
+            list(struct_pack({fields}) order by {", ".join(keys)}) filter (where {violation}) as violating_rows
+        from {table} {sampling.clause()}
+    """
+    with get_provider(db_path).cursor() as conn:
+        input_rows = _input_rows(conn, table)
+        result = conn.execute(query).fetch_arrow_table()
+
+    sampled_rows = result.column("sampled_rows")[0].as_py()
+    sampled_units = result.column("sampled_units")[0].as_py()
+    violations = result.column("violations")[0].as_py()
+    rate = violations / sampled_rows if sampled_rows else 0.0
+    rows = pa.RecordBatch.from_struct_array(result.column("violating_rows").combine_chunks().flatten())
+    lower, upper = wilson_interval(rate * sampled_units, sampled_units, sampling.z)
+    estimate = ViolationEstimate(
+        sampling=sampling,
+        input_rows=input_rows,
+        sampled_rows=sampled_rows,
+        unit="rows",
+        units_checked=sampled_rows,
+        violations=violations,
+        violation_rate=rate,
+        rate_lower=lower,
+        rate_upper=upper,
+        distinct_violating_keys=result.column("distinct_keys")[0].as_py() or 0,
+        sampled_units=sampled_units,
+    )
+    return CheckRows.from_arrow(pa.Table.from_batches([rows])), estimate
+
+
+def _sample_rollup(db_path: str, tolerance: float, sampling: Sampling) -> Tuple[CheckRows, ViolationEstimate]:
+    """
+    Compare monthly MRR estimated from a fact sample with the exact mrr_analysis totals.
+
+    A month's fact total is estimated as sampled_sum / p, with p the realized sampling
+    fraction, and standard error sqrt((1 - p) / p^2 * sum of squared unit totals), the
+    Horvitz-Thompson variance for independently sampled units (Sampling.unit: rows, or
+    the month's part of each vector for system). Intervals are Bonferroni-adjusted
+    across months, so the confidence holds for the check as a whole rather than per month.
+
+    Months whose whole interval is beyond the tolerance fail; they bound the rate from
+    below and are the point estimate. Months whose interval reaches the tolerance, or
+    with fewer than MIN_SAMPLED_UNITS_PER_MONTH sampled units, bound it from above.
+    Months with no sampled fact rows are not compared.
+    """
+    fact = "main_marts.fct_monthly_recurring_revenue"
+    with get_provider(db_path).cursor() as conn:
+        input_rows = _input_rows(conn, fact)
+        months = conn.execute(
+            f"""
+            with mrr_units as (
+                select
+                    date_month,
+                    sum(mrr_amount) as unit_mrr,
+                    count(*) as unit_rows
+                from {fact} {sampling.clause()}
+                group by date_month, {sampling.unit}
+            ),
+            mrr_sample as (
+                select
+                    date_month,
+                    sum(unit_mrr) as sampled_mrr,
+                    sum(unit_mrr * unit_mrr) as sampled_mrr_sq,
+                    sum(unit_rows) as sampled_rows,
+                    count(*) as sampled_units
+                from mrr_units
+                group by 1
+            ),
+            mrr_fact as (
+                select
+                    date_month,
+                    sampled_rows,
+                    sampled_units,
+                    sampled_mrr / p as total_mrr,
+                    sqrt(greatest(1 - p, 0) / (p * p) * sampled_mrr_sq) as total_mrr_se
+                from (
+                    select *, sum(sampled_rows) over () / greatest({input_rows}, 1) as p
+                    from mrr_sample
+                )
+            ),
+            mrr_analysis as (
+                select
+                    date_month,
+                    sum(total_mrr) as total_mrr
+                from main_marts.mrr_analysis
+                group by 1
+            )
+            select
+                f.date_month,
+                f.total_mrr as fact_total_mrr,
+                f.total_mrr_se as fact_total_mrr_se,
+                a.total_mrr as analysis_total_mrr,
+                abs(f.total_mrr - a.total_mrr) as abs_diff,
+                f.sampled_rows,
+                f.sampled_units
+            from mrr_fact f
+            join mrr_analysis a
+                on f.date_month = a.date_month
+            order by f.date_month
+            """
+        ).fetch_arrow_table()
+
+    compared = months.num_rows
+    z = NormalDist().inv_cdf(1 - (1 - sampling.confidence) / (2 * max(compared, 1)))
+    diff = months.column("abs_diff").to_numpy(zero_copy_only=False)
+    margin = z * months.column("fact_total_mrr_se").to_numpy(zero_copy_only=False)
+    enough_units = months.column("sampled_units").to_numpy(zero_copy_only=False) >= MIN_SAMPLED_UNITS_PER_MONTH
+    certain = enough_units & (diff - margin > tolerance)
+    possible = ~enough_units | (diff + margin > tolerance)
+    rate = float(certain.mean()) if compared else 0.0
+    estimate = ViolationEstimate(
+        sampling=sampling,
+        input_rows=input_rows,
+        sampled_rows=sum(months.column("sampled_rows").to_pylist()),
+        unit="months",
+        units_checked=compared,
+        violations=int(certain.sum()),
+        violation_rate=rate,
+        rate_lower=rate,
+        rate_upper=float(possible.mean()) if compared else 1.0,
+        sampled_units=sum(months.column("sampled_units").to_pylist()),
+    )
+    return CheckRows.from_arrow(months.filter(pa.array(certain, type=pa.bool_()))), estimate
+
+
+@cached_check(inputs=["main_marts.fct_monthly_recurring_revenue", "main_marts.mrr_analysis"])
+@instrumented_check
+def validate_mrr_rollup_matches_analysis(
+    db_path: str, tolerance: float = 0.01, sampling: Optional[Sampling] = None
+) -> ValidationResult:
     """
     Business rule: total MRR by month should match the mrr_analysis totals summed across segments.
+
+    With sampling, the fact side (the large table) is sampled; mrr_analysis is read in full.
     """
     run_at = datetime.utcnow()
-    conn = _connect(db_path)
+    if sampling is not None:
+        failures, estimate = _sample_rollup(db_path, tolerance, sampling)
+        log = logger.error if estimate.violations else logger.info
+        log("MRR rollup validation (sampled): %s", estimate.describe())
+        return ValidationResult(
+            check_name="mrr_rollup_matches_analysis", run_at_utc=run_at, failures=failures, estimate=estimate
+        )
 
     query = f"""
         with mrr_fact as (
@@ -64,23 +356,35 @@ def validate_mrr_rollup_matches_analysis(db_path: str, tolerance: float = 0.01)
         order by f.date_month;
     """
 
-    df = conn.execute(query).df()
-    conn.close()
+    failures = CheckRows(db_path, query)
 
-    if len(df) > 0:
-        logger.error("MRR rollup validation failed for %s months", len(df))
+    if failures.count() > 0:
+        logger.error("MRR rollup validation failed for %s months", failures.count())
     else:
         logger.info("MRR rollup validation passed (tolerance=%.4f)", tolerance)
 
-    return ValidationResult(check_name="mrr_rollup_matches_analysis", run_at_utc=run_at, failures=df)
+    return ValidationResult(check_name="mrr_rollup_matches_analysis", run_at_utc=run_at, failures=failures)
 
 
-def validate_grr_leq_nrr(db_path: str) -> ValidationResult:
+@cached_check(inputs=["main_marts.net_revenue_retention"])
+@instrumented_check
+def validate_grr_leq_nrr(db_path: str, sampling: Optional[Sampling] = None) -> ValidationResult:
     """
     Business rule: GRR should be <= NRR for all segment-month rows.
     """
     run_at = datetime.utcnow()
-    conn = _connect(db_path)
+    if sampling is not None:
+        failures, estimate = _sample_violations(
+            db_path,
+            sampling,
+            table="main_marts.net_revenue_retention",
+            columns=["date_month", "customer_segment", "gross_revenue_retention", "net_revenue_retention"],
+            keys=["date_month", "customer_segment"],
+            violation="gross_revenue_retention > net_revenue_retention",
+        )
+        log = logger.error if estimate.violations else logger.info
+        log("GRR <= NRR validation (sampled): %s", estimate.describe())
+        return ValidationResult(check_name="grr_leq_nrr", run_at_utc=run_at, failures=failures, estimate=estimate)
 
     query = """
         select
@@ -93,23 +397,35 @@ def validate_grr_leq_nrr(db_path: str) -> ValidationResult:
         order by date_month, customer_segment;
     """
 
-    df = conn.execute(query).df()
-    conn.close()
+    failures = CheckRows(db_path, query)
 
-    if len(df) > 0:
-        logger.error("GRR <= NRR validation failed for %s rows", len(df))
+    if failures.count() > 0:
+        logger.error("GRR <= NRR validation failed for %s rows", failures.count())
     else:
         logger.info("GRR <= NRR validation passed")
 
-    return ValidationResult(check_name="grr_leq_nrr", run_at_utc=run_at, failures=df)
+    return ValidationResult(check_name="grr_leq_nrr", run_at_utc=run_at, failures=failures)
 
 
-def validate_retention_rate_bounds(db_path: str) -> ValidationResult:
+@cached_check(inputs=["main_marts.cohort_retention"])
+@instrumented_check
+def validate_retention_rate_bounds(db_path: str, sampling: Optional[Sampling] = None) -> ValidationResult:
     """
     Business rule: retention_rate must be between 0 and 1 (redundant with tests, but kept for visibility).
     """
     run_at = datetime.utcnow()
-    conn = _connect(db_path)
+    if sampling is not None:
+        failures, estimate = _sample_violations(
+            db_path,
+            sampling,
+            table="main_marts.cohort_retention",
+            columns=["cohort_month", "customer_segment", "months_since_signup", "retention_rate"],
+            keys=["cohort_month", "customer_segment", "months_since_signup"],
+            violation="retention_rate < 0 or retention_rate > 1",
+        )
+        log = logger.error if estimate.violations else logger.info
+        log("Retention bounds validation (sampled): %s", estimate.describe())
+        return ValidationResult(check_name="retention_rate_bounds", run_at_utc=run_at, failures=failures, estimate=estimate)
 
     query = """
         select
@@ -122,31 +438,36 @@ def validate_retention_rate_bounds(db_path: str) -> ValidationResult:
         order by cohort_month, customer_segment, months_since_signup;
     """
 
-    df = conn.execute(query).df()
-    conn.close()
+    failures = CheckRows(db_path, query)
 
-    if len(df) > 0:
-        logger.error("Retention bounds validation failed for %s rows", len(df))
+    if failures.count() > 0:
+        logger.error("Retention bounds validation failed for %s rows", failures.count())
     else:
         logger.info("Retention bounds validation passed")
 
-    return ValidationResult(check_name="retention_rate_bounds", run_at_utc=run_at, failures=df)
+    return ValidationResult(check_name="retention_rate_bounds", run_at_utc=run_at, failures=failures)
+
 
+def run_all(db_path: str, bypass_cache: bool = False, sampling: Optional[Sampling] = None) -> List[ValidationResult]:
+    """
+    Run every validation; results for unchanged marts come from the result cache unless bypass_cache.
 
-def run_all(db_path: str) -> List[ValidationResult]:
+    sampling switches every check to its approximate mode (see module docstring).
+    """
     return [
-        validate_mrr_rollup_matches_analysis(db_path=db_path),
-        validate_grr_leq_nrr(db_path=db_path),
-        validate_retention_rate_bounds(db_path=db_path),
+        validate_mrr_rollup_matches_analysis(db_path=db_path, sampling=sampling, bypass_cache=bypass_cache),
+        validate_grr_leq_nrr(db_path=db_path, sampling=sampling, bypass_cache=bypass_cache),
+        validate_retention_rate_bounds(db_path=db_path, sampling=sampling, bypass_cache=bypass_cache),
     ]
 
 
 def main() -> int:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     db_path = os.environ.get("DB_PATH", "./data/warehouse/saas_analytics.duckdb")
+    sample = os.environ.get("VALIDATION_SAMPLE")
 
-    results = run_all(db_path)
-    failed = [r for r in results if len(r.failures) > 0]
+    results = run_all(db_path, sampling=Sampling.parse(sample) if sample else None)
+    failed = [r for r in results if r.failures.count() > 0]
 
     if failed:
         logger.error("Metric validation failed: %s/%s checks have failures", len(failed), len(results))
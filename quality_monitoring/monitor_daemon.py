@@ -0,0 +1,444 @@
+"""
+Long-running monitoring daemon: scheduled checks and a local HTTP endpoint.
+
+The one-shot scripts pay process start, pandas/duckdb imports and a cold
+connection on every cron tick, and report only an exit code. The daemon imports
+everything once and keeps the shared read-only connection (connection_provider)
+open between runs. It runs every check discovered by run_checks on its own
+schedule:
+- freshness (freshness_monitor): every 5 minutes
+- anomaly (anomaly_detection, customer_anomalies): hourly
+- validation (metric_validation): every 15 minutes
+Intervals can be set per type and overridden per check.
+
+Checks are blocking DuckDB work, so they run in a bounded thread pool and never
+stall the event loop. A check that exceeds its timeout has its query interrupted,
+as in run_checks. A check never overlaps its own previous run: an interrupted
+query can take a while to unwind, and its next run waits until it has.
+
+The HTTP endpoint (127.0.0.1:8765 by default) serves JSON:
+- GET /health: daemon uptime and the worst latest status
+- GET /results: latest outcome, latency summary and schedule of every check
+- GET /results/<check>: the same for one check, with its recent latencies
+
+DuckDB's file lock keeps writers out while the connection is open. If dbt (or
+the generator) writes the same file on this host, pass --idle-release SECONDS:
+the connection is then closed whenever no check is due within that time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import anomaly_state
+import instrumentation
+import result_cache
+from connection_provider import close_all, get_provider, interrupt_thread
+from metric_validation import Sampling
+from run_checks import (
+    DEFAULT_TIMEOUT_SECONDS,
+    POLL_INTERVAL_SECONDS,
+    STATUS_EXIT_CODES,
+    CheckOutcome,
+    CheckSpec,
+    discover_checks,
+    parse_check_seconds,
+    summarize_result,
+)
+
+logger = logging.getLogger(__name__)
+
+# Module name -> check type with its own schedule
+CHECK_TYPES: Dict[str, str] = {
+    "freshness_monitor": "freshness",
+    "anomaly_detection": "anomaly",
+    "customer_anomalies": "anomaly",
+    "metric_validation": "validation",
+}
+DEFAULT_INTERVALS: Dict[str, float] = {
+    "freshness": 300.0,
+    "anomaly": 3600.0,
+    "validation": 900.0,
+}
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+LATENCY_HISTORY = 100
+MAX_REQUEST_BYTES = 8192
+
+
+@dataclass(frozen=True)
+class ScheduledCheck:
+    spec: CheckSpec
+    check_type: str
+    interval_seconds: float
+
+
+def check_type(check_name: str) -> str:
+    return CHECK_TYPES[check_name.partition(".")[0]]
+
+
+def latency_summary(durations: List[float]) -> Dict[str, Any]:
+    if not durations:
+        return {"runs": 0}
+    ordered = sorted(durations)
+
+    def rank(q: float) -> float:
+        # Nearest-rank percentile
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+    return {
+        "runs": len(ordered),
+        "last_seconds": durations[-1],
+        "mean_seconds": sum(ordered) / len(ordered),
+        "p50_seconds": rank(0.50),
+        "p95_seconds": rank(0.95),
+        "max_seconds": ordered[-1],
+    }
+
+
+class MonitorDaemon:
+    """
+    Runs scheduled checks against one warehouse and keeps their latest results.
+
+    All bookkeeping happens on the event loop thread; only the checks themselves
+    run in the executor.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        checks: List[ScheduledCheck],
+        max_workers: int = DEFAULT_WORKERS,
+        idle_release_seconds: Optional[float] = None,
+    ):
+        self.db_path = db_path
+        self.checks = checks
+        self.idle_release_seconds = idle_release_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="monitor")
+        self.started_at = datetime.utcnow()
+        self.latest: Dict[str, CheckOutcome] = {}
+        self.last_run_at: Dict[str, datetime] = {}
+        self.next_run_at: Dict[str, float] = {c.spec.name: time.monotonic() for c in checks}
+        self.latencies: Dict[str, Deque[float]] = {c.spec.name: deque(maxlen=LATENCY_HISTORY) for c in checks}
+        # Executor work per check, until its thread returns (which can be after a timeout)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Checks whose timed-out run is still unwinding in its thread
+        self._unwinding: Set[str] = set()
+
+    def _run_blocking(self, spec: CheckSpec, state: Dict[str, Any]) -> CheckOutcome:
+        state["thread_id"] = threading.get_ident()
+        state["started"] = time.monotonic()
+        result = spec.func(self.db_path)
+        return summarize_result(spec.name, result, time.monotonic() - state["started"])
+
+    async def run_check(self, spec: CheckSpec) -> CheckOutcome:
+        """Run one check in the executor; the timeout counts from when it starts, not when it is queued."""
+        state: Dict[str, Any] = {}
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self._run_blocking, spec, state)
+        self._inflight[spec.name] = future
+        future.add_done_callback(lambda f: self._finished(spec.name, f))
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=POLL_INTERVAL_SECONDS)
+            if done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    elapsed = time.monotonic() - state.get("started", time.monotonic())
+                    logger.error("Check %s raised %s: %s", spec.name, type(e).__name__, e)
+                    return CheckOutcome(
+                        check_name=spec.name, status="error", rows=0, duration_seconds=elapsed, detail=str(e)
+                    )
+            started = state.get("started")
+            if started is not None and time.monotonic() - started >= spec.timeout_seconds:
+                interrupted = interrupt_thread(state["thread_id"])
+                logger.error(
+                    "Check %s timed out after %.1fs (%s queries interrupted)", spec.name, spec.timeout_seconds, interrupted
+                )
+                # The interrupted query unwinds on its own and stays in flight until it has
+                self._unwinding.add(spec.name)
+                return CheckOutcome(
+                    check_name=spec.name,
+                    status="timeout",
+                    rows=0,
+                    duration_seconds=time.monotonic() - started,
+                    detail=f"exceeded {spec.timeout_seconds:g}s timeout",
+                )
+
+    def _finished(self, name: str, future: asyncio.Future) -> None:
+        """Done callback of a check's executor work, on the event loop thread."""
+        if self._inflight.get(name) is future:
+            del self._inflight[name]
+        if name in self._unwinding:
+            self._unwinding.discard(name)
+            # Nobody awaits a timed-out run; retrieve its error so it is not logged as unhandled
+            error = future.cancelled() or future.exception()
+            logger.info("Check %s finished unwinding after its timeout (%s)", name, error or "completed")
+            self._maybe_release()
+
+    def _record(self, outcome: CheckOutcome, run_at: datetime) -> None:
+        self.latest[outcome.check_name] = outcome
+        self.last_run_at[outcome.check_name] = run_at
+        self.latencies[outcome.check_name].append(outcome.duration_seconds)
+        msg = "%s: status=%s rows=%s duration=%.2fs %s" % (
+            outcome.check_name, outcome.status, outcome.rows, outcome.duration_seconds, outcome.detail
+        )
+        if STATUS_EXIT_CODES[outcome.status] >= 2:
+            logger.error(msg)
+        elif outcome.status == "warn":
+            logger.warning(msg)
+        else:
+            logger.info(msg)
+
+    def _maybe_release(self) -> None:
+        """
+        Close the warehouse connection if nothing runs and no check is due within idle_release_seconds.
+
+        Timed-out runs whose thread has not returned yet count as running: their
+        cursor is still open on the connection.
+        """
+        if self.idle_release_seconds is None or self._inflight:
+            return
+        if min(self.next_run_at.values()) - time.monotonic() > self.idle_release_seconds:
+            logger.debug("Releasing the warehouse connection until the next check is due")
+            close_all()
+
+    async def schedule(self, check: ScheduledCheck) -> None:
+        """
+        Run a check every interval_seconds, start to start; an overrun starts the next run right away.
+
+        A run that timed out keeps its executor thread until the interrupted query
+        unwinds, so the next run waits for it rather than taking a second slot.
+        """
+        name = check.spec.name
+        while True:
+            delay = self.next_run_at[name] - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            previous = self._inflight.get(name)
+            if previous is not None:
+                logger.warning("Check %s is due but its timed-out previous run is still unwinding; waiting for it", name)
+                await asyncio.wait({previous})
+            self.next_run_at[name] = time.monotonic() + check.interval_seconds
+            run_at = datetime.utcnow()
+            outcome = await self.run_check(check.spec)
+            self._record(outcome, run_at)
+            self._maybe_release()
+
+    def check_state(self, name: str, history: bool = False) -> Dict[str, Any]:
+        check = next(c for c in self.checks if c.spec.name == name)
+        outcome = self.latest.get(name)
+        state: Dict[str, Any] = {
+            "check_name": name,
+            "check_type": check.check_type,
+            "interval_seconds": check.interval_seconds,
+            "timeout_seconds": check.spec.timeout_seconds,
+            "last_run_at_utc": self.last_run_at[name].isoformat() if name in self.last_run_at else None,
+            "next_run_in_seconds": max(0.0, self.next_run_at[name] - time.monotonic()),
+            "latest": asdict(outcome) if outcome is not None else None,
+            "latency": latency_summary(list(self.latencies[name])),
+        }
+        if history:
+            state["recent_latencies_seconds"] = list(self.latencies[name])
+        return state
+
+    def health(self) -> Dict[str, Any]:
+        statuses = {name: outcome.status for name, outcome in self.latest.items()}
+        return {
+            "status": "ok",
+            "started_at_utc": self.started_at.isoformat(),
+            "uptime_seconds": (datetime.utcnow() - self.started_at).total_seconds(),
+            "db_path": self.db_path,
+            "checks": len(self.checks),
+            "checks_run": len(self.latest),
+            "running": len(self._inflight),
+            "unwinding": sorted(self._unwinding),
+            "exit_code": max((STATUS_EXIT_CODES[s] for s in statuses.values()), default=0),
+            "statuses": statuses,
+        }
+
+    def route(self, method: str, path: str) -> Tuple[int, Dict[str, Any]]:
+        if method != "GET":
+            return 405, {"error": "method not allowed"}
+        path = path.split("?", 1)[0].rstrip("/")
+        if path == "/health":
+            return 200, self.health()
+        if path == "/results":
+            return 200, {
+                "db_path": self.db_path,
+                "checks": [self.check_state(c.spec.name) for c in self.checks],
+            }
+        if path.startswith("/results/"):
+            name = path[len("/results/"):]
+            if name in self.latencies:
+                return 200, self.check_state(name, history=True)
+        return 404, {"error": f"no such resource {path!r}"}
+
+    async def handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Minimal HTTP/1.0-style handler: one request per connection, JSON responses."""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5.0)
+            if len(head) > MAX_REQUEST_BYTES:
+                raise ValueError("request too large")
+            method, path, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+            status, body = self.route(method, path)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            status, body = 400, {"error": "bad request"}
+        payload = json.dumps(body, indent=2, default=str).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        """Open the connection, start the HTTP server and run every schedule until cancelled."""
+        loop = asyncio.get_running_loop()
+        # Warm the shared connection before the first checks race to open it
+        await loop.run_in_executor(self.executor, lambda: get_provider(self.db_path).connection())
+        server = await asyncio.start_server(self.handle_http, host, port)
+        logger.info(
+            "Monitoring %s: %s checks, results on http://%s:%s/results", self.db_path, len(self.checks), host, port
+        )
+        tasks = [asyncio.create_task(self.schedule(c), name=c.spec.name) for c in self.checks]
+        try:
+            async with server:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.executor.shutdown(wait=False)
+
+
+def build_schedule(
+    checks: List[CheckSpec],
+    type_intervals: Optional[Dict[str, float]] = None,
+    intervals: Optional[Dict[str, float]] = None,
+) -> List[ScheduledCheck]:
+    """Assign each check its type's interval, or a per-check override."""
+    type_intervals = {**DEFAULT_INTERVALS, **(type_intervals or {})}
+    intervals = intervals or {}
+    scheduled = []
+    for spec in checks:
+        kind = check_type(spec.name)
+        scheduled.append(
+            ScheduledCheck(spec=spec, check_type=kind, interval_seconds=intervals.get(spec.name, type_intervals[kind]))
+        )
+    return scheduled
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the quality checks on schedules and serve their results over HTTP.")
+    parser.add_argument("--db-path", default=os.environ.get("DB_PATH", "./data/warehouse/saas_analytics.duckdb"))
+    parser.add_argument("--host", default=DEFAULT_HOST, help="HTTP bind address (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="HTTP port (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Checks running concurrently (default: %(default)s)")
+    for kind, seconds in DEFAULT_INTERVALS.items():
+        parser.add_argument(f"--{kind}-interval", type=float, default=seconds, metavar="SECONDS",
+                            help=f"Seconds between {kind} check runs (default: %(default)g)")
+    parser.add_argument("--interval", type=parse_check_seconds, action="append", default=[],
+                        metavar="CHECK=SECONDS", help="Override the interval of one check")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS,
+                        help="Per-check timeout in seconds (default: %(default)s)")
+    parser.add_argument("--check-timeout", type=parse_check_seconds, action="append", default=[],
+                        metavar="CHECK=SECONDS", help="Override the timeout of one check")
+    parser.add_argument("--select", action="append", default=[], metavar="PATTERN",
+                        help="Only run checks whose name matches this glob (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="Skip checks whose name matches this glob (repeatable)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Run anomaly checks incrementally against their persisted series state")
+    parser.add_argument("--sample", type=Sampling.parse, default=None, metavar="METHOD:SIZE",
+                        help="Run validations approximately on a sample, e.g. bernoulli:1%%, reservoir:100000")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompute every check instead of reusing cached results for unchanged inputs")
+    parser.add_argument("--idle-release", type=float, default=None, metavar="SECONDS",
+                        help="Close the warehouse connection when no check is due within this many seconds, "
+                        "so writers can lock the file (default: keep it open)")
+    parser.add_argument("--metrics-sink", default=None, metavar="SINKS",
+                        help="Emit run metrics to these sinks (default: MONITORING_METRICS_SINK; see instrumentation)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Attach DuckDB query profiles to the emitted run metrics")
+    parser.add_argument("--list", action="store_true", help="List the schedule and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args = parse_args(argv)
+
+    checks = discover_checks(
+        default_timeout=args.timeout,
+        timeouts=dict(args.check_timeout),
+        incremental=args.incremental,
+        bypass_cache=args.no_cache,
+        sampling=args.sample,
+    )
+    if args.select:
+        checks = [c for c in checks if any(fnmatch.fnmatch(c.name, p) for p in args.select)]
+    checks = [c for c in checks if not any(fnmatch.fnmatch(c.name, p) for p in args.exclude)]
+    if not checks:
+        logger.error("No checks selected")
+        return 2
+
+    schedule = build_schedule(
+        checks,
+        type_intervals={kind: getattr(args, f"{kind}_interval") for kind in DEFAULT_INTERVALS},
+        intervals=dict(args.interval),
+    )
+    if args.list:
+        for c in schedule:
+            print(f"{c.spec.name} (every {c.interval_seconds:g}s, timeout {c.spec.timeout_seconds:g}s)")
+        return 0
+
+    result_cache.configure(enabled_by_default=True)
+    instrumentation.configure(
+        sinks=instrumentation.sinks_from_spec(args.metrics_sink) if args.metrics_sink else None,
+        capture_profiles=args.profile or None,
+    )
+    daemon = MonitorDaemon(
+        args.db_path,
+        schedule,
+        max_workers=args.workers,
+        idle_release_seconds=args.idle_release,
+    )
+
+    async def run() -> None:
+        task = asyncio.create_task(daemon.serve(args.host, args.port))
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            logger.info("Shutting down")
+
+    try:
+        asyncio.run(run())
+    finally:
+        close_all()
+        anomaly_state.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,288 @@
+"""
+Result cache for monitoring checks, keyed on a fingerprint of their input tables.
+
+Schedulers run the monitors far more often than dbt rebuilds the marts, so most
+runs would recompute results from unchanged inputs. Checks decorated with
+cached_check(inputs=[...]) store their result on disk under a key made of:
+- the check name and its bound parameters (defaults included)
+- a fingerprint of the warehouse inputs
+- today's date (UTC), for checks whose windows are relative to current_date
+
+Fingerprint modes (MONITORING_CACHE_FINGERPRINT):
+- file (default): size/mtime of the warehouse file and its WAL. Costs no query and
+  is exact, but any write to the warehouse invalidates every entry.
+- checksum: count(*) plus a sum of row hashes per input table. Survives writes to
+  other tables; costs a scan of the inputs (still cheaper than most checks).
+- dbt: invocation_id of dbt's run_results.json (DBT_TARGET_PATH, default
+  ./dbt_project/target), falling back to file when there is none.
+
+Other settings:
+- MONITORING_CACHE=on|off: use the cache. Calling a check directly leaves it off
+  unless this is set; run_checks and monitor_daemon turn it on by default
+  (configure(enabled_by_default=True)). bypass_cache=True on a call recomputes.
+- MONITORING_CACHE_DIR: cache directory (default ./data/warehouse/.monitoring_cache)
+- MONITORING_CACHE_MAX_MB: total size bound; least recently used entries are evicted (default 256)
+- MONITORING_CACHE_MAX_ROWS: results whose flagged rows exceed this are not cached (default 10000)
+
+A result is stored with its flagged rows (CheckRows) read into memory at the time
+the check ran, so a hit serves the rows that match the cached status and never
+queries the warehouse again. Results with more rows than the limit are recomputed
+on every run rather than cached without their rows.
+
+Entries are pickles, and loading a pickle can run arbitrary code. The cache
+directory must therefore be private to the user running the checks: it is created
+with mode 0700, and entries are not read from a directory that is owned by another
+user or writable by group or others. Never point MONITORING_CACHE_DIR at a shared
+location.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from dataclasses import fields, is_dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from check_rows import CheckRows
+from connection_provider import get_provider
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "./data/warehouse/.monitoring_cache"
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_ROWS = 10_000
+DEFAULT_DBT_TARGET_PATH = "./dbt_project/target"
+FINGERPRINT_MODES = ("file", "checksum", "dbt")
+
+_evict_lock = threading.Lock()
+# Used when MONITORING_CACHE is unset; the CLIs turn it on through configure()
+_enabled_by_default = False
+
+
+def configure(enabled_by_default: bool) -> None:
+    global _enabled_by_default
+    _enabled_by_default = enabled_by_default
+
+
+def cache_enabled() -> bool:
+    value = os.environ.get("MONITORING_CACHE")
+    if value is None:
+        return _enabled_by_default
+    return value.lower() not in ("off", "0", "false")
+
+
+def _is_private_dir(path: str) -> bool:
+    """True if path is a directory owned by this user and not writable by group or others."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if not hasattr(os, "getuid"):
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def _file_version(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _dbt_invocation_id() -> Optional[str]:
+    path = os.path.join(os.environ.get("DBT_TARGET_PATH", DEFAULT_DBT_TARGET_PATH), "run_results.json")
+    try:
+        with open(path) as f:
+            return json.load(f)["metadata"]["invocation_id"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def fingerprint_inputs(db_path: str, inputs: Iterable[str], mode: Optional[str] = None) -> Tuple:
+    """Cheap fingerprint of a check's input tables; changes whenever the inputs may have changed."""
+    mode = mode or os.environ.get("MONITORING_CACHE_FINGERPRINT", "file")
+    if mode not in FINGERPRINT_MODES:
+        raise ValueError(f"Unknown cache fingerprint mode {mode!r}; expected one of {FINGERPRINT_MODES}")
+
+    if mode == "dbt":
+        invocation_id = _dbt_invocation_id()
+        if invocation_id is not None:
+            return "dbt", invocation_id
+    if mode == "checksum":
+        # One query for all inputs; hash(t) hashes the whole row
+        parts = [f"select '{table}' as input, count(*) as row_count, sum(hash(t)) as checksum from {table} t" for table in sorted(inputs)]
+        with get_provider(db_path).cursor() as conn:
+            return "checksum", tuple(conn.execute(" union all ".join(parts) + " order by 1").fetchall())
+    return "file", _file_version(db_path), _file_version(f"{db_path}.wal")
+
+
+class ResultCache:
+    """Pickled results in a directory, bounded in total size with least-recently-used eviction."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.environ.get("MONITORING_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("MONITORING_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Any:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        if not _is_private_dir(self.cache_dir):
+            logger.warning(
+                "Ignoring result cache %s: it must be owned by this user and not writable by others", self.cache_dir
+            )
+            return None
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Dropping unreadable cache entry %s: %s", path, e)
+            self._remove(path)
+            return None
+        # mtime doubles as the last-used time for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the directory fits max_bytes; returns entries removed."""
+        with _evict_lock:
+            entries: List[Tuple[float, int, str]] = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                removed += 1
+            return removed
+
+    def clear(self) -> None:
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".pkl"):
+                    self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def materialize_result(result: Any, max_rows: int) -> Optional[Any]:
+    """
+    Copy of a check result with its CheckRows fields read into memory.
+
+    Returns None if any of them has more than max_rows rows.
+    """
+    if not is_dataclass(result):
+        return result
+    changes = {}
+    for field in fields(result):
+        value = getattr(result, field.name)
+        if isinstance(value, CheckRows):
+            rows = value.materialize(max_rows)
+            if rows is None:
+                return None
+            changes[field.name] = rows
+    return replace(result, **changes) if changes else result
+
+
+def cache_key(check: str, db_path: str, params: dict, fingerprint: Tuple, as_of: Optional[str]) -> str:
+    payload = repr((check, os.path.abspath(db_path), sorted(params.items()), fingerprint, as_of))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cached_check(inputs: Iterable[str], date_dependent: bool = False) -> Callable:
+    """
+    Cache a check's result on its parameters and a fingerprint of its input tables.
+
+    Args:
+        inputs: Warehouse tables the check reads (schema-qualified)
+        date_dependent: The check's windows are relative to current_date, so results
+            are only reused within the same UTC day
+
+    The wrapped check takes an extra keyword-only bypass_cache=False to force a recompute
+    (the fresh result still refreshes the cache).
+    """
+    inputs = tuple(inputs)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        check_name = f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, bypass_cache: bool = False, **kwargs):
+            if not cache_enabled():
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            db_path = params.pop("db_path")
+            as_of = datetime.utcnow().date().isoformat() if date_dependent else None
+            key = cache_key(check_name, db_path, params, fingerprint_inputs(db_path, inputs), as_of)
+
+            cache = ResultCache()
+            if not bypass_cache:
+                cached = cache.get(key)
+                if cached is not None:
+                    logger.debug("Cache hit for %s", check_name)
+                    return cached
+            result = func(*args, **kwargs)
+            max_rows = int(os.environ.get("MONITORING_CACHE_MAX_ROWS", DEFAULT_MAX_ROWS))
+            stored = materialize_result(result, max_rows)
+            if stored is None:
+                logger.debug("Not caching %s: more than %s flagged rows", check_name, max_rows)
+                return result
+            try:
+                cache.put(key, stored)
+            except Exception as e:
+                logger.warning("Could not cache result of %s: %s", check_name, e)
+            # Same rows as a later cache hit would serve
+            return stored
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,351 @@
+"""
+Run every quality check concurrently and merge the results into one report.
+
+Checks are discovered by name from the monitoring modules:
+- anomaly_detection, customer_anomalies: detect_* (AnomalyResult; anomalies => fail)
+- metric_validation: validate_* (ValidationResult; failures => fail)
+- freshness_monitor: check_* (freshness DataFrame; worst table status)
+
+Every check runs on a thread against the shared read-only connection
+(connection_provider) with its own timeout; a check that overruns has its
+query interrupted and is reported as timed out instead of stalling the run.
+
+Exit code is the worst outcome across checks, using the scripts' convention:
+- 0: all checks ok
+- 1: warnings only (e.g. freshness warn threshold)
+- 2: any failure, error or timeout
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import functools
+import importlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+import anomaly_state
+import instrumentation
+import result_cache
+from anomaly_detection import AnomalyResult
+from connection_provider import close_all, get_provider, interrupt_thread
+from metric_validation import Sampling, ValidationResult
+
+logger = logging.getLogger(__name__)
+
+# Module name -> prefix of the public functions in it that are checks
+CHECK_MODULES: Dict[str, str] = {
+    "anomaly_detection": "detect_",
+    "customer_anomalies": "detect_",
+    "metric_validation": "validate_",
+    "freshness_monitor": "check_",
+}
+
+DEFAULT_TIMEOUT_SECONDS = 300.0
+SAMPLE_ROWS = 5
+POLL_INTERVAL_SECONDS = 0.05
+
+STATUS_EXIT_CODES = {"ok": 0, "warn": 1, "fail": 2, "error": 2, "timeout": 2}
+
+
+@dataclass(frozen=True)
+class CheckSpec:
+    name: str
+    func: Callable[..., Any]
+    timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS
+
+
+@dataclass(frozen=True)
+class CheckOutcome:
+    check_name: str
+    status: str
+    rows: int
+    duration_seconds: float
+    detail: str = ""
+    sample: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class RunReport:
+    run_at_utc: datetime
+    db_path: str
+    outcomes: List[CheckOutcome]
+
+    @property
+    def exit_code(self) -> int:
+        return max((STATUS_EXIT_CODES[o.status] for o in self.outcomes), default=0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for o in self.outcomes:
+            counts[o.status] = counts.get(o.status, 0) + 1
+        return {
+            "run_at_utc": self.run_at_utc.isoformat(),
+            "db_path": self.db_path,
+            "exit_code": self.exit_code,
+            "status_counts": counts,
+            "checks": [asdict(o) for o in self.outcomes],
+        }
+
+
+def discover_checks(
+    default_timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    timeouts: Optional[Dict[str, float]] = None,
+    incremental: bool = False,
+    bypass_cache: bool = False,
+    sampling: Optional[Sampling] = None,
+) -> List[CheckSpec]:
+    """
+    Find every check function in CHECK_MODULES.
+
+    Check names are "<module>.<function>"; timeouts may override the default per
+    check name. Only functions defined in the module itself are picked up, so
+    imported helpers with a matching prefix are ignored. incremental, bypass_cache and
+    sampling are passed on to the checks that support them (see anomaly_state,
+    result_cache, metric_validation).
+    """
+    timeouts = timeouts or {}
+    specs: List[CheckSpec] = []
+    for module_name, prefix in CHECK_MODULES.items():
+        module = importlib.import_module(module_name)
+        for func_name, func in inspect.getmembers(module, inspect.isfunction):
+            if func_name.startswith(prefix) and func.__module__ == module.__name__:
+                name = f"{module_name}.{func_name}"
+                options = {}
+                if incremental and "incremental" in inspect.signature(func).parameters:
+                    options["incremental"] = True
+                if sampling is not None and "sampling" in inspect.signature(func).parameters:
+                    options["sampling"] = sampling
+                if bypass_cache and "bypass_cache" in inspect.signature(func, follow_wrapped=False).parameters:
+                    options["bypass_cache"] = True
+                if options:
+                    func = functools.partial(func, **options)
+                specs.append(CheckSpec(name=name, func=func, timeout_seconds=timeouts.get(name, default_timeout)))
+    return specs
+
+
+def _sample(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def summarize_result(check_name: str, result: Any, duration_seconds: float) -> CheckOutcome:
+    """Map a check's native result type onto a CheckOutcome; only a count and a few sample rows are fetched."""
+    if isinstance(result, (AnomalyResult, ValidationResult)):
+        rows = result.anomalies if isinstance(result, AnomalyResult) else result.failures
+        count = rows.count()
+        estimate = getattr(result, "estimate", None)
+        return CheckOutcome(
+            check_name=check_name,
+            status="fail" if count > 0 else "ok",
+            rows=count,
+            duration_seconds=duration_seconds,
+            detail=f"sampled: {estimate.describe()}" if estimate is not None else "",
+            sample=_sample(rows.head(SAMPLE_ROWS)) if count > 0 else [],
+        )
+    if isinstance(result, pd.DataFrame) and "status" in result.columns:
+        # Freshness: one row per table with ok/warn/error
+        flagged = result[result["status"] != "ok"]
+        if (result["status"] == "error").any():
+            status = "fail"
+        elif (result["status"] == "warn").any():
+            status = "warn"
+        else:
+            status = "ok"
+    else:
+        return CheckOutcome(
+            check_name=check_name,
+            status="error",
+            rows=0,
+            duration_seconds=duration_seconds,
+            detail=f"unsupported result type {type(result).__name__}",
+        )
+    return CheckOutcome(
+        check_name=check_name,
+        status=status,
+        rows=len(flagged),
+        duration_seconds=duration_seconds,
+        sample=_sample(flagged.head(SAMPLE_ROWS)),
+    )
+
+
+def run_checks(
+    db_path: str,
+    checks: Optional[List[CheckSpec]] = None,
+    max_workers: Optional[int] = None,
+) -> RunReport:
+    """
+    Run checks concurrently with per-check timeouts.
+
+    Args:
+        db_path: DuckDB warehouse path
+        checks: Checks to run (defaults to discover_checks())
+        max_workers: Concurrent checks (defaults to one thread per check)
+
+    Returns:
+        RunReport with one outcome per check, in discovery order
+
+    Timeouts are measured from when a check starts running, not from when it
+    was queued, so a small pool does not eat into later checks' budgets.
+    """
+    checks = discover_checks() if checks is None else checks
+    run_at = datetime.utcnow()
+    if not checks:
+        return RunReport(run_at_utc=run_at, db_path=db_path, outcomes=[])
+
+    # Open the shared connection once up front rather than racing to open it in every worker
+    get_provider(db_path).connection()
+
+    started_at: Dict[str, float] = {}
+    thread_ids: Dict[str, int] = {}
+    state_lock = threading.Lock()
+
+    def execute(spec: CheckSpec) -> CheckOutcome:
+        with state_lock:
+            started_at[spec.name] = time.monotonic()
+            thread_ids[spec.name] = threading.get_ident()
+        result = spec.func(db_path)
+        return summarize_result(spec.name, result, time.monotonic() - started_at[spec.name])
+
+    outcomes: Dict[str, CheckOutcome] = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(checks), thread_name_prefix="check")
+    try:
+        pending: Dict[Future, CheckSpec] = {executor.submit(execute, spec): spec for spec in checks}
+        while pending:
+            done, _ = wait(pending, timeout=POLL_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                spec = pending.pop(future)
+                if spec.name in outcomes:
+                    # Already reported as timed out; the interrupted query has now unwound
+                    continue
+                try:
+                    outcomes[spec.name] = future.result()
+                except Exception as e:
+                    elapsed = time.monotonic() - started_at.get(spec.name, time.monotonic())
+                    logger.error("Check %s raised %s: %s", spec.name, type(e).__name__, e)
+                    outcomes[spec.name] = CheckOutcome(
+                        check_name=spec.name, status="error", rows=0, duration_seconds=elapsed, detail=str(e)
+                    )
+
+            now = time.monotonic()
+            for future, spec in list(pending.items()):
+                with state_lock:
+                    started = started_at.get(spec.name)
+                if started is None or spec.name in outcomes or now - started < spec.timeout_seconds:
+                    continue
+                interrupted = interrupt_thread(thread_ids[spec.name])
+                logger.error(
+                    "Check %s timed out after %.1fs (%s queries interrupted)", spec.name, spec.timeout_seconds, interrupted
+                )
+                outcomes[spec.name] = CheckOutcome(
+                    check_name=spec.name,
+                    status="timeout",
+                    rows=0,
+                    duration_seconds=now - started,
+                    detail=f"exceeded {spec.timeout_seconds:g}s timeout",
+                )
+                if future.done() or future.cancel():
+                    pending.pop(future)
+    finally:
+        # Interrupted checks unwind on their own; never block the report on them
+        executor.shutdown(wait=False)
+
+    return RunReport(run_at_utc=run_at, db_path=db_path, outcomes=[outcomes[spec.name] for spec in checks])
+
+
+def parse_check_seconds(value: str) -> tuple:
+    name, _, seconds = value.partition("=")
+    if not name or not seconds:
+        raise argparse.ArgumentTypeError("expected CHECK=SECONDS")
+    return name, float(seconds)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run all quality monitoring checks concurrently.")
+    parser.add_argument("--db-path", default=os.environ.get("DB_PATH", "./data/warehouse/saas_analytics.duckdb"))
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent checks (default: one per check)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS,
+                        help="Per-check timeout in seconds (default: %(default)s)")
+    parser.add_argument("--check-timeout", type=parse_check_seconds, action="append", default=[],
+                        metavar="CHECK=SECONDS", help="Override the timeout of one check, e.g. "
+                        "anomaly_detection.detect_mrr_anomalies=60")
+    parser.add_argument("--select", action="append", default=[], metavar="PATTERN",
+                        help="Only run checks whose name matches this glob (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="Skip checks whose name matches this glob (repeatable)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Run anomaly checks incrementally against their persisted series state")
+    parser.add_argument("--sample", type=Sampling.parse, default=None, metavar="METHOD:SIZE",
+                        help="Run validations approximately on a sample, e.g. bernoulli:1%%, system:5%%, "
+                        "reservoir:100000 (default: exact)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompute every check instead of reusing cached results for unchanged inputs")
+    parser.add_argument("--metrics-sink", default=None, metavar="SINKS",
+                        help="Emit run metrics to these sinks, e.g. prom:/var/lib/node_exporter/monitoring.prom "
+                        "(default: MONITORING_METRICS_SINK; see instrumentation)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Attach DuckDB query profiles to the emitted run metrics")
+    parser.add_argument("--list", action="store_true", help="List discovered checks and exit")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args = parse_args(argv)
+
+    checks = discover_checks(
+        default_timeout=args.timeout,
+        timeouts=dict(args.check_timeout),
+        incremental=args.incremental,
+        bypass_cache=args.no_cache,
+        sampling=args.sample,
+    )
+    if args.select:
+        checks = [c for c in checks if any(fnmatch.fnmatch(c.name, p) for p in args.select)]
+    checks = [c for c in checks if not any(fnmatch.fnmatch(c.name, p) for p in args.exclude)]
+
+    if args.list:
+        for c in checks:
+            print(f"{c.name} (timeout {c.timeout_seconds:g}s)")
+        return 0
+
+    result_cache.configure(enabled_by_default=True)
+    instrumentation.configure(
+        sinks=instrumentation.sinks_from_spec(args.metrics_sink) if args.metrics_sink else None,
+        capture_profiles=args.profile or None,
+    )
+    try:
+        report = run_checks(args.db_path, checks, max_workers=args.workers)
+    finally:
+        close_all()
+        anomaly_state.close_all()
+
+    for o in report.outcomes:
+        msg = "%s: status=%s rows=%s duration=%.2fs %s" % (o.check_name, o.status, o.rows, o.duration_seconds, o.detail)
+        if STATUS_EXIT_CODES[o.status] >= 2:
+            logger.error(msg)
+        elif o.status == "warn":
+            logger.warning(msg)
+        else:
+            logger.info(msg)
+    logger.info("Ran %s checks, exit code %s", len(report.outcomes), report.exit_code)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report.to_dict(), f, indent=2, default=str)
+    return report.exit_code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
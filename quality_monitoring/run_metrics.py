@@ -0,0 +1,363 @@
+"""
+Run records, sinks and query profiling shared by the checks and the data pipeline.
+
+quality_monitoring/instrumentation.py (checks) and data_generation/stage_metrics.py
+(pipeline stages) both build RunMetrics records and hand them to the sinks defined
+here, so the two always write the same layout and can share one sink:
+- prom:<path>: Prometheus textfile for node_exporter's textfile collector; keeps
+  the latest value per (component, name) and merges with what other processes wrote
+- jsonl:<path>: one JSON object per run, appended
+- duckdb:<path>: one row per run in a monitoring_runs table
+
+ProfilingCursor collects DuckDB's JSON query profiles, from which rows_scanned()
+reads the rows a run scanned. This module only needs duckdb when a DuckDB sink or
+a profiling cursor is used, so the generator can import it without duckdb installed.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RSS_SAMPLE_INTERVAL = 0.01
+PROMETHEUS_PREFIX = "saas_monitoring"
+PROMETHEUS_GAUGES = {
+    "wall_seconds": "Wall time of the latest run in seconds",
+    "rows_scanned": "Rows scanned by DuckDB in the latest run",
+    "rows_returned": "Rows returned by the latest run",
+    "peak_rss_bytes": "Peak resident memory of the process during the latest run",
+    "last_run_timestamp_seconds": "Unix time the latest run started",
+    "last_run_success": "1 if the latest run completed without raising",
+}
+
+# Groups the records of one process, e.g. all checks of a run_checks invocation
+RUN_ID = os.environ.get("MONITORING_RUN_ID") or uuid.uuid4().hex
+
+
+@dataclass(frozen=True)
+class RunMetrics:
+    component: str  # "check" or "stage"
+    name: str
+    started_at_utc: datetime
+    wall_seconds: float
+    rows_scanned: Optional[int] = None
+    rows_returned: Optional[int] = None
+    peak_rss_bytes: Optional[int] = None
+    status: str = "ok"  # ok | error
+    error: str = ""
+    run_id: str = RUN_ID
+    profile: Optional[str] = None  # JSON list of query profiles
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = asdict(self)
+        record["started_at_utc"] = self.started_at_utc.isoformat()
+        return record
+
+
+def profiles_requested() -> bool:
+    """MONITORING_PROFILE=1: attach the query profiles to each record."""
+    return os.environ.get("MONITORING_PROFILE", "").lower() in ("1", "true", "on")
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the process-lifetime peak (KiB on Linux, bytes on macOS)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+class PeakRSSSampler:
+    """
+    Peak resident set size of the process while a block runs, polled from a background thread.
+
+    Each block gets its own peak rather than the process-lifetime high-water mark,
+    except on platforms without /proc, where ru_maxrss is the only source.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> None:
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> PeakRSSSampler:
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class ProfilingCursor:
+    """
+    Cursor (or connection) wrapper that collects DuckDB's JSON profile of each query it runs.
+
+    DuckDB writes a query's profile to the output file once its result has been
+    drained, overwriting the previous one. So before the next query starts, and
+    before the cursor closes, whatever the caller left unread of the previous
+    result (e.g. after fetchone()) is drained and its profile picked up.
+    """
+
+    def __init__(self, cursor: Any, profiles: List[Dict[str, Any]]):
+        self._cursor = cursor
+        self._profiles = profiles
+        # Set the output before enabling the profiler, so no profile is printed to stdout;
+        # newer DuckDB only accepts a path not matching the current format if it ends in .txt
+        fd, self._path = tempfile.mkstemp(prefix="duckdb_profile_", suffix=".txt")
+        os.close(fd)
+        try:
+            cursor.execute("PRAGMA profiling_output = '%s'" % self._path.replace("'", "''"))
+            cursor.execute("PRAGMA enable_profiling = 'json'")
+        finally:
+            self._discard()
+
+    def _discard(self) -> None:
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
+
+    def collect(self) -> None:
+        import duckdb
+
+        try:
+            self._cursor.fetchall()
+        except duckdb.Error:
+            # No open result: never executed, streamed through a reader, or interrupted
+            pass
+        try:
+            with open(self._path) as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            return
+        finally:
+            self._discard()
+        self._profiles.append(profile)
+
+    def execute(self, *args, **kwargs) -> ProfilingCursor:
+        self.collect()
+        self._cursor.execute(*args, **kwargs)
+        return self
+
+    def close(self) -> None:
+        self.collect()
+        self._cursor.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+def rows_scanned(profile: Dict[str, Any]) -> int:
+    """Rows read by the scans of one query profile (across DuckDB versions' JSON layouts)."""
+    if "cumulative_rows_scanned" in profile:
+        return int(profile["cumulative_rows_scanned"])
+    total = 0
+    nodes = [profile]
+    while nodes:
+        node = nodes.pop()
+        if "SCAN" in str(node.get("operator_type") or node.get("name") or ""):
+            total += int(node.get("operator_rows_scanned", node.get("cardinality", 0)) or 0)
+        nodes.extend(node.get("children") or [])
+    return total
+
+
+class MetricsSink:
+    def emit(self, metrics: RunMetrics) -> None:
+        raise NotImplementedError
+
+
+def _ensure_parent(path: str) -> None:
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+
+
+class JsonLinesSink(MetricsSink):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, metrics: RunMetrics) -> None:
+        line = json.dumps(metrics.to_dict(), default=str) + "\n"
+        with self._lock:
+            _ensure_parent(self.path)
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class PrometheusTextfileSink(MetricsSink):
+    """
+    Gauges of the latest run per (component, name) in node_exporter's textfile format.
+
+    The file is rewritten atomically on every emit, keeping the samples of other
+    checks and stages (or other processes sharing the file) that this run did not touch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _samples(self, metrics: RunMetrics) -> Dict[str, float]:
+        labels = '{component="%s",name="%s"}' % (_label(metrics.component), _label(metrics.name))
+        values = {
+            "wall_seconds": metrics.wall_seconds,
+            "rows_scanned": metrics.rows_scanned,
+            "rows_returned": metrics.rows_returned,
+            "peak_rss_bytes": metrics.peak_rss_bytes,
+            "last_run_timestamp_seconds": (metrics.started_at_utc - datetime(1970, 1, 1)).total_seconds(),
+            "last_run_success": 1 if metrics.status == "ok" else 0,
+        }
+        return {f"{PROMETHEUS_PREFIX}_{gauge}{labels}": value for gauge, value in values.items() if value is not None}
+
+    def _read(self) -> Dict[str, str]:
+        samples: Dict[str, str] = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        key, _, value = line.rpartition(" ")
+                        samples[key] = value
+        except FileNotFoundError:
+            pass
+        return samples
+
+    def emit(self, metrics: RunMetrics) -> None:
+        with self._lock:
+            samples = self._read()
+            samples.update({key: repr(float(value)) for key, value in self._samples(metrics).items()})
+            lines: List[str] = []
+            for gauge, help_text in PROMETHEUS_GAUGES.items():
+                metric = f"{PROMETHEUS_PREFIX}_{gauge}"
+                keys = sorted(key for key in samples if key.partition("{")[0] == metric)
+                if keys:
+                    lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+                    lines += [f"{key} {samples[key]}" for key in keys]
+
+            _ensure_parent(self.path)
+            # The collector may read at any time; never let it see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write("\n".join(lines) + "\n")
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+
+
+class DuckDBSink(MetricsSink):
+    """Append each run to a monitoring_runs table, e.g. in the anomaly state database."""
+
+    def __init__(self, path: str, table: str = "monitoring_runs"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+
+    def emit(self, metrics: RunMetrics) -> None:
+        import duckdb
+
+        with self._lock:
+            _ensure_parent(self.path)
+            # Connect per run so the file is not held open (and locked) between runs
+            conn = duckdb.connect(self.path)
+            try:
+                conn.execute(
+                    f"""
+                    create table if not exists {self.table} (
+                        run_id varchar,
+                        component varchar,
+                        name varchar,
+                        started_at_utc timestamp,
+                        wall_seconds double,
+                        rows_scanned bigint,
+                        rows_returned bigint,
+                        peak_rss_bytes bigint,
+                        status varchar,
+                        error varchar,
+                        profile varchar
+                    )
+                    """
+                )
+                conn.execute(
+                    f"""
+                    insert into {self.table} (
+                        run_id, component, name, started_at_utc, wall_seconds, rows_scanned,
+                        rows_returned, peak_rss_bytes, status, error, profile
+                    ) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        metrics.run_id,
+                        metrics.component,
+                        metrics.name,
+                        metrics.started_at_utc,
+                        metrics.wall_seconds,
+                        metrics.rows_scanned,
+                        metrics.rows_returned,
+                        metrics.peak_rss_bytes,
+                        metrics.status,
+                        metrics.error,
+                        metrics.profile,
+                    ],
+                )
+            finally:
+                conn.close()
+
+
+SINK_TYPES: Dict[str, Callable[[str], MetricsSink]] = {
+    "prom": PrometheusTextfileSink,
+    "jsonl": JsonLinesSink,
+    "duckdb": DuckDBSink,
+}
+
+
+def sinks_from_spec(spec: Optional[str]) -> List[MetricsSink]:
+    """Parse a comma-separated list of <type>:<path> sinks (see module docstring)."""
+    sinks: List[MetricsSink] = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kind, _, path = item.partition(":")
+        if kind not in SINK_TYPES or not path:
+            raise ValueError(f"Invalid metrics sink {item!r}; expected one of {sorted(SINK_TYPES)} as <type>:<path>")
+        sinks.append(SINK_TYPES[kind](path))
+    return sinks
+
+
+def emit_to(sinks: List[MetricsSink], metrics: RunMetrics) -> None:
+    """Hand a record to every sink; a failing sink never fails the run it measures."""
+    for sink in sinks:
+        try:
+            sink.emit(metrics)
+        except Exception as e:
+            logger.warning("Metrics sink %s failed: %s", type(sink).__name__, e)
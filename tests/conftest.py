@@ -0,0 +1,65 @@
+"""
+Shared fixtures for the unit tests.
+
+Tests build small DuckDB warehouses under tmp_path instead of reading
+data/warehouse, so they run before (and without) the generator and dbt build.
+"""
+
+from __future__ import annotations
+
+import duckdb
+import pytest
+
+import connection_provider
+import result_cache
+
+
+def build_warehouse(path: str, *statements: str) -> str:
+    """Run statements against a new DuckDB file and close it, so checks can open it read-only."""
+    conn = duckdb.connect(path)
+    try:
+        conn.execute("create schema if not exists main_marts")
+        for sql in statements:
+            conn.execute(sql)
+        conn.execute("checkpoint")
+    finally:
+        conn.close()
+    return path
+
+
+@pytest.fixture(autouse=True)
+def _isolated_monitoring(monkeypatch):
+    """Start every test with the cache off and no shared connections left open."""
+    monkeypatch.delenv("MONITORING_CACHE", raising=False)
+    monkeypatch.delenv("MONITORING_CACHE_FINGERPRINT", raising=False)
+    result_cache.configure(enabled_by_default=False)
+    yield
+    connection_provider.close_all()
+
+
+@pytest.fixture
+def mrr_warehouse(tmp_path) -> str:
+    """
+    Warehouse with consistent MRR marts: 24 months of 500 customers paying 10-500 a month,
+    and mrr_analysis holding the same monthly totals split across two segments.
+    """
+    return build_warehouse(
+        str(tmp_path / "mrr.duckdb"),
+        """
+        create table main_marts.fct_monthly_recurring_revenue as
+        select
+            c.customer_id,
+            cast(date '2023-01-01' + to_months(cast(m.i as integer)) as date) as date_month,
+            cast(10 + (37 * c.customer_id + 101 * m.i) % 491 as double) as mrr_amount
+        from range(1, 501) c(customer_id), range(24) m(i)
+        """,
+        """
+        create table main_marts.mrr_analysis as
+        select
+            date_month,
+            case when customer_id % 2 = 0 then 'smb' else 'enterprise' end as customer_segment,
+            sum(mrr_amount) as total_mrr
+        from main_marts.fct_monthly_recurring_revenue
+        group by all
+        """,
+    )
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from datetime import date
+
+import duckdb
+import pandas as pd
+import pytest
+
+from anomaly_detection import SLICE_METRICS_QUERY, detect_slice_anomalies
+from conftest import build_warehouse
+from connection_provider import collect_profiles
+
+MONTHS = 16
+# Rows the customer-grain grouping may produce per fact row: one per grouping set
+SLICE_GROUPING_SETS = 5
+
+
+@pytest.fixture
+def slice_warehouse(tmp_path) -> str:
+    """
+    Subscription MRR marts for the last MONTHS months: 3000 customers in three segments
+    with two subscriptions each, active for a scattered run of months, plus a five-customer
+    'startup' segment too small to check for churn.
+    """
+    return build_warehouse(
+        str(tmp_path / "slices.duckdb"),
+        """
+        create table main_marts.dim_customers as
+        select
+            range as customer_id,
+            case
+                when range > 3000 then 'startup'
+                else list_extract(['smb', 'mid_market', 'enterprise'], 1 + range % 3)
+            end as customer_segment
+        from range(1, 3006)
+        """,
+        """
+        create table main_marts.dim_plans as
+        select range as plan_id, list_extract(['starter', 'professional', 'enterprise'], 1 + range % 3) as plan_tier
+        from range(1, 7)
+        """,
+        f"""
+        create table main_marts.fct_subscription_monthly_recurring_revenue as
+        with subscriptions as (
+            select
+                customer_id,
+                s.i as subscription,
+                1 + (customer_id + 3 * s.i) % 6 as plan_id,
+                case when (3 * customer_id + s.i) % 4 = 0 then 'annual' else 'monthly' end as billing_cycle,
+                (7 * customer_id + 13 * s.i) % {MONTHS} as a,
+                (11 * customer_id + 5 * s.i) % {MONTHS} as b
+            from main_marts.dim_customers, range(2) s(i)
+        )
+        select
+            customer_id,
+            plan_id,
+            billing_cycle,
+            cast(date_trunc('month', current_date) - to_months(cast(m.i as integer)) as date) as date_month,
+            cast(20 + (31 * customer_id + 17 * subscription + 7 * m.i) % 200 as double) as mrr_amount
+        from subscriptions, range({MONTHS}) m(i)
+        where m.i between least(a, b) and greatest(a, b)
+        """,
+    )
+
+
+def _slice_metrics(db_path: str, min_slice_customers: int) -> pd.DataFrame:
+    conn = duckdb.connect(db_path, read_only=True)
+    try:
+        metrics = conn.execute(
+            SLICE_METRICS_QUERY, [date(2000, 1, 1), date(2100, 1, 1), min_slice_customers, date(2100, 1, 1)]
+        ).fetch_arrow_table()
+    finally:
+        conn.close()
+    return metrics.to_pandas()
+
+
+def _reference_churn(db_path: str, segment: str) -> pd.DataFrame:
+    """Starting and churned customers per month for one segment (or 'all'), computed in pandas."""
+    conn = duckdb.connect(db_path, read_only=True)
+    try:
+        facts = conn.execute(
+            """
+            select f.customer_id, c.customer_segment, f.date_month, f.mrr_amount
+            from main_marts.fct_subscription_monthly_recurring_revenue f
+            join main_marts.dim_customers c using (customer_id)
+            """
+        ).fetch_arrow_table().to_pandas()
+    finally:
+        conn.close()
+    if segment != "all":
+        facts = facts[facts["customer_segment"] == segment]
+    paying = facts.groupby(["customer_id", "date_month"])["mrr_amount"].sum()
+    paying = set(paying[paying > 0].index)
+    rows = {}
+    for customer_id, month in paying:
+        next_month = (pd.Timestamp(month) + pd.DateOffset(months=1)).date()
+        starting, churned = rows.get(next_month, (0, 0))
+        rows[next_month] = (starting + 1, churned + ((customer_id, next_month) not in paying))
+    return pd.DataFrame(
+        [(m, s, c) for m, (s, c) in rows.items()], columns=["date_month", "starting_customers", "churned_customers"]
+    ).sort_values("date_month", ignore_index=True)
+
+
+@pytest.mark.parametrize("segment", ["all", "smb"])
+def test_slice_churn_matches_reference(slice_warehouse, segment):
+    metrics = _slice_metrics(slice_warehouse, min_slice_customers=10)
+    actual = metrics[
+        (metrics["customer_segment"] == segment) & (metrics["plan_tier"] == "all") & (metrics["billing_cycle"] == "all")
+    ]
+    actual = actual[actual["starting_customers"] > 0].sort_values("date_month", ignore_index=True)
+    expected = _reference_churn(slice_warehouse, segment)
+    expected = expected[expected["date_month"] <= actual["date_month"].max()]
+    assert actual["starting_customers"].tolist() == expected["starting_customers"].tolist()
+    assert actual["churned_customers"].tolist() == expected["churned_customers"].tolist()
+
+
+def test_small_slices_skip_churn_but_keep_mrr(slice_warehouse):
+    metrics = _slice_metrics(slice_warehouse, min_slice_customers=10)
+    startup = metrics[(metrics["customer_segment"] == "startup") & (metrics["plan_tier"] == "all")]
+    assert (startup["total_mrr"] > 0).any()
+    assert (startup["starting_customers"] == 0).all()
+
+    unpruned = _slice_metrics(slice_warehouse, min_slice_customers=1)
+    startup = unpruned[(unpruned["customer_segment"] == "startup") & (unpruned["plan_tier"] == "all")]
+    assert (startup["starting_customers"] > 0).any()
+
+
+def test_slice_sweep_cost_is_bounded_by_grouping_sets(slice_warehouse):
+    conn = duckdb.connect(slice_warehouse, read_only=True)
+    try:
+        fact_rows = conn.execute("select count(*) from main_marts.fct_subscription_monthly_recurring_revenue").fetchone()[0]
+    finally:
+        conn.close()
+
+    with collect_profiles() as profiles:
+        detect_slice_anomalies(slice_warehouse)
+
+    # The customer-grain rows per slice dominate the cost; a full CUBE or a window over them
+    # shows up here as an operator producing more than one row per grouping set and fact row
+    largest = 0
+    nodes = list(profiles)
+    while nodes:
+        node = nodes.pop()
+        largest = max(largest, int(node.get("operator_cardinality", node.get("cardinality", 0)) or 0))
+        nodes.extend(node.get("children") or [])
+    assert profiles
+    assert 0 < largest <= SLICE_GROUPING_SETS * fact_rows
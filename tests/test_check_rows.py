@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import pickle
+
+import pyarrow as pa
+import pytest
+
+from check_rows import CheckRows
+from conftest import build_warehouse
+
+
+@pytest.fixture
+def warehouse(tmp_path) -> str:
+    return build_warehouse(
+        str(tmp_path / "rows.duckdb"),
+        "create table main_marts.flagged as select range as id, range * 2 as value from range(10)",
+    )
+
+
+def test_from_arrow_pickle_round_trip():
+    rows = CheckRows.from_arrow(pa.table({"id": [1, 2, 3], "value": ["a", "b", "c"]}))
+    restored = pickle.loads(pickle.dumps(rows))
+    assert restored.count() == 3
+    assert restored.to_arrow().equals(rows.to_arrow())
+    assert restored.head(2)["value"].tolist() == ["a", "b"]
+
+
+def test_query_backed_rows_refuse_to_pickle(warehouse):
+    rows = CheckRows(warehouse, "select * from main_marts.flagged where id >= ?", [5])
+    with pytest.raises(pickle.PicklingError):
+        pickle.dumps(rows)
+
+
+def test_materialized_rows_pickle_without_the_warehouse(warehouse):
+    rows = CheckRows(warehouse, "select * from main_marts.flagged where id >= ? order by id", [5])
+    restored = pickle.loads(pickle.dumps(rows.materialize()))
+    assert restored.db_path == "" and restored.query == ""
+    assert restored.to_pandas()["id"].tolist() == [5, 6, 7, 8, 9]
+
+
+def test_materialize_respects_max_rows(warehouse):
+    rows = CheckRows(warehouse, "select * from main_marts.flagged")
+    assert rows.materialize(max_rows=9) is None
+    assert rows.materialize(max_rows=10).count() == 10
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import filecmp
+import os
+
+import duckdb
+import pytest
+
+from generate_saas_data import (
+    RAW_TABLES,
+    REJECTS_SUFFIX,
+    TABLE_SCHEMAS,
+    ScaleConfig,
+    generate_sharded,
+    main,
+    plan_shards,
+    split_rejects,
+    validation_sql,
+)
+
+PAYMENT_ROWS = [
+    # payment_id, subscription_id, payment_date, amount, status, payment_method, created_at
+    ("1", "10", "2024-01-05", "49.0", "success", "credit_card", "2024-01-05"),
+    ("2", "10", "2024-02-05", "-49.0", " Refunded ", "paypal", "2024-02-05"),
+    ("3", "11", "2024-13-01", "20.0", "success", "paypal", "2024-01-01"),
+    ("4", None, "2024-01-07", "20.0", "success", "paypal", "2024-01-07"),
+    ("5", "12", "2024-01-08", "-5.0", "success", "cash", "2024-01-08"),
+    ("6", "12", "2024-01-09", "5.0", "refunded", "paypal", "2024-01-09"),
+]
+
+
+def _values_sql(rows) -> str:
+    columns = ", ".join(TABLE_SCHEMAS["payments"])
+    values = ", ".join(
+        "(" + ", ".join("null" if v is None else f"'{v}'" for v in row) + ")" for row in rows
+    )
+    return f"select * from (values {values}) t({columns})"
+
+
+@pytest.fixture
+def validated_payments():
+    conn = duckdb.connect()
+    try:
+        yield conn.execute(validation_sql("payments", _values_sql(PAYMENT_ROWS))).fetch_arrow_table()
+    finally:
+        conn.close()
+
+
+def _by_id(batch, column: str) -> dict:
+    return dict(zip(batch.column("payment_id").to_pylist(), batch.column(column).to_pylist()))
+
+
+def test_validation_sql_reason_codes(validated_payments):
+    reasons = _by_id(validated_payments, "reject_reasons")
+    assert reasons == {
+        1: [],
+        2: [],
+        3: ["invalid_type:payment_date"],
+        4: ["null_key:subscription_id"],
+        5: ["bad_enum:payment_method", "bad_sign:amount"],
+        6: ["bad_sign:amount"],
+    }
+
+
+def test_validation_sql_keeps_raw_record_for_rejects_only(validated_payments):
+    raw = _by_id(validated_payments, "raw_record")
+    assert raw[1] is None
+    # The unparseable date is kept as it arrived
+    assert '"payment_date":"2024-13-01"' in raw[3]
+
+
+def test_validation_sql_typed_source_skips_type_checks():
+    source = """
+        select 1::bigint as payment_id, 10::bigint as subscription_id, date '2024-01-05' as payment_date,
+            -3.0::double as amount, 'success' as status, 'paypal' as payment_method, date '2024-01-05' as created_at
+    """
+    conn = duckdb.connect()
+    try:
+        sql = validation_sql("payments", source, typed_source=True)
+        row = conn.execute(f"select reject_reasons from ({sql})").fetchone()
+    finally:
+        conn.close()
+    assert row == (["bad_sign:amount"],)
+
+
+def test_split_rejects(validated_payments):
+    valid, rejects = split_rejects(validated_payments, "payments")
+    assert valid.column_names == list(TABLE_SCHEMAS["payments"])
+    assert valid.column("payment_id").to_pylist() == [1, 2]
+    assert rejects.column("payment_id").to_pylist() == [3, 4, 5, 6]
+    assert "reject_reasons" in rejects.column_names and "raw_record" in rejects.column_names
+
+
+def test_split_rejects_passes_clean_batch_through(validated_payments):
+    clean = validated_payments.slice(0, 2)
+    valid, rejects = split_rejects(clean, "payments")
+    assert valid.num_rows == 2
+    assert rejects.num_rows == 0
+
+
+def test_plan_shards_is_deterministic():
+    scale = ScaleConfig.from_scale_factor(0.1)
+    assert plan_shards(4, seed=7, scale=scale) == plan_shards(4, seed=7, scale=scale)
+    assert [s.seed for s in plan_shards(4, seed=7, scale=scale)] != [s.seed for s in plan_shards(4, seed=8, scale=scale)]
+
+
+def test_plan_shards_ids_are_contiguous_and_cover_totals():
+    scale = ScaleConfig.from_scale_factor(0.1)
+    specs = plan_shards(3, scale=scale)
+    assert sum(s.num_customers for s in specs) == scale.num_customers
+    assert sum(s.num_payments for s in specs) == scale.num_payments
+    for prev, spec in zip(specs, specs[1:]):
+        assert spec.first_customer_id == prev.first_customer_id + prev.num_customers
+        assert spec.first_subscription_id == prev.first_subscription_id + prev.num_subscriptions
+    assert len({s.seed for s in specs}) == len(specs)
+    assert [s.part_name for s in specs] == ["part-00000", "part-00001", "part-00002"]
+
+
+def test_sharded_output_is_identical_across_runs(tmp_path):
+    scale = ScaleConfig.from_scale_factor(0.01)
+    first, second = tmp_path / "first", tmp_path / "second"
+    for output_dir in (first, second):
+        output_dir.mkdir()
+        generate_sharded(num_shards=2, seed=42, workers=1, output_dir=str(output_dir), scale=scale)
+    names = sorted(os.listdir(first))
+    assert names == sorted(os.listdir(second))
+    match, mismatch, errors = filecmp.cmpfiles(first, second, names, shallow=False)
+    assert not mismatch and not errors
+
+
+def test_default_run_loads_without_rejects(tmp_path):
+    db_path = str(tmp_path / "warehouse.duckdb")
+    main(["--output-dir", str(tmp_path / "raw"), "--db-path", db_path])
+    conn = duckdb.connect(db_path, read_only=True)
+    try:
+        rejects = {
+            table: conn.execute(f"select count(*) from {table}{REJECTS_SUFFIX}").fetchone()[0] for table in RAW_TABLES
+        }
+        subscriptions = conn.execute("select count(*) from subscriptions").fetchone()[0]
+    finally:
+        conn.close()
+    assert rejects == {table: 0 for table in RAW_TABLES}
+    assert subscriptions == ScaleConfig().num_subscriptions
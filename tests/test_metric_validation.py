@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from datetime import date
+
+import duckdb
+import pytest
+
+from metric_validation import Sampling, _sample_rollup, wilson_interval
+
+Z95 = Sampling().z
+
+
+def test_wilson_interval_contains_rate():
+    lower, upper = wilson_interval(10, 200, Z95)
+    assert lower < 10 / 200 < upper
+    assert lower == pytest.approx(0.0274, abs=1e-4)
+    assert upper == pytest.approx(0.0896, abs=1e-4)
+
+
+def test_wilson_interval_is_informative_at_zero_violations():
+    lower, upper = wilson_interval(0, 1000, Z95)
+    assert lower == pytest.approx(0.0, abs=1e-12)
+    # At zero violations the upper bound reduces to z^2 / (n + z^2)
+    assert upper == pytest.approx(Z95 ** 2 / (1000 + Z95 ** 2))
+
+
+def test_wilson_interval_narrows_with_more_draws():
+    narrow = wilson_interval(50, 10_000, Z95)
+    wide = wilson_interval(5, 1_000, Z95)
+    assert narrow[1] - narrow[0] < wide[1] - wide[0]
+
+
+def test_wilson_interval_without_draws_is_uninformative():
+    assert wilson_interval(0, 0, Z95) == (0.0, 1.0)
+
+
+def test_wilson_interval_clamps_to_unit_range():
+    lower, upper = wilson_interval(20, 20, Z95)
+    assert 0.0 <= lower < 1.0 and upper == 1.0
+
+
+def test_sample_rollup_full_sample_is_exact(mrr_warehouse):
+    failures, estimate = _sample_rollup(mrr_warehouse, 0.01, Sampling(percent=100.0))
+    assert failures.count() == 0
+    assert estimate.units_checked == 24
+    assert estimate.sampled_rows == estimate.input_rows == 24 * 500
+    assert estimate.rate_lower == estimate.rate_upper == 0.0
+
+
+@pytest.mark.parametrize("method, percent", [("bernoulli", 20.0), ("bernoulli", 5.0), ("system", 50.0)])
+def test_sample_rollup_rarely_fails_consistent_totals(mrr_warehouse, method, percent):
+    # Every month matches exactly, so a month fails only when the sample lands outside its
+    # interval; with 95% confidence across all months that is about one run in twenty
+    false_alarms = 0
+    for seed in range(20):
+        failures, estimate = _sample_rollup(mrr_warehouse, 0.01, Sampling(method=method, percent=percent, seed=seed))
+        # A system sample of this small table can read all of its few vectors
+        assert 0 < estimate.sampled_rows <= estimate.input_rows
+        false_alarms += failures.count() > 0
+    assert false_alarms <= 2
+
+
+def test_sample_rollup_flags_month_beyond_its_interval(mrr_warehouse):
+    conn = duckdb.connect(mrr_warehouse)
+    try:
+        # One month of mrr_analysis is off by far more than any sampling error
+        conn.execute("update main_marts.mrr_analysis set total_mrr = total_mrr * 3 where date_month = date '2023-06-01'")
+        conn.execute("checkpoint")
+    finally:
+        conn.close()
+    for seed in range(5):
+        failures, estimate = _sample_rollup(mrr_warehouse, 0.01, Sampling(percent=20.0, seed=seed))
+        assert date(2023, 6, 1) in failures.to_arrow().column("date_month").to_pylist()
+        assert estimate.violations == failures.count()
+        assert estimate.rate_lower == estimate.violation_rate >= 1 / 24
+        assert estimate.rate_upper >= estimate.rate_lower
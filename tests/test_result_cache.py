@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from datetime import datetime
+
+import duckdb
+import pytest
+
+import connection_provider
+import result_cache
+from check_rows import CheckRows
+from conftest import build_warehouse
+
+CALLS = []
+
+
+@dataclass(frozen=True)
+class FakeResult:
+    check_name: str
+    run_at_utc: datetime
+    anomalies: CheckRows
+
+
+@result_cache.cached_check(inputs=["main_marts.flagged"])
+def detect_flagged(db_path: str, min_value: int = 0) -> FakeResult:
+    CALLS.append(min_value)
+    rows = CheckRows(db_path, "select * from main_marts.flagged where value >= ? order by id", [min_value])
+    return FakeResult(check_name="flagged", run_at_utc=datetime.utcnow(), anomalies=rows)
+
+
+@pytest.fixture
+def warehouse(tmp_path, monkeypatch) -> str:
+    CALLS.clear()
+    monkeypatch.setenv("MONITORING_CACHE", "on")
+    monkeypatch.setenv("MONITORING_CACHE_DIR", str(tmp_path / "cache"))
+    return build_warehouse(
+        str(tmp_path / "cache.duckdb"),
+        "create table main_marts.flagged as select range as id, range * 10 as value from range(5)",
+    )
+
+
+def _write(db_path: str, sql: str) -> None:
+    # The shared read-only connection has to go before the file can be written
+    connection_provider.close_all()
+    conn = duckdb.connect(db_path)
+    try:
+        conn.execute(sql)
+        conn.execute("checkpoint")
+    finally:
+        conn.close()
+
+
+def test_hit_skips_the_check(warehouse):
+    first = detect_flagged(warehouse, min_value=20)
+    second = detect_flagged(warehouse, min_value=20)
+    assert CALLS == [20]
+    assert second.anomalies.to_pandas()["id"].tolist() == first.anomalies.to_pandas()["id"].tolist() == [2, 3, 4]
+
+
+def test_miss_on_different_parameters(warehouse):
+    detect_flagged(warehouse, min_value=20)
+    detect_flagged(warehouse, min_value=30)
+    detect_flagged(warehouse, 20)
+    assert CALLS == [20, 30]
+
+
+def test_hit_serves_rows_from_when_it_was_stored(warehouse):
+    detect_flagged(warehouse, min_value=20)
+    cached = detect_flagged(warehouse, min_value=20)
+    # The cached rows are in memory: they neither re-query nor follow later writes
+    _write(warehouse, "delete from main_marts.flagged")
+    assert cached.anomalies.count() == 3
+    assert cached.anomalies.db_path == ""
+
+
+def test_write_to_warehouse_invalidates(warehouse):
+    detect_flagged(warehouse, min_value=20)
+    _write(warehouse, "insert into main_marts.flagged values (5, 50)")
+    result = detect_flagged(warehouse, min_value=20)
+    assert CALLS == [20, 20]
+    assert result.anomalies.count() == 4
+
+
+def test_checksum_fingerprint_survives_unrelated_writes(warehouse, monkeypatch):
+    monkeypatch.setenv("MONITORING_CACHE_FINGERPRINT", "checksum")
+    detect_flagged(warehouse, min_value=20)
+    _write(warehouse, "create table main_marts.unrelated as select 1 as x")
+    detect_flagged(warehouse, min_value=20)
+    assert CALLS == [20]
+    _write(warehouse, "update main_marts.flagged set value = value + 1 where id = 0")
+    detect_flagged(warehouse, min_value=20)
+    assert CALLS == [20, 20]
+
+
+def test_bypass_cache_recomputes_and_refreshes(warehouse):
+    detect_flagged(warehouse, min_value=20)
+    detect_flagged(warehouse, min_value=20, bypass_cache=True)
+    detect_flagged(warehouse, min_value=20)
+    assert CALLS == [20, 20]
+
+
+def test_cache_off_runs_every_time(warehouse, monkeypatch):
+    monkeypatch.setenv("MONITORING_CACHE", "off")
+    detect_flagged(warehouse, min_value=20)
+    detect_flagged(warehouse, min_value=20)
+    assert CALLS == [20, 20]
+    assert not os.path.exists(os.environ["MONITORING_CACHE_DIR"])
+
+
+def test_results_over_max_rows_are_not_cached(warehouse, monkeypatch):
+    monkeypatch.setenv("MONITORING_CACHE_MAX_ROWS", "2")
+    result = detect_flagged(warehouse, min_value=20)
+    detect_flagged(warehouse, min_value=20)
+    assert CALLS == [20, 20]
+    # Too large to cache: the caller still gets the lazy rows
+    assert result.anomalies.query
+
+
+def test_entries_in_shared_directory_are_ignored(warehouse):
+    detect_flagged(warehouse, min_value=20)
+    os.chmod(os.environ["MONITORING_CACHE_DIR"], 0o777)
+    detect_flagged(warehouse, min_value=20)
+    assert CALLS == [20, 20]
+
+
+def test_eviction_keeps_directory_within_bound(tmp_path):
+    cache = result_cache.ResultCache(cache_dir=str(tmp_path / "lru"), max_bytes=2500)
+    for i in range(5):
+        cache.put(f"k{i}", b"x" * 1000)
+    assert cache.get("k4") == b"x" * 1000
+    assert cache.get("k0") is None
+    assert sum(os.path.getsize(os.path.join(cache.cache_dir, n)) for n in os.listdir(cache.cache_dir)) <= 2500
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from anomaly_detection import AnomalyResult
+from check_rows import CheckRows
+from run_checks import CheckOutcome, CheckSpec, RunReport, run_checks, summarize_result
+
+
+def _report(*statuses: str) -> RunReport:
+    outcomes = [
+        CheckOutcome(check_name=f"check_{i}", status=status, rows=0, duration_seconds=0.0)
+        for i, status in enumerate(statuses)
+    ]
+    return RunReport(run_at_utc=datetime.utcnow(), db_path="", outcomes=outcomes)
+
+
+@pytest.mark.parametrize(
+    "statuses, exit_code",
+    [
+        ((), 0),
+        (("ok", "ok"), 0),
+        (("ok", "warn"), 1),
+        (("warn", "fail"), 2),
+        (("ok", "error"), 2),
+        (("timeout", "warn"), 2),
+    ],
+)
+def test_exit_code_is_worst_outcome(statuses, exit_code):
+    report = _report(*statuses)
+    assert report.exit_code == exit_code
+    assert report.to_dict()["exit_code"] == exit_code
+
+
+def test_summarize_anomalies():
+    rows = CheckRows.from_arrow(pa.table({"date_month": ["2024-01-01"], "score": [3.5]}))
+    outcome = summarize_result("a.detect_x", AnomalyResult("x", datetime.utcnow(), rows), 0.1)
+    assert (outcome.status, outcome.rows) == ("fail", 1)
+    assert outcome.sample == [{"date_month": "2024-01-01", "score": 3.5}]
+
+
+@pytest.mark.parametrize(
+    "table_statuses, status",
+    [(["ok", "ok"], "ok"), (["ok", "warn"], "warn"), (["warn", "error"], "fail")],
+)
+def test_summarize_freshness(table_statuses, status):
+    frame = pd.DataFrame({"table_name": [f"t{i}" for i in range(len(table_statuses))], "status": table_statuses})
+    outcome = summarize_result("freshness_monitor.check_x", frame, 0.1)
+    assert outcome.status == status
+    assert outcome.rows == sum(s != "ok" for s in table_statuses)
+
+
+def test_summarize_unsupported_result_is_error():
+    assert summarize_result("x.check", object(), 0.1).status == "error"
+
+
+def test_run_checks_combines_outcomes(mrr_warehouse):
+    def clean(db_path):
+        return AnomalyResult("clean", datetime.utcnow(), CheckRows.from_arrow(pa.table({"x": pa.array([], pa.int64())})))
+
+    def stale(db_path):
+        return pd.DataFrame({"table_name": ["raw.payments"], "status": ["warn"]})
+
+    def broken(db_path):
+        raise RuntimeError("boom")
+
+    def slow(db_path):
+        time.sleep(1.0)
+        return stale(db_path)
+
+    checks = [
+        CheckSpec("m.detect_clean", clean),
+        CheckSpec("m.check_stale", stale),
+        CheckSpec("m.detect_broken", broken),
+        CheckSpec("m.detect_slow", slow, timeout_seconds=0.2),
+    ]
+    report = run_checks(mrr_warehouse, checks)
+    statuses = {o.check_name: o.status for o in report.outcomes}
+    assert statuses == {
+        "m.detect_clean": "ok",
+        "m.check_stale": "warn",
+        "m.detect_broken": "error",
+        "m.detect_slow": "timeout",
+    }
+    assert [o.check_name for o in report.outcomes] == [c.name for c in checks]
+    assert report.exit_code == 2
+
+    assert run_checks(mrr_warehouse, checks[:2]).exit_code == 1
+    assert run_checks(mrr_warehouse, []).exit_code == 0